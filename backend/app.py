@@ -1,4 +1,4 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException, BackgroundTasks, Depends, Header, Request
+from fastapi import FastAPI, UploadFile, File, HTTPException, BackgroundTasks, Depends, Header, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse, FileResponse
 from fastapi.staticfiles import StaticFiles
@@ -8,8 +8,10 @@ import uvicorn
 import os
 from datetime import datetime, timezone
 import uuid
+import hashlib
 import json
 import asyncio
+from contextlib import asynccontextmanager
 
 import httpx
 
@@ -22,11 +24,15 @@ except ImportError:  # Sentry is optional; backend must still boot without it
 
 from services.vision_service import VisionService
 from services.estimation_service import EstimationService
+from services.price_list_watcher import PriceListWatcher
+from services.price_history import parse_as_of
+from services.repricing import RepricingJob
+from services.ttl_cache import TTLCache
 from services.llm_service import LLMService
 from services.multi_model_service import MultiModelService
 from database.db import DatabaseService
 from models.quote import QuoteResponse
-from pydantic import BaseModel, ValidationError
+from pydantic import BaseModel, Field, ValidationError
 
 
 class OptionPhase(BaseModel):
@@ -50,10 +56,17 @@ def validate_advanced_options(options: dict) -> dict:
     validated = {}
 
     # Copy simple keys
-    for k in ("quality", "contingency_pct", "profit_pct", "region", "scope"):
+    for k in ("quality", "contingency_pct", "profit_pct", "region", "scope", "cost_range"):
         if k in options:
             validated[k] = options[k]
 
+    # Normalize as_of to an ISO date; an unparseable date is rejected rather than priced as today
+    if options.get("as_of"):
+        try:
+            validated["as_of"] = parse_as_of(options["as_of"])
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"as_of must be an ISO date (YYYY-MM-DD): {e}") from e
+
     # Validate phases
     phases = options.get("phases")
     if phases and isinstance(phases, list):
@@ -93,11 +106,25 @@ from services.auth0_service import Auth0Service
 from services.payment_service import PaymentService
 from models.user import User
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # A snapshot mapped from the compiled catalog builds its indexes lazily; do it
+    # here, off the loop, so the first request does not pay for it
+    await asyncio.to_thread(estimation_service.warm_price_snapshot)
+    # Price list reloads happen in the background, never inside a quote request
+    price_list_watcher.start()
+    try:
+        yield
+    finally:
+        await price_list_watcher.stop()
+        db_service.close()
+
 # Initialize FastAPI app
 app = FastAPI(
     title="EstimateGenie API",
     description="AI-powered construction estimation backend",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Initialize Sentry if DSN present (should be set in deployment environment)
@@ -146,6 +173,8 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Lets browser pollers read the quote ETag and send it back in If-None-Match
+    expose_headers=["ETag"],
 )
 
 # Uniform error payloads: include both `detail` (FastAPI default) and a `message` string
@@ -196,10 +225,17 @@ async def validation_exception_handler(request: Request, exc: _RequestValidation
 # Initialize services
 vision_service = VisionService()
 estimation_service = EstimationService()
+price_list_watcher = PriceListWatcher(estimation_service)
 llm_service = LLMService()
 multi_model_service = MultiModelService()
 db_service = DatabaseService()
-auth_service = AuthService()
+auth_service = AuthService(backend=db_service.backend)  # same SQLite file or Postgres pool
+# Serialized GET /v1/quotes/{id} responses as (updated_at, body); dropped when the quote changes
+quote_response_cache = TTLCache(
+    max_size=int(os.getenv("QUOTE_RESPONSE_CACHE_SIZE", "2048")),
+    ttl_sec=float(os.getenv("QUOTE_RESPONSE_CACHE_TTL_SEC", "600")),
+)
+db_service.on_quote_change(quote_response_cache.invalidate)
 auth0_service = Auth0Service()
 payment_service = PaymentService()
 
@@ -217,8 +253,6 @@ if auth0_service.is_configured():
 else:
     print("⚠️  Auth0 not configured - using local authentication")
 
-# Database path for direct sqlite operations
-DB_PATH = os.getenv("DATABASE_PATH", "estimategenie.db")
 PASSWORD_MIN_LENGTH = 8
 
 # Microservice URLs (can be local or remote)
@@ -272,7 +306,7 @@ async def get_current_user(authorization: str = Header(None)):
     if not payload:
         raise HTTPException(status_code=401, detail="Invalid or expired token")
     
-    user = auth_service.get_user_by_id(payload["sub"])
+    user = await asyncio.to_thread(auth_service.get_user_by_id, payload["sub"])
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
@@ -301,7 +335,7 @@ async def health_check():
         "services": {
             "vision": vision_service.is_ready(),
             "llm": llm_service.is_ready(),
-            "database": db_service.is_connected(),
+            "database": await db_service.ping(),
             "auth0": auth0_service.is_configured()
         }
     }
@@ -387,7 +421,8 @@ async def register(request: RegisterRequest):
     
     # Always register as 'free' - users upgrade via payment flow
     try:
-        user = auth_service.register_user(
+        user = await asyncio.to_thread(
+            auth_service.register_user,
             email=email,
             name=name,
             password=request.password,
@@ -406,12 +441,7 @@ async def register(request: RegisterRequest):
         customer_id = payment_service.create_customer(request.email, request.name)
         if customer_id:
             # Update user with Stripe customer ID
-            import sqlite3
-            conn = sqlite3.connect(DB_PATH)
-            cursor = conn.cursor()
-            cursor.execute("UPDATE users SET stripe_customer_id = ? WHERE id = ?", (customer_id, user.id))
-            conn.commit()
-            conn.close()
+            await asyncio.to_thread(auth_service.update_user_stripe_customer, user.id, customer_id)
             
             # Create checkout session
             checkout = payment_service.create_checkout_session(
@@ -449,7 +479,7 @@ async def login(request: LoginRequest):
     if not request.password:
         raise HTTPException(status_code=401, detail="Invalid email or password")
     
-    user = auth_service.authenticate_user(email, request.password)
+    user = await asyncio.to_thread(auth_service.authenticate_user, email, request.password)
     
     if not user:
         raise HTTPException(status_code=401, detail="Invalid email or password")
@@ -481,12 +511,8 @@ async def get_usage(user = Depends(get_current_user)):
 @app.put("/api/v1/auth/update-profile")
 async def update_profile(request: UpdateProfileRequest, user = Depends(get_current_user)):
     """Update user profile"""
-    import sqlite3
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute("UPDATE users SET name = ? WHERE id = ?", (request.name, user.id))
-    conn.commit()
-    conn.close()
+    if not await asyncio.to_thread(auth_service.update_user_name, user.id, request.name):
+        raise HTTPException(status_code=500, detail="Failed to update profile")
     
     return {"message": "Profile updated successfully"}
 
@@ -502,14 +528,8 @@ async def change_password(request: ChangePasswordRequest, user = Depends(get_cur
             detail=f"New password must be at least {PASSWORD_MIN_LENGTH} characters long"
         )
     
-    new_hash = User.hash_password(request.new_password)
-    
-    import sqlite3
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute("UPDATE users SET password_hash = ? WHERE id = ?", (new_hash, user.id))
-    conn.commit()
-    conn.close()
+    if not await asyncio.to_thread(auth_service.update_password, user.id, request.new_password):
+        raise HTTPException(status_code=500, detail="Failed to change password")
     
     return {"message": "Password changed successfully"}
 
@@ -556,45 +576,10 @@ async def auth0_callback(code: str, redirect_uri: str):
     email = user_info.get("email")
     name = user_info.get("name", email)
     
-    # Try to find existing user
-    import sqlite3
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM users WHERE email = ?", (email,))
-    row = cursor.fetchone()
-    
-    if row:
-        user = User(
-            id=row["id"],
-            email=row["email"],
-            name=row["name"],
-            password_hash=row["password_hash"],
-            plan=row["plan"],
-            api_key=row["api_key"]
-        )
-    else:
-        # Create new user
-        import uuid
-        user_id = str(uuid.uuid4())
-        api_key = User(id="", email="", name="", password_hash="")._generate_api_key()
-        
-        cursor.execute("""
-            INSERT INTO users (id, email, name, password_hash, plan, api_key, created_at)
-            VALUES (?, ?, ?, ?, ?, ?, datetime('now'))
-        """, (user_id, email, name, "auth0", "free", api_key))
-        conn.commit()
-        
-        user = User(
-            id=user_id,
-            email=email,
-            name=name,
-            password_hash="auth0",
-            plan="free",
-            api_key=api_key
-        )
-    
-    conn.close()
+    # Find the existing user or create them
+    user = await asyncio.to_thread(auth_service.get_or_create_external_user, email, name)
+    if not user:
+        raise HTTPException(status_code=500, detail="Failed to load user")
     
     # Create our own JWT token for the user
     access_token = auth_service.create_access_token(user.id, user.email)
@@ -609,14 +594,9 @@ async def auth0_callback(code: str, redirect_uri: str):
 @app.post("/api/v1/auth/regenerate-key")
 async def regenerate_api_key(user = Depends(get_current_user)):
     """Regenerate user API key"""
-    new_key = User(id="", email="", name="", password_hash="")._generate_api_key()
-    
-    import sqlite3
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute("UPDATE users SET api_key = ? WHERE id = ?", (new_key, user.id))
-    conn.commit()
-    conn.close()
+    new_key = await asyncio.to_thread(auth_service.regenerate_api_key, user.id)
+    if not new_key:
+        raise HTTPException(status_code=500, detail="Failed to regenerate API key")
     
     return {"api_key": new_key}
 
@@ -626,12 +606,8 @@ async def delete_account(user = Depends(get_current_user)):
     if user.subscription_id:
         payment_service.cancel_subscription(user.subscription_id)
     
-    import sqlite3
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute("DELETE FROM users WHERE id = ?", (user.id,))
-    conn.commit()
-    conn.close()
+    if not await asyncio.to_thread(auth_service.delete_user, user.id):
+        raise HTTPException(status_code=500, detail="Failed to delete account")
     
     return {"message": "Account deleted successfully"}
 
@@ -792,7 +768,7 @@ async def create_checkout_session(
         )
         if customer_id:
             # Update user with customer ID
-            auth_service.update_user_stripe_customer(getattr(user, "id"), customer_id)
+            await asyncio.to_thread(auth_service.update_user_stripe_customer, getattr(user, "id"), customer_id)
     
     if not customer_id:
         raise HTTPException(status_code=500, detail="Failed to create customer")
@@ -926,10 +902,10 @@ async def create_quote(
             token = authorization_value.replace("Bearer ", "", 1).strip()
             payload = auth_service.verify_token(token)
             if payload:
-                user = auth_service.get_user_by_id(payload["sub"])
+                user = await asyncio.to_thread(auth_service.get_user_by_id, payload["sub"])
         else:
             # API key
-            user = auth_service.get_user_by_api_key(authorization_value)
+            user = await asyncio.to_thread(auth_service.get_user_by_api_key, authorization_value)
     
     if not user:
         raise HTTPException(status_code=401, detail="Authentication required. Please login or provide an API key.")
@@ -949,6 +925,13 @@ async def create_quote(
     if not file.content_type or not file.content_type.startswith("image/"):
         raise HTTPException(status_code=400, detail="File must be an image")
     
+    # Parse and validate advanced options before any work is done
+    try:
+        advanced_options = json.loads(options) if options else {}
+    except ValueError:
+        advanced_options = {}
+    advanced_options = validate_advanced_options(advanced_options if isinstance(advanced_options, dict) else {})
+    
     # Generate unique quote ID
     quote_id = f"quote_{uuid.uuid4().hex[:12]}"
     
@@ -985,13 +968,6 @@ async def create_quote(
                 description
             )
         
-        # Parse and validate advanced options
-        try:
-            advanced_options = json.loads(options) if options else {}
-            advanced_options = validate_advanced_options(advanced_options)
-        except Exception:
-            advanced_options = {}
-        
         # Step 3: Generate estimate with advanced options
         estimate = await estimation_service.calculate_estimate(
             vision_results,
@@ -1009,6 +985,7 @@ async def create_quote(
             "vision_results": vision_results,
             "reasoning": reasoning,
             "estimate": estimate,
+            "description": description,
             "scope": advanced_options.get("scope"),
             "phases": advanced_options.get("phases"),
             "risks": advanced_options.get("risks"),
@@ -1020,7 +997,7 @@ async def create_quote(
         
         # Increment user usage
         user.increment_quote_usage()
-        auth_service.update_user_usage(user.id, quotes_used=user.quotes_used)
+        await asyncio.to_thread(auth_service.update_user_usage, user.id, quotes_used=user.quotes_used)
         
         # Convert estimate data to proper types
         from models.quote import Material, LaborItem, Timeline, WorkStep, Phase, RiskItem
@@ -1113,16 +1090,10 @@ async def create_quote(
         print(f"Error processing quote: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Processing error: {str(e)}")
 
-# Get quote by ID
-@app.get("/v1/quotes/{quote_id}", response_model=QuoteResponse)
-async def get_quote(quote_id: str):
-    """Retrieve a previously generated quote"""
+def _build_quote_response(quote: Dict[str, Any]) -> QuoteResponse:
+    """QuoteResponse for a stored quote row"""
     from models.quote import Material, LaborItem, Timeline, WorkStep, Phase, RiskItem
-    
-    quote = await db_service.get_quote(quote_id)
-    if not quote:
-        raise HTTPException(status_code=404, detail="Quote not found")
-    
+
     est = quote.get("estimate") or {}
     try:
         created_at = quote.get("created_at")
@@ -1213,17 +1184,105 @@ async def get_quote(quote_id: str):
         created_at=created_dt
     )
 
+
+def _quote_etag(quote_id: str, version: str) -> str:
+    # Weak: the body is determined by the stored row, not byte-for-byte stable across releases
+    digest = hashlib.blake2b(f"{quote_id}:{version}".encode("utf-8"), digest_size=12).hexdigest()
+    return f'W/"{digest}"'
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    """Weak comparison of an If-None-Match header against our ETag."""
+    opaque = etag[2:]
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag == "*" or tag == etag or (tag[2:] if tag.startswith("W/") else tag) == opaque:
+            return True
+    return False
+
+
+# Full-text search over the authenticated user's quotes (declared before /v1/quotes/{quote_id})
+@app.get("/v1/quotes/search")
+async def search_quotes(
+    q: str,
+    limit: int = 20,
+    offset: int = 0,
+    project_type: Optional[str] = None,
+    current_user: User = Depends(get_current_user)
+):
+    """Search quotes by words in the scope, description, material names or scene description
+
+    Every word must match (the last one also as a prefix, for search-as-you-type).
+    Returns {"quotes", "next_offset"}, best matches first; each quote has the
+    summary fields plus a `snippet` with matches in [brackets] and a `score`.
+    """
+    limit = max(1, min(limit, 100))
+    try:
+        return await db_service.search_quotes(current_user.id, q, limit, max(0, offset), project_type)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e)) from e
+
+
+# Get quote by ID
+@app.get("/v1/quotes/{quote_id}", response_model=QuoteResponse)
+async def get_quote(quote_id: str, if_none_match: Optional[str] = Header(None)):
+    """Retrieve a previously generated quote
+
+    Responses carry an ETag derived from the quote's updated_at. Pollers send it
+    back in If-None-Match and get 304 until the quote changes; other requests are
+    served from an LRU of serialized responses keyed by (id, updated_at).
+    """
+    version = await db_service.get_quote_version(quote_id)
+    if version is None:
+        raise HTTPException(status_code=404, detail="Quote not found")
+    etag = _quote_etag(quote_id, version)
+    if if_none_match and _etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache"})
+
+    cached = quote_response_cache.get(quote_id)
+    if cached and cached[0] == version:
+        body = cached[1]
+    else:
+        quote = await db_service.get_quote(quote_id)
+        if not quote:
+            raise HTTPException(status_code=404, detail="Quote not found")
+        # The row may have changed since the version check; describe what we read
+        version = quote.get("updated_at") or ""
+        etag = _quote_etag(quote_id, version)
+        body = _build_quote_response(quote).model_dump_json().encode("utf-8")
+        quote_response_cache.put(quote_id, (version, body))
+    return Response(
+        content=body,
+        media_type="application/json",
+        headers={"ETag": etag, "Cache-Control": "no-cache"},
+    )
+
+
 # List all quotes (authenticated)
 @app.get("/v1/quotes")
 async def list_quotes(
     limit: int = 10,
     offset: int = 0,
     project_type: Optional[str] = None,
+    cursor: Optional[str] = None,
+    paginate: str = "offset",
+    view: str = "full",
     current_user: User = Depends(get_current_user)
 ):
-    """List recent quotes for the authenticated user with optional filtering"""
+    """List recent quotes for the authenticated user with optional filtering
+
+    With `paginate=cursor` (or a `cursor` from a previous page) the response is
+    {"quotes", "next_cursor"}; cursor pages stay fast at any depth, unlike offsets.
+    `view=summary` returns only id, type, status, dates and total_amount.
+    """
     user_id = current_user.id
-    quotes = await db_service.list_quotes(limit, offset, project_type, user_id=user_id)
+    summary = view == "summary"
+    if cursor or paginate == "cursor":
+        try:
+            return await db_service.list_quotes_page(limit, cursor, project_type, user_id=user_id, summary=summary)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail="Invalid cursor") from e
+    quotes = await db_service.list_quotes(limit, offset, project_type, user_id=user_id, summary=summary)
     return quotes
 
 # Update quote
@@ -1244,44 +1303,211 @@ async def delete_quote(quote_id: str):
         raise HTTPException(status_code=404, detail="Quote not found")
     return {"status": "deleted", "quote_id": quote_id}
 
+# Estimate versions written by re-pricing jobs (with per-version deltas)
+@app.get("/v1/quotes/{quote_id}/versions")
+async def quote_estimate_versions(quote_id: str, current_user: User = Depends(get_current_user)):
+    versions = await db_service.list_estimate_versions(quote_id, user_id=current_user.id)
+    if versions is None:
+        raise HTTPException(status_code=404, detail="Quote not found")
+    return {"quote_id": quote_id, "versions": versions}
+
 # Material price lookup
 @app.get("/v1/materials/search")
-async def search_materials(query: str, limit: int = 10):
-    """Search material database"""
-    results = await estimation_service.search_materials(query, limit)
-    return results
+async def search_materials(
+    response: Response,
+    query: str,
+    limit: int = 10,
+    offset: int = 0,
+    cursor: Optional[str] = None,
+):
+    """Search material database (ranked). Next page cursor is returned in X-Next-Cursor."""
+    try:
+        page = estimation_service.search_materials_page(
+            query, limit=min(max(limit, 0), 100), offset=offset, cursor=cursor
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail="Invalid or expired cursor; restart the search") from e
+    response.headers["X-Total-Count"] = str(page["total"])
+    if page["next_cursor"]:
+        response.headers["X-Next-Cursor"] = page["next_cursor"]
+    return page["results"]
 
 # Get labor rates
 @app.get("/v1/labor/rates")
-async def get_labor_rates(trade: Optional[str] = None):
-    """Get current labor rates by trade"""
-    rates = await estimation_service.get_labor_rates(trade)
+async def get_labor_rates(trade: Optional[str] = None, region: Optional[str] = None, as_of: Optional[str] = None):
+    """Get labor rates in force by trade, optionally for a region and effective date (YYYY-MM-DD)"""
+    try:
+        as_of = parse_as_of(as_of)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail="as_of must be an ISO date (YYYY-MM-DD)") from e
+    rates = await estimation_service.get_labor_rates(trade, region=region, as_of=as_of)
     return rates
 
+# Batch estimation for pre-analyzed jobs (no image upload)
+class BatchEstimateJob(BaseModel):
+    vision_results: Dict[str, Any] = {}
+    reasoning: Dict[str, Any] = {}
+    project_type: str = "general"
+    options: Dict[str, Any] = {}
+
+class BatchEstimateRequest(BaseModel):
+    jobs: List[BatchEstimateJob]
+
+MAX_BATCH_ESTIMATE_JOBS = int(os.getenv("MAX_BATCH_ESTIMATE_JOBS", "1000"))
+
+@app.post("/v1/estimates/batch")
+async def estimate_batch(request: BatchEstimateRequest, current_user: User = Depends(get_current_user)):
+    """Estimate many pre-analyzed jobs in one call; results are returned in input order."""
+    if len(request.jobs) > MAX_BATCH_ESTIMATE_JOBS:
+        raise HTTPException(status_code=400, detail=f"Too many jobs: limit is {MAX_BATCH_ESTIMATE_JOBS} per request")
+    jobs = [
+        {
+            "vision_results": job.vision_results,
+            "reasoning": job.reasoning,
+            "project_type": job.project_type,
+            "options": validate_advanced_options(job.options),
+        }
+        for job in request.jobs
+    ]
+    results = await asyncio.to_thread(estimation_service.calculate_estimates_batch, jobs)
+    return {"count": len(results), "results": results}
+
+# What-if pricing: every quality x region x contingency x profit combination at once
+class PricingMatrixGrid(BaseModel):
+    quality: List[str] = ["standard", "premium", "luxury"]
+    region: List[str] = ["midwest", "south", "northeast", "west"]
+    contingency_pct: List[float] = [0, 5, 10]
+    profit_pct: List[float] = [10, 15, 20]
+
+class PricingMatrixRequest(BaseModel):
+    vision_results: Dict[str, Any] = {}
+    reasoning: Dict[str, Any] = {}
+    project_type: str = "general"
+    options: Dict[str, Any] = {}
+    grid: PricingMatrixGrid = PricingMatrixGrid()
+
+MAX_PRICING_MATRIX_CELLS = int(os.getenv("MAX_PRICING_MATRIX_CELLS", "10000"))
+
+@app.post("/v1/estimates/matrix")
+async def estimate_matrix(request: PricingMatrixRequest, current_user: User = Depends(get_current_user)):
+    """Return totals for every combination in `grid` (indexed totals[quality][region][contingency][profit])."""
+    grid = request.grid.model_dump()
+    cells = 1
+    for values in grid.values():
+        cells *= max(1, len(values))
+    if cells > MAX_PRICING_MATRIX_CELLS:
+        raise HTTPException(status_code=400, detail=f"Grid too large: {cells} cells (limit {MAX_PRICING_MATRIX_CELLS})")
+    return await asyncio.to_thread(
+        estimation_service.calculate_pricing_matrix,
+        request.vision_results,
+        request.reasoning,
+        request.project_type,
+        grid,
+        validate_advanced_options(request.options),
+    )
+
 # Optional: force reload of external price lists
 @app.post("/v1/pricing/reload")
 async def pricing_reload():
-    summary = estimation_service.reload_price_lists()
+    summary = await asyncio.to_thread(estimation_service.reload_price_lists)
     return summary
 
-# Optional: lookup price for a given key/name
+# Optional: lookup price for a given key/name (optionally for one region)
 @app.get("/v1/pricing/lookup")
-async def pricing_lookup(key: str):
-    return estimation_service.lookup_price(key)
+async def pricing_lookup(key: str, region: Optional[str] = None, as_of: Optional[str] = None):
+    try:
+        return await asyncio.to_thread(estimation_service.lookup_price, key, region=region, as_of=as_of)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail="as_of must be an ISO date (YYYY-MM-DD)") from e
+
+# Price timeline for auditing what a material cost over time
+@app.get("/v1/pricing/history")
+async def pricing_history(key: str, region: Optional[str] = None):
+    return estimation_service.price_history(key, region=region)
 
 # Optional: pricing system status
 @app.get("/v1/pricing/status")
 async def pricing_status():
     """Return pricing system status and configuration"""
+    snapshot = estimation_service._snapshot
     return {
-        "external_files": [str(p) for p in estimation_service._external_price_files],
-        "external_keys_count": len(estimation_service._external_keys),
-        "total_materials_count": len(estimation_service.materials_db),
+        "external_files": [str(p) for p in snapshot.files],
+        "external_keys_count": len(snapshot.external_keys),
+        "total_materials_count": len(snapshot.materials),
+        "regional_prices_count": len(snapshot.regional),
+        "regions": sorted(snapshot.regions),
+        "price_snapshot_version": snapshot.version,
+        "price_snapshot_created_at": snapshot.created_at,
+        "price_snapshot_source": snapshot.source,
+        "price_catalog_file": str(estimation_service._price_catalog_path) if estimation_service._price_catalog_path else None,
         "reload_interval_sec": estimation_service._price_list_reload_interval,
         "last_check_timestamp": estimation_service._price_list_last_check,
-        "watsonx_enabled": estimation_service.pricing is not None,
+        "load_errors": estimation_service._price_list_errors,
+        "ingest": estimation_service.price_list_ingest_stats(),
+        "watcher": price_list_watcher.status(),
+        "estimate_cache": estimation_service._estimate_cache.stats(),
+        "labor_rates": estimation_service.labor_rate_status(),
+        "watsonx_enabled": estimation_service.pricing is not None and estimation_service.pricing.is_enabled(),
+        "pricing_service": estimation_service.pricing.stats() if estimation_service.pricing is not None else None,
     }
 
+# ============================================================================
+# ADMIN: BULK RE-PRICING
+# ============================================================================
+
+ADMIN_API_TOKEN = os.getenv("ADMIN_API_TOKEN")
+REPRICE_WORKERS = int(os.getenv("REPRICE_WORKERS", "2"))
+# Upper bound for a job's worker processes, whatever the request asks for
+MAX_REPRICE_WORKERS = int(os.getenv("MAX_REPRICE_WORKERS", str(os.cpu_count() or 1)))
+# Running re-pricing tasks by job id (keeps a reference so they are not garbage collected)
+_repricing_tasks: Dict[str, asyncio.Task] = {}
+
+def require_admin(x_admin_token: str = Header(None)):
+    if not ADMIN_API_TOKEN or x_admin_token != ADMIN_API_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin token required")
+
+class RepriceRequest(BaseModel):
+    chunk_size: int = 500
+    workers: Optional[int] = Field(None, ge=1, le=MAX_REPRICE_WORKERS)
+    statuses: List[str] = ["completed"]
+    resume_job_id: Optional[str] = None
+
+@app.post("/v1/admin/reprice", dependencies=[Depends(require_admin)])
+async def start_repricing(request: RepriceRequest):
+    """Start (or resume) a background job re-pricing stored quotes against current prices."""
+    if request.resume_job_id and request.resume_job_id in _repricing_tasks:
+        raise HTTPException(status_code=400, detail="Job is already running")
+    try:
+        # Creating (or loading) the job record hits the database
+        job = await asyncio.to_thread(
+            RepricingJob,
+            db_service,
+            chunk_size=request.chunk_size,
+            workers=request.workers or min(REPRICE_WORKERS, MAX_REPRICE_WORKERS),
+            statuses=request.statuses,
+            job_id=request.resume_job_id,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e)) from e
+
+    async def _run():
+        try:
+            await asyncio.to_thread(job.run)
+        except Exception as e:
+            print(f"Re-pricing job {job.job_id} failed: {e}")
+        finally:
+            _repricing_tasks.pop(job.job_id, None)
+
+    _repricing_tasks[job.job_id] = asyncio.create_task(_run())
+    return {"job_id": job.job_id, "resumed": job.resumed, "status": "running"}
+
+@app.get("/v1/admin/reprice/{job_id}", dependencies=[Depends(require_admin)])
+async def repricing_status(job_id: str):
+    job = await asyncio.to_thread(db_service.get_repricing_job, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Re-pricing job not found")
+    return job
+
 # ============================================================================
 # ASYNC QUOTE PIPELINE (Microservices Orchestration)
 # ============================================================================
@@ -1294,7 +1520,11 @@ async def _run_quote_pipeline(
     description: str,
     options: Dict[str, Any],
 ):
-    """Coordinated async pipeline across microservices (vision -> cost -> llm)."""
+    """Coordinated async pipeline across microservices (vision -> cost -> llm).
+
+    Intermediate statuses are queued (write-behind, coalesced per quote); the
+    final state is written with update_quote, which flushes them.
+    """
     try:
         # Helper: internal synchronous fallback using built-in services
         async def _internal_fallback():
@@ -1321,10 +1551,10 @@ async def _run_quote_pipeline(
                 resp = await client.post(f"{VISION_SERVICE_URL}/infer", files=files)
                 resp.raise_for_status()
                 vision_results = resp.json()
-            await db_service.update_quote(quote_id, {"vision_results": vision_results, "status": "vision_complete"})
+            await db_service.queue_quote_update(quote_id, {"vision_results": vision_results, "status": "vision_complete"})
         except Exception as e:
             # Fallback to internal pipeline
-            await db_service.update_quote(quote_id, {"status": "vision_error", "reasoning": {"warn": f"vision microservice failed: {e}"}})
+            await db_service.queue_quote_update(quote_id, {"status": "vision_error", "reasoning": {"warn": f"vision microservice failed: {e}"}})
             ok = await _internal_fallback()
             if ok:
                 return
@@ -1372,10 +1602,10 @@ async def _run_quote_pipeline(
                 resp = await client.post(f"{COST_SERVICE_URL}/estimate", json=cost_payload)
                 resp.raise_for_status()
                 cost_baseline = resp.json()
-            await db_service.update_quote(quote_id, {"reasoning": {"cost_baseline": cost_baseline}, "status": "cost_complete"})
+            await db_service.queue_quote_update(quote_id, {"reasoning": {"cost_baseline": cost_baseline}, "status": "cost_complete"})
         except Exception as e:
             # Fallback to internal pipeline
-            await db_service.update_quote(quote_id, {"status": "cost_error", "reasoning": {"warn": f"cost microservice failed: {e}"}})
+            await db_service.queue_quote_update(quote_id, {"status": "cost_error", "reasoning": {"warn": f"cost microservice failed: {e}"}})
             ok = await _internal_fallback()
             if ok:
                 return
@@ -1460,7 +1690,7 @@ async def _run_quote_pipeline(
             await db_service.update_quote(quote_id, {"estimate": estimate, "reasoning": {"cost_baseline": cost_baseline, "llm": llm_output}, "status": "completed"})
         except Exception as e:
             # Final fallback to internal if composing failed unexpectedly
-            await db_service.update_quote(quote_id, {"status": "error", "reasoning": {"warn": f"compose failed: {e}"}})
+            await db_service.queue_quote_update(quote_id, {"status": "error", "reasoning": {"warn": f"compose failed: {e}"}})
             await _internal_fallback()
     except Exception as e:
         # Catch any unexpected pipeline errors to avoid crashing worker
@@ -1493,9 +1723,9 @@ async def create_quote_async(
             token = authorization_value.replace("Bearer ", "", 1).strip()
             payload = auth_service.verify_token(token)
             if payload:
-                user = auth_service.get_user_by_id(payload["sub"])
+                user = await asyncio.to_thread(auth_service.get_user_by_id, payload["sub"])
         else:
-            user = auth_service.get_user_by_api_key(authorization_value)
+            user = await asyncio.to_thread(auth_service.get_user_by_api_key, authorization_value)
     if not user:
         raise HTTPException(status_code=401, detail="Authentication required. Please login or provide an API key.")
     if not file:
@@ -1523,6 +1753,7 @@ async def create_quote_async(
             "id": quote_id,
             "user_id": user.id,
             "project_type": project_type,
+            "description": description,
             "scope": advanced_options.get("scope"),
             "phases": advanced_options.get("phases"),
             "risks": advanced_options.get("risks"),
@@ -1536,7 +1767,7 @@ async def create_quote_async(
 
         # Increment user usage
         user.increment_quote_usage()
-        auth_service.update_user_usage(user.id, quotes_used=user.quotes_used)
+        await asyncio.to_thread(auth_service.update_user_usage, user.id, quotes_used=user.quotes_used)
 
         # Launch background pipeline
         background_tasks.add_task(_run_quote_pipeline, quote_id, user.id, image_path, project_type, description, advanced_options)
@@ -1,65 +1,378 @@
-"""Simple benchmark harness for estimation pipeline.
+"""Benchmark suite for the estimation engine with p50/p95 regression gates.
 
-Measures:
-- LLM reasoning latency (if provider ready, else fallback)
-- Estimation service latency
-- End-to-end latency (vision -> reasoning -> estimate)
+Cases:
+- calculate_estimate over every vision fixture in tests/fixtures/*.json
+- synthetic large inputs: a 500-line material list and a 100k-row price list
+- hot functions timed on their own: _name_to_db_key, _calculate_materials_cost,
+  _load_external_price_lists and search_materials
 
-Usage (PowerShell):
-  C:\Users\user\quoteGenie\.venv-4\Scripts\python.exe backend\benchmark_estimation.py --iters 3 --provider fallback
-  C:\Users\user\quoteGenie\.venv-4\Scripts\python.exe backend\benchmark_estimation.py --iters 3 --provider gemini
+Each case is run `--samples` times after a warm-up; the report lists p50/p95/mean
+per call in milliseconds. `--save-baseline` writes the results as JSON, and
+`--baseline` compares a run against one and exits non-zero when any case's p50 or
+p95 regressed by more than `--threshold` (ignoring sub-`--min-delta-ms` noise).
+
+Price list, catalog, history, labor rate and external pricing settings are cleared
+first so results only depend on the code and the synthetic inputs.
+
+Usage (from backend/):
+  python benchmark_estimation.py                                   # run and print
+  python benchmark_estimation.py --save-baseline                   # benchmarks/estimation_baseline.json
+  python benchmark_estimation.py --baseline benchmarks/estimation_baseline.json --threshold 0.25
+  python benchmark_estimation.py --only search_materials --samples 50
+  python benchmark_estimation.py --llm --iters 3                   # end-to-end with the LLM provider
 """
 import argparse
 import asyncio
+import csv
 import json
+import math
 import os
+import platform
+import random
+import sys
+import tempfile
 import time
 from pathlib import Path
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
 
-from services.llm_service import LLMService
 from services.estimation_service import EstimationService
+from services.ttl_cache import TTLCache
+
+FIXTURE_DIR = Path(__file__).parent / "tests" / "fixtures"
+DEFAULT_BASELINE = Path(__file__).parent / "benchmarks" / "estimation_baseline.json"
 
-FIXTURE = {
-    'detections': [{'class': 'bathroom', 'confidence': 0.9}],
-    'measurements': {'estimated_area_sqft': 50},
-    'scene_description': 'Small bathroom with tub and vanity'
+# Settings that would make results depend on the machine's configuration
+ISOLATED_ENV = (
+    "PRICE_LIST_FILE", "PRICE_LIST_FILES", "PRICE_CATALOG_FILE", "PRICE_HISTORY_FILE",
+    "LABOR_RATE_FILE", "LABOR_RATE_FILES", "PRICING_BACKEND",
+)
+
+# Typical LLM material lists per project type (fixtures only carry vision results)
+FIXTURE_REASONING: Dict[str, Dict[str, Any]] = {
+    "bathroom": {
+        "materials_needed": [
+            {"name": "ceramic tile", "quantity": 80}, {"name": "grout", "quantity": 3},
+            {"name": "thinset", "quantity": 4}, {"name": "cement board", "quantity": 6},
+            {"name": "grout sealer", "quantity": 1}, {"name": "paint", "quantity": 2},
+        ],
+        "analysis": {"labor_hours": 32},
+    },
+    "kitchen": {
+        "materials_needed": [
+            {"name": "cabinets", "quantity": 20}, {"name": "countertop", "quantity": 40},
+            {"name": "backsplash tile", "quantity": 30}, {"name": "drywall", "quantity": 8},
+            {"name": "paint", "quantity": 3}, {"name": "adhesive", "quantity": 2},
+        ],
+        "analysis": {"labor_hours": 60},
+    },
+    "exterior": {
+        "materials_needed": [
+            {"name": "treated 2x4", "quantity": 120}, {"name": "concrete", "quantity": 3},
+            {"name": "primer", "quantity": 4}, {"name": "paint", "quantity": 6},
+        ],
+        "analysis": {"labor_hours": 48},
+    },
+    "interior": {
+        "materials_needed": [
+            {"name": "paint", "quantity": 12}, {"name": "primer", "quantity": 6},
+            {"name": "joint compound", "quantity": 2}, {"name": "drywall", "quantity": 4},
+        ],
+        "analysis": {"labor_hours": 40},
+    },
 }
 
-async def bench_once(llm: LLMService, est: EstimationService):
-    t0 = time.perf_counter()
-    result = await llm.reason_about_project(FIXTURE, 'bathroom', 'Benchmark run')
-    t1 = time.perf_counter()
-    estimate = await est.calculate_estimate(FIXTURE, result, 'bathroom')
-    t2 = time.perf_counter()
-    return (t1 - t0, t2 - t1, estimate)
+_NOUNS = ("tile", "grout", "lumber", "paint", "primer", "drywall", "cabinet", "countertop",
+          "adhesive", "mortar", "board", "sealer", "concrete", "backsplash", "trim", "pipe")
+_ADJECTIVES = ("ceramic", "porcelain", "treated", "interior", "exterior", "premium", "white",
+               "grey", "cement", "quartz", "oak", "pvc", "copper", "matte", "gloss", "sanded")
+_REGIONS = ("Midwest", "Northeast", "South", "West Coast", "Mountain")
+
+
+class Case(NamedTuple):
+    name: str
+    fn: Callable[[], Any]
+    number: int = 1  # calls per sample; per-call time is the sample time / number
+    samples: Optional[int] = None  # overrides --samples for very slow cases
+    setup: Optional[Callable[[], Any]] = None  # run before every sample, untimed
+
+
+def _isolate_env() -> None:
+    for name in ISOLATED_ENV:
+        os.environ.pop(name, None)
+
+
+def _service(price_list: Optional[Path] = None) -> EstimationService:
+    if price_list is not None:
+        os.environ["PRICE_LIST_FILE"] = str(price_list)
+    try:
+        service = EstimationService()
+    finally:
+        os.environ.pop("PRICE_LIST_FILE", None)
+    # Time the computation, not the memo
+    service._estimate_cache = TTLCache(max_size=0)
+    return service
+
+
+def synthetic_materials(lines: int, seed: int = 7) -> List[Dict[str, Any]]:
+    rng = random.Random(seed)
+    return [
+        {"name": f"{rng.choice(_ADJECTIVES)} {rng.choice(_NOUNS)} {rng.randint(1, 400)}",
+         "quantity": rng.randint(1, 200)}
+        for _ in range(lines)
+    ]
+
+
+def write_price_list(path: Path, rows: int, seed: int = 11) -> Path:
+    """CSV price list of `rows` rows: distinct materials, each priced in every region."""
+    rng = random.Random(seed)
+    with path.open("w", newline="", encoding="utf-8") as fh:
+        writer = csv.writer(fh)
+        writer.writerow(["key", "price", "unit", "description", "region"])
+        for i in range(rows // len(_REGIONS)):
+            adjective, noun = rng.choice(_ADJECTIVES), rng.choice(_NOUNS)
+            key = f"{adjective}_{noun}_{i}"
+            base = rng.uniform(1.0, 400.0)
+            for region in _REGIONS:
+                writer.writerow([key, f"{base * rng.uniform(0.85, 1.2):.2f}", "each",
+                                 f"{adjective.title()} {noun} #{i}", region])
+    return path
+
+
+def build_cases(workdir: Path) -> List[Case]:
+    cases: List[Case] = []
+
+    service = _service()
+    for fixture in sorted(FIXTURE_DIR.glob("*.json")):
+        vision = json.loads(fixture.read_text(encoding="utf-8"))
+        project_type = fixture.stem.split("_")[0]
+        reasoning = FIXTURE_REASONING.get(project_type, FIXTURE_REASONING["interior"])
+        cases.append(Case(
+            f"calculate_estimate/{fixture.stem}",
+            lambda v=vision, r=reasoning, p=project_type: asyncio.run(service.calculate_estimate(v, r, p)),
+            number=5,
+        ))
+
+    price_list = write_price_list(workdir / "prices_100k.csv", 100_000)
+    large = _service(price_list)
+    materials_500 = synthetic_materials(500)
+    reasoning_500 = {"materials_needed": materials_500, "analysis": {"labor_hours": 200}}
+    names_500 = [m["name"] for m in materials_500]
+    cases.append(Case(
+        "calculate_estimate/synthetic_500_lines",
+        lambda: asyncio.run(large.calculate_estimate({}, reasoning_500, "general", {"region": "midwest"})),
+    ))
+    cases.append(Case(
+        "_calculate_materials_cost/500_lines",
+        lambda: large._calculate_materials_cost(materials_500, "standard", "midwest"),
+        number=3,
+    ))
+    cases.append(Case(
+        "_name_to_db_key/500_names_warm",
+        lambda: [large._name_to_db_key(n) for n in names_500],
+        number=5,
+    ))
+    # Uncached names fall through to fuzzy trigram matching over every catalog name
+    cases.append(Case(
+        "_name_to_db_key/50_names_cold",
+        lambda: [large._name_to_db_key(n) for n in names_500[:50]],
+        samples=5,
+        setup=lambda: large._snapshot.resolver.resolve.cache_clear(),
+    ))
+    queries = ["tile", "porcelain tile", "oak trim", "copper pipe 12", "grey", "quartz counter",
+               "sanded grout", "pvc", "matte paint", "treated lumber"]
+    cases.append(Case(
+        "search_materials/100k_rows_10_queries",
+        lambda: [asyncio.run(large.search_materials(q, limit=10)) for q in queries],
+        number=2,
+    ))
+
+    loader = _service()
+    base_snapshot = loader._snapshot
+
+    def reset_loader() -> None:
+        # Forget the previous parse and snapshot so every sample is a full load
+        os.environ["PRICE_LIST_FILE"] = str(price_list)
+        loader._parsed_price_files = {}
+        loader._snapshot = base_snapshot
+
+    cases.append(Case(
+        "_load_external_price_lists/100k_rows_csv",
+        loader._load_external_price_lists,
+        samples=5,
+        setup=reset_loader,
+    ))
+    return cases
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of a non-empty list."""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(pct / 100.0 * len(ordered)) - 1)]
 
-async def main(iters: int):
+
+def time_case(case: Case, samples: int, warmup: int = 1) -> Dict[str, Any]:
+    n = case.samples or samples
+    for _ in range(warmup):
+        if case.setup:
+            case.setup()
+        case.fn()
+    times: List[float] = []
+    for _ in range(n):
+        if case.setup:
+            case.setup()
+        t0 = time.perf_counter()
+        for _ in range(case.number):
+            case.fn()
+        times.append((time.perf_counter() - t0) / case.number * 1000.0)
+    return {
+        "samples": n,
+        "calls_per_sample": case.number,
+        "p50_ms": round(percentile(times, 50), 4),
+        "p95_ms": round(percentile(times, 95), 4),
+        "mean_ms": round(sum(times) / n, 4),
+        "min_ms": round(min(times), 4),
+    }
+
+
+def run_suite(samples: int = 20, only: Optional[str] = None) -> Dict[str, Any]:
+    _isolate_env()
+    with tempfile.TemporaryDirectory(prefix="estimation-bench-") as tmp:
+        results = {}
+        for case in build_cases(Path(tmp)):
+            if only and only not in case.name:
+                continue
+            results[case.name] = time_case(case, samples)
+            os.environ.pop("PRICE_LIST_FILE", None)
+    return {"meta": environment_info(samples), "results": results}
+
+
+def environment_info(samples: int) -> Dict[str, Any]:
+    try:
+        import numpy
+        numpy_version = numpy.__version__
+    except ImportError:
+        numpy_version = None
+    return {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "numpy": numpy_version,
+        "samples": samples,
+    }
+
+
+def compare(
+    current: Dict[str, Dict[str, Any]],
+    baseline: Dict[str, Dict[str, Any]],
+    threshold: float = 0.25,
+    min_delta_ms: float = 0.05,
+) -> List[Dict[str, Any]]:
+    """Cases whose p50 or p95 grew by more than `threshold` (and `min_delta_ms`) over baseline."""
+    regressions = []
+    for name, stats in current.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        for metric in ("p50_ms", "p95_ms"):
+            old, new = float(base[metric]), float(stats[metric])
+            if new - old > min_delta_ms and new > old * (1.0 + threshold):
+                regressions.append({
+                    "case": name, "metric": metric, "baseline": old, "current": new,
+                    "change_pct": round((new / old - 1.0) * 100.0, 1) if old else None,
+                })
+    return regressions
+
+
+def print_report(results: Dict[str, Dict[str, Any]], baseline: Optional[Dict[str, Dict[str, Any]]] = None) -> None:
+    width = max((len(n) for n in results), default=10)
+    header = f"{'case':<{width}}  {'p50 ms':>10}  {'p95 ms':>10}  {'mean ms':>10}"
+    if baseline:
+        header += f"  {'p50 vs base':>12}"
+    print(header)
+    print("-" * len(header))
+    for name, s in results.items():
+        line = f"{name:<{width}}  {s['p50_ms']:>10.3f}  {s['p95_ms']:>10.3f}  {s['mean_ms']:>10.3f}"
+        base = (baseline or {}).get(name)
+        if base and base.get("p50_ms"):
+            line += f"  {(s['p50_ms'] / base['p50_ms'] - 1.0) * 100.0:>+11.1f}%"
+        elif baseline:
+            line += f"  {'new':>12}"
+        print(line)
+
+
+async def bench_llm(iters: int) -> None:
+    """End-to-end timing with the configured LLM provider (vision fixture -> reasoning -> estimate)."""
+    from services.llm_service import LLMService
+
+    fixture = json.loads((FIXTURE_DIR / "bathroom_small.json").read_text(encoding="utf-8"))
     llm = LLMService()
     est = EstimationService()
-    llm_times = []
-    est_times = []
-
+    llm_times, est_times = [], []
+    estimate = None
     for _ in range(iters):
-        a, b, estimate = await bench_once(llm, est)
-        llm_times.append(a)
-        est_times.append(b)
+        t0 = time.perf_counter()
+        result = await llm.reason_about_project(fixture, "bathroom", "Benchmark run")
+        t1 = time.perf_counter()
+        estimate = await est.calculate_estimate(fixture, result, "bathroom")
+        llm_times.append(t1 - t0)
+        est_times.append(time.perf_counter() - t1)
 
     def stats(xs):
-        return {
-            'avg_ms': round(sum(xs) / len(xs) * 1000, 1),
-            'min_ms': round(min(xs) * 1000, 1),
-            'max_ms': round(max(xs) * 1000, 1)
-        }
-
-    print('\n=== Benchmark Results ===')
-    print('LLM ready:', llm.is_ready(), 'provider:', llm.provider)
-    print('LLM (ms):', stats(llm_times))
-    print('Estimation (ms):', stats(est_times))
-    total = estimate['total_cost']
-    print('Total cost: $', round(total['amount'], 2))
-
-if __name__ == '__main__':
-    parser = argparse.ArgumentParser()
-    parser.add_argument('--iters', type=int, default=3)
-    _ = parser.parse_args()
-    asyncio.run(main(_ .iters))
+        return {"avg_ms": round(sum(xs) / len(xs) * 1000, 1), "min_ms": round(min(xs) * 1000, 1),
+                "max_ms": round(max(xs) * 1000, 1)}
+
+    print("LLM ready:", llm.is_ready(), "provider:", llm.provider)
+    print("LLM (ms):", stats(llm_times))
+    print("Estimation (ms):", stats(est_times))
+    print("Total cost: $", round(estimate["total_cost"]["amount"], 2))
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--samples", type=int, default=20, help="timed samples per case")
+    parser.add_argument("--only", help="run only cases whose name contains this text")
+    parser.add_argument("--save-baseline", nargs="?", const=str(DEFAULT_BASELINE), metavar="PATH",
+                        help=f"write results as the new baseline (default {DEFAULT_BASELINE.name})")
+    parser.add_argument("--baseline", metavar="PATH", help="compare against this baseline and gate on regressions")
+    parser.add_argument("--threshold", type=float, default=float(os.getenv("BENCH_THRESHOLD", "0.25")),
+                        help="allowed relative p50/p95 increase before failing (default 0.25)")
+    parser.add_argument("--min-delta-ms", type=float, default=0.05, help="ignore increases smaller than this")
+    parser.add_argument("--json", metavar="PATH", help="also write this run's results to PATH")
+    parser.add_argument("--llm", action="store_true", help="run the end-to-end LLM benchmark instead")
+    parser.add_argument("--iters", type=int, default=3, help="iterations for --llm")
+    args = parser.parse_args(argv)
+
+    if args.llm:
+        asyncio.run(bench_llm(args.iters))
+        return 0
+
+    run = run_suite(samples=args.samples, only=args.only)
+    baseline = None
+    if args.baseline:
+        baseline_doc = json.loads(Path(args.baseline).read_text(encoding="utf-8"))
+        baseline = baseline_doc["results"]
+        base_meta = baseline_doc.get("meta", {})
+        if (base_meta.get("python"), base_meta.get("machine")) != (run["meta"]["python"], run["meta"]["machine"]):
+            print(f"Warning: baseline was recorded on {base_meta.get('platform')} / Python {base_meta.get('python')}")
+
+    print_report(run["results"], baseline)
+    for path in filter(None, (args.json, args.save_baseline)):
+        out = Path(path)
+        out.parent.mkdir(parents=True, exist_ok=True)
+        out.write_text(json.dumps(run, indent=2) + "\n", encoding="utf-8")
+        print(f"Results written to {out}")
+
+    if baseline is not None:
+        regressions = compare(run["results"], baseline, args.threshold, args.min_delta_ms)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) beyond {args.threshold:.0%}:")
+            for r in regressions:
+                print(f"  {r['case']} {r['metric']}: {r['baseline']:.3f} -> {r['current']:.3f} ms ({r['change_pct']:+.1f}%)")
+            return 1
+        print(f"\nNo regressions beyond {args.threshold:.0%}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,157 @@
+"""Append-only, month-partitioned archive files for cold quotes.
+
+Each partition (`YYYY/quotes-YYYY-MM.ndjson.zst`) is a concatenation of
+independently compressed blocks. A block holds up to BLOCK_BYTES of NDJSON lines,
+one per quote, so similar records share a compression window. Whole files stay
+readable with standard tools (`zstdcat ... | jq`), and a single quote is read back
+with one seek and one block decompression: its reference is
+"<relative path>:<block offset>:<block length>:<line offset>", the line offset
+being the byte offset of the quote's line in the decompressed block. Every append
+also writes "<id>\\t<block offset>\\t<block length>\\t<line offset>" to a sidecar
+`.idx` file, so partitions can be re-indexed without the database. References
+without a line offset (one quote per block, as older archives were written) read
+the line at offset 0.
+
+zstandard is a listed requirement; installs without it write `.ndjson.gz`
+partitions with gzip members instead (`zcat` reads those).
+
+Files are only ever appended to. A crash mid-append leaves unreferenced bytes at
+the end of a partition, which readers never touch.
+"""
+import gzip
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+try:
+    import zstandard
+except ImportError:  # listed in requirements.txt; gzip members are the fallback
+    zstandard = None
+
+try:
+    import fcntl
+except ImportError:  # Windows: appends are only serialized within this process
+    fcntl = None
+
+ZSTD_LEVEL = 10
+GZIP_LEVEL = 6
+# Uncompressed bytes per block; reading one quote decompresses its whole block
+BLOCK_BYTES = 128 * 1024
+
+
+def partition_for(created_at: Any) -> str:
+    """YYYY-MM partition of an ISO timestamp ("unknown" if it has none)."""
+    text = str(created_at or "")
+    if len(text) >= 7 and text[:4].isdigit() and text[4] == "-" and text[5:7].isdigit():
+        return text[:7]
+    return "unknown"
+
+
+class QuoteArchive:
+    """Reads and appends archived quote records under `root`."""
+
+    def __init__(self, root: Union[str, Path], compression: Optional[str] = None):
+        self.root = Path(root)
+        if compression is None:
+            compression = "zstd" if zstandard is not None else "gzip"
+        if compression == "zstd" and zstandard is None:
+            print("zstandard is not installed; archiving with gzip")
+            compression = "gzip"
+        self.compression = compression
+        self._lock = threading.Lock()
+
+    def _relpath(self, partition: str) -> str:
+        ext = "zst" if self.compression == "zstd" else "gz"
+        year = partition[:4] if partition != "unknown" else "unknown"
+        return f"{year}/quotes-{partition}.ndjson.{ext}"
+
+    def _compress(self, data: bytes) -> bytes:
+        if self.compression == "zstd":
+            return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+        return gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+
+    @staticmethod
+    def _decompress(relpath: str, data: bytes) -> bytes:
+        if relpath.endswith(".zst"):
+            if zstandard is None:
+                raise ValueError(f"{relpath} needs zstandard, which is not installed")
+            return zstandard.ZstdDecompressor().decompress(data)
+        return gzip.decompress(data)
+
+    def _blocks(self, lines: List[Tuple[str, bytes]]) -> Iterator[Tuple[bytes, List[Tuple[str, int]]]]:
+        """Compressed blocks of NDJSON lines, with (id, line offset) for every line in each."""
+        block = bytearray()
+        members: List[Tuple[str, int]] = []
+        for quote_id, line in lines:
+            if block and len(block) + len(line) > BLOCK_BYTES:
+                yield self._compress(bytes(block)), members
+                block, members = bytearray(), []
+            members.append((quote_id, len(block)))
+            block += line
+        if block:
+            yield self._compress(bytes(block)), members
+
+    def append(self, records: Iterable[Dict[str, Any]]) -> Dict[str, str]:
+        """Append records (each with "id" and "created_at"); returns {id: reference}.
+
+        Data is fsynced before returning, so references can be committed to the
+        database afterwards.
+        """
+        by_partition: Dict[str, List[Tuple[str, bytes]]] = {}
+        for record in records:
+            line = json.dumps(record, separators=(",", ":"), ensure_ascii=False, default=str) + "\n"
+            by_partition.setdefault(partition_for(record.get("created_at")), []).append(
+                (record["id"], line.encode("utf-8"))
+            )
+
+        refs: Dict[str, str] = {}
+        with self._lock:
+            for partition, lines in by_partition.items():
+                blocks = list(self._blocks(lines))
+                relpath = self._relpath(partition)
+                path = self.root / relpath
+                path.parent.mkdir(parents=True, exist_ok=True)
+                index_lines = []
+                with open(path, "ab") as f:
+                    if fcntl is not None:
+                        fcntl.flock(f, fcntl.LOCK_EX)
+                    try:
+                        offset = f.seek(0, os.SEEK_END)
+                        for frame, members in blocks:
+                            f.write(frame)
+                            for quote_id, pos in members:
+                                refs[quote_id] = f"{relpath}:{offset}:{len(frame)}:{pos}"
+                                index_lines.append(f"{quote_id}\t{offset}\t{len(frame)}\t{pos}\n")
+                            offset += len(frame)
+                        f.flush()
+                        os.fsync(f.fileno())
+                    finally:
+                        if fcntl is not None:
+                            fcntl.flock(f, fcntl.LOCK_UN)
+                with open(path.with_suffix(path.suffix + ".idx"), "a", encoding="utf-8") as idx:
+                    idx.writelines(index_lines)
+                    idx.flush()
+                    os.fsync(idx.fileno())
+        return refs
+
+    def read(self, ref: str) -> Dict[str, Any]:
+        """The record stored at `ref`; raises ValueError if it cannot be read."""
+        try:
+            relpath, *location = ref.split(":")
+            if len(location) == 2:  # one quote per block
+                location.append("0")
+            offset, length, pos = (int(v) for v in location)
+            with open(self.root / relpath, "rb") as f:
+                f.seek(offset)
+                data = f.read(length)
+            block = self._decompress(relpath, data)
+            end = block.find(b"\n", pos)
+            return json.loads(block[pos:end if end >= 0 else len(block)])
+        except (OSError, EOFError, ValueError) as e:
+            raise ValueError(f"Cannot read archived quote {ref}: {e}") from e
+        except Exception as e:
+            if zstandard is not None and isinstance(e, zstandard.ZstdError):
+                raise ValueError(f"Cannot read archived quote {ref}: {e}") from e
+            raise
@@ -0,0 +1,56 @@
+"""
+Tiering job: move old quotes' large columns into the archive files (QUOTE_ARCHIVE_DIR)
+Safe to run while the API is serving (small batches, short transactions)
+
+Usage (from backend/):
+    python -m database.archive_quotes [--db PATH] [--older-than-days 180] [--batch-size 200] [--vacuum]
+"""
+
+import argparse
+import os
+
+from database.db import DatabaseService
+
+
+def archive(db_path=None, older_than_days=None, batch_size=200, pause_sec=0.05, vacuum=False):
+    """Archive quotes older than older_than_days; returns the job stats (or None on failure)."""
+    if older_than_days is None:
+        older_than_days = float(os.getenv("QUOTE_ARCHIVE_AFTER_DAYS", "180"))
+
+    db = DatabaseService(db_path)
+    print(f"Archiving quotes older than {older_than_days:g} days to {db._archive.root} ({db.backend.name})")
+    try:
+        def report(stats):
+            print(f"  {stats['rows']} quotes archived ({stats['skipped']} changed concurrently, retried on next run)")
+
+        stats = db.archive_quotes(older_than_days, batch_size=batch_size, pause_sec=pause_sec, progress=report)
+        print(f"✓ {stats['rows']} quotes archived, {stats['bytes_moved']:,} bytes moved out of the quotes table")
+        for partition in stats["partitions"]:
+            print(f"  {partition}")
+        if vacuum:
+            # On SQLite, VACUUM rewrites the whole file and blocks writers; run it in a quiet window
+            print("Running VACUUM...")
+            with db.backend.connection() as conn:
+                conn.execute("VACUUM")
+                if db.backend.name == "sqlite":
+                    # In WAL mode the file only shrinks once the WAL is checkpointed
+                    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        print("Archiving complete!")
+        return stats
+    except Exception as e:
+        print(f"✗ Archiving failed: {e}")
+        return None
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Move old quotes to the compressed archive files")
+    parser.add_argument("--db", help="SQLite database path (default: DATABASE_URL, else ./estimategenie.db)")
+    parser.add_argument("--older-than-days", type=float,
+                        help="archive quotes not updated for this long (default: QUOTE_ARCHIVE_AFTER_DAYS or 180)")
+    parser.add_argument("--batch-size", type=int, default=200)
+    parser.add_argument("--pause", type=float, default=0.05, help="seconds to pause between batches")
+    parser.add_argument("--vacuum", action="store_true", help="VACUUM afterwards to return freed pages")
+    args = parser.parse_args()
+    archive(args.db, args.older_than_days, args.batch_size, args.pause, args.vacuum)
@@ -0,0 +1,155 @@
+"""Compressed encoding for large JSON columns (vision_results, reasoning, estimate).
+
+Encoded values are BLOBs whose first byte records how they were written:
+high nibble = serialization (1 JSON, 2 MessagePack), low nibble = compression
+(0 none, 1 zlib, 2 zstd). Legacy rows are TEXT JSON, so any stored value can be
+decoded regardless of which codec is configured now; changing DB_COLUMN_CODEC
+only affects new writes.
+
+DB_COLUMN_CODEC: auto (default: msgpack-zstd if installed, else json-zlib),
+msgpack-zstd, json-zstd, json-zlib, or json (store plain JSON text as before).
+"""
+import json
+import os
+import threading
+import zlib
+from typing import Any, Callable, Dict, Optional, Tuple, Union
+
+try:
+    import zstandard
+except ImportError:  # zstd is optional; zlib is always available
+    zstandard = None
+
+try:
+    import msgpack
+except ImportError:  # MessagePack is optional; JSON is always available
+    msgpack = None
+
+FORMAT_JSON, FORMAT_MSGPACK = 1, 2
+COMPRESS_NONE, COMPRESS_ZLIB, COMPRESS_ZSTD = 0, 1, 2
+
+# Payloads smaller than this are stored uncompressed (the header would not pay off)
+MIN_COMPRESS_BYTES = 128
+ZLIB_LEVEL = 6
+ZSTD_LEVEL = 3
+
+_local = threading.local()
+
+
+def _zstd_compress(data: bytes) -> bytes:
+    # zstandard (de)compressor objects must not be shared between threads
+    comp = getattr(_local, "zstd_c", None)
+    if comp is None:
+        comp = _local.zstd_c = zstandard.ZstdCompressor(level=ZSTD_LEVEL)
+    return comp.compress(data)
+
+
+def _zstd_decompress(data: bytes) -> bytes:
+    dec = getattr(_local, "zstd_d", None)
+    if dec is None:
+        dec = _local.zstd_d = zstandard.ZstdDecompressor()
+    return dec.decompress(data)
+
+
+def _json_dumps(value: Any) -> bytes:
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def _json_loads(data: bytes) -> Any:
+    return json.loads(data)
+
+
+def _msgpack_dumps(value: Any) -> bytes:
+    return msgpack.packb(value, use_bin_type=True)
+
+
+def _msgpack_loads(data: bytes) -> Any:
+    return msgpack.unpackb(data, raw=False, strict_map_key=False)
+
+
+SERIALIZERS: Dict[int, Tuple[Callable[[Any], bytes], Callable[[bytes], Any]]] = {
+    FORMAT_JSON: (_json_dumps, _json_loads),
+    FORMAT_MSGPACK: (_msgpack_dumps, _msgpack_loads),
+}
+COMPRESSORS: Dict[int, Tuple[Callable[[bytes], bytes], Callable[[bytes], bytes]]] = {
+    COMPRESS_NONE: (bytes, bytes),
+    COMPRESS_ZLIB: (lambda b: zlib.compress(b, ZLIB_LEVEL), zlib.decompress),
+    COMPRESS_ZSTD: (_zstd_compress, _zstd_decompress),
+}
+CODECS: Dict[str, Optional[Tuple[int, int]]] = {
+    "json": None,  # legacy TEXT column
+    "json-zlib": (FORMAT_JSON, COMPRESS_ZLIB),
+    "json-zstd": (FORMAT_JSON, COMPRESS_ZSTD),
+    "msgpack-zstd": (FORMAT_MSGPACK, COMPRESS_ZSTD),
+}
+
+
+def _available(name: str) -> bool:
+    spec = CODECS[name]
+    if spec is None:
+        return True
+    fmt, comp = spec
+    return (fmt != FORMAT_MSGPACK or msgpack is not None) and (comp != COMPRESS_ZSTD or zstandard is not None)
+
+
+class ColumnCodec:
+    """Encodes values for one configured codec; decodes anything ever stored."""
+
+    def __init__(self, name: Optional[str] = None):
+        name = (name or os.getenv("DB_COLUMN_CODEC", "auto")).strip().lower()
+        if name == "auto":
+            name = "msgpack-zstd" if _available("msgpack-zstd") else "json-zlib"
+        if name not in CODECS:
+            print(f"Unknown DB_COLUMN_CODEC {name!r}; using json-zlib")
+            name = "json-zlib"
+        elif not _available(name):
+            print(f"DB_COLUMN_CODEC {name!r} needs msgpack/zstandard, which are not installed; using json-zlib")
+            name = "json-zlib"
+        self.name = name
+        self._spec = CODECS[name]
+
+    def encode(self, value: Any) -> Union[str, bytes]:
+        if self._spec is None:
+            return json.dumps(value)
+        fmt, comp = self._spec
+        payload = SERIALIZERS[fmt][0](value)
+        if len(payload) < MIN_COMPRESS_BYTES:
+            comp = COMPRESS_NONE
+        return bytes(((fmt << 4) | comp,)) + COMPRESSORS[comp][0](payload)
+
+    def is_current(self, stored: Any) -> bool:
+        """Whether a stored value already uses this codec (or is uncompressed by design)."""
+        if self._spec is None:
+            return not isinstance(stored, bytes)
+        if not isinstance(stored, bytes) or not stored:
+            return stored is None
+        fmt, comp = stored[0] >> 4, stored[0] & 0x0F
+        return fmt == self._spec[0] and comp in (self._spec[1], COMPRESS_NONE)
+
+
+def decode_column(stored: Any) -> Any:
+    """Decode a stored column value: legacy JSON text or a versioned BLOB.
+
+    Raises ValueError (or TypeError for non-str/bytes) for undecodable values.
+    """
+    if isinstance(stored, memoryview):
+        stored = bytes(stored)
+    if not isinstance(stored, bytes):
+        return json.loads(stored)
+    if not stored:
+        raise ValueError("Empty encoded column")
+    fmt, comp = stored[0] >> 4, stored[0] & 0x0F
+    try:
+        loads = SERIALIZERS[fmt][1]
+        decompress = COMPRESSORS[comp][1]
+    except KeyError:
+        raise ValueError(f"Unknown column encoding 0x{stored[0]:02x}") from None
+    try:
+        return loads(decompress(stored[1:]))
+    except (AttributeError, zlib.error) as e:
+        # AttributeError: stored with msgpack/zstd that are not installed here
+        raise ValueError(f"Cannot decode column encoding 0x{stored[0]:02x}: {e}") from e
+    except Exception as e:
+        if isinstance(e, ValueError):
+            raise
+        raise ValueError(f"Corrupt encoded column: {e}") from e
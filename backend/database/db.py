@@ -1,218 +1,953 @@
-import sqlite3
+import asyncio
+import base64
+import functools
 import json
-from typing import Dict, List, Optional, Any
-from datetime import datetime, timezone
-from pathlib import Path
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+from datetime import datetime, timedelta, timezone
+
+from .archive import QuoteArchive
+from .backend import StorageBackend, create_backend
+from .codec import ColumnCodec, decode_column
+from .rows import JsonColumn, LazyRow
+from .search import SCHEMA as SEARCH_SCHEMA, SEARCH_SQL, match_expression, owner_token, search_fields
+from .write_behind import WriteBehindQueue
+
+# Ordered schema migrations; the backend records how many have been applied (PRAGMA
+# user_version on SQLite). Append new steps, never edit applied ones. A statement is
+# SQL for every backend, or {backend name: SQL or None} where the engines differ.
+MIGRATIONS: List[Tuple[Union[str, Dict[str, Optional[str]]], ...]] = [
+    # 1: list_quotes indexes. id is the keyset tie-breaker, so it is part of each index
+    # and cursor pages are served straight from the index in order
+    (
+        "CREATE INDEX IF NOT EXISTS idx_quotes_user_created ON quotes (user_id, created_at, id)",
+        "CREATE INDEX IF NOT EXISTS idx_quotes_user_type_created ON quotes (user_id, project_type, created_at, id)",
+    ),
+    # 2: estimate total as its own column, so summary listings never read the estimate blob
+    (
+        {
+            "sqlite": "ALTER TABLE quotes ADD COLUMN total_amount REAL",
+            "postgres": "ALTER TABLE quotes ADD COLUMN IF NOT EXISTS total_amount DOUBLE PRECISION",
+        },
+        # Only SQLite can hold legacy plain-JSON estimates
+        {
+            "sqlite": "UPDATE quotes SET total_amount = json_extract(estimate, '$.total_cost.amount') "
+            "WHERE json_valid(estimate) AND json_type(estimate, '$.total_cost.amount') IN ('integer', 'real')",
+            "postgres": None,
+        },
+    ),
+    # 3: hot/cold tiering. Archived quotes keep a stub row whose archive_ref points at
+    # their record in the archive files; created_at drives the tiering scan
+    (
+        "ALTER TABLE quotes ADD COLUMN archive_ref TEXT",
+        "ALTER TABLE quotes ADD COLUMN archived_at TEXT",
+        "CREATE INDEX IF NOT EXISTS idx_quotes_created ON quotes (created_at, id)",
+    ),
+    # 4: full-text search (database/search.py); existing quotes are indexed by
+    # python -m database.reindex_quotes
+    SEARCH_SCHEMA,
+    # 5: re-priced quotes left alone because they changed while the job ran
+    ("ALTER TABLE repricing_jobs ADD COLUMN skipped INTEGER DEFAULT 0",),
+]
+
+# Light columns for dashboard listings (view=summary)
+SUMMARY_COLUMNS = ("id", "user_id", "project_type", "status", "created_at", "updated_at", "total_amount")
+
+# Large JSON columns written through the configured ColumnCodec (compressed BLOBs)
+BLOB_COLUMNS = ("vision_results", "reasoning", "estimate")
+
+# Columns moved to the archive files by archive_quotes; stub rows keep the rest
+ARCHIVED_COLUMNS = BLOB_COLUMNS + ("scope", "phases", "risks")
+
+# Encoded columns and how to decode them; LazyRow applies these on first access
+ROW_DECODERS = {
+    "vision_results": JsonColumn(dict),
+    "reasoning": JsonColumn(dict),
+    "estimate": JsonColumn(dict),
+    "phases": JsonColumn(list),
+    "risks": JsonColumn(list),
+    # scope is often a plain string; if JSON decode fails, leave as string
+    "scope": JsonColumn(),
+}
+
+
+def _stored_size(value: Any) -> int:
+    if value is None:
+        return 0
+    return len(value.encode("utf-8")) if isinstance(value, str) else len(value)
+
+
+def estimate_total(estimate: Any) -> Optional[float]:
+    """total_cost.amount of an estimate dict, or None."""
+    try:
+        return float(estimate["total_cost"]["amount"])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def encode_quote_cursor(created_at: str, quote_id: str) -> str:
+    raw = json.dumps({"c": created_at, "i": quote_id}, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_quote_cursor(cursor: str) -> Tuple[str, str]:
+    """Return (created_at, id) of the last quote on the previous page; raises ValueError if invalid."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        return str(data["c"]), str(data["i"])
+    except Exception as e:
+        raise ValueError("Invalid cursor") from e
 
 class DatabaseService:
-    """Handles all database operations"""
-    
-    def __init__(self, db_path: str = "estimategenie.db"):
-        self.db_path = Path(db_path)
+    """Handles all database operations
+
+    Connections come from a StorageBackend: a WAL-mode SQLite pool, or an
+    asyncpg pool when DATABASE_URL points at PostgreSQL (so several API
+    replicas can share the data). The async methods run their blocking
+    database work on a bounded thread pool (one thread per pooled connection)
+    so slow disk or network never stalls the event loop.
+
+    Intermediate pipeline status updates can go through queue_quote_update,
+    which coalesces them per quote and group-commits across quotes every
+    DB_WRITE_BEHIND_MS (0 writes them immediately).
+
+    Callbacks registered with on_quote_change are told the id of every quote
+    this service updates or deletes (e.g. to drop cached responses).
+
+    archive_quotes moves the large columns of old quotes to append-only files
+    under QUOTE_ARCHIVE_DIR; reads rehydrate them transparently.
+    """
+
+    def __init__(
+        self,
+        db_path: Optional[str] = None,
+        pool_size: Optional[int] = None,
+        database_url: Optional[str] = None,
+    ):
+        """db_path selects a SQLite file; otherwise database_url or DATABASE_URL, else ./estimategenie.db."""
+        size = pool_size or int(os.getenv("DB_POOL_SIZE", "4"))
+        self._pool = create_backend(db_path, size=size, database_url=database_url)
+        self.db_path = getattr(self._pool, "db_path", None)
+        self._executor = ThreadPoolExecutor(max_workers=size, thread_name_prefix="db")
+        self._change_listeners: List[Callable[[str], Any]] = []
+        self._codec = ColumnCodec()
+        if self._codec.name == "json" and self._pool.name != "sqlite":
+            # Only SQLite columns can hold either text or bytes
+            print("DB_COLUMN_CODEC 'json' needs SQLite; using json-zlib")
+            self._codec = ColumnCodec("json-zlib")
+        self._archive = QuoteArchive(os.getenv("QUOTE_ARCHIVE_DIR") or (
+            self.db_path.parent / "quote_archive" if self.db_path else "quote_archive"
+        ))
         self._init_database()
-    
+        with self._pool.connection() as conn:
+            self._quote_columns = self._pool.table_columns(conn, "quotes")
+        self._write_behind = WriteBehindQueue(
+            self._write_quote_batch,
+            interval_sec=int(os.getenv("DB_WRITE_BEHIND_MS", "50")) / 1000,
+            max_batch=int(os.getenv("DB_WRITE_BEHIND_MAX_BATCH", "256")),
+            name="quote-write-behind",
+        )
+
+    async def _run(self, fn, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(fn, *args, **kwargs))
+
+    def close(self) -> None:
+        """Commit queued updates, stop the executor and close pooled connections."""
+        self._executor.shutdown(wait=True)
+        self._write_behind.close()
+        self._pool.close()
+
+    @property
+    def backend(self) -> StorageBackend:
+        """The storage backend, for services that share this database (e.g. AuthService)."""
+        return self._pool
+
+    def on_quote_change(self, listener: Callable[[str], Any]) -> None:
+        """Call listener(quote_id) after a quote is updated, queued for update or deleted."""
+        self._change_listeners.append(listener)
+
+    def _quote_changed(self, quote_id: str) -> None:
+        for listener in self._change_listeners:
+            try:
+                listener(quote_id)
+            except Exception as e:
+                print(f"Quote change listener error: {e}")
+
+    def pool_stats(self) -> Dict[str, Any]:
+        return {"backend": self._pool.name, **self._pool.stats()}
+
+    def write_behind_stats(self) -> Dict[str, Any]:
+        return self._write_behind.stats()
+
     def _init_database(self):
         """Initialize database schema"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        # Quotes table
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS quotes (
-                id TEXT PRIMARY KEY,
-                user_id TEXT,
-                project_type TEXT,
-                    scope TEXT,
-                    phases TEXT,
-                    risks TEXT,
-                image_path TEXT,
-                vision_results TEXT,
-                reasoning TEXT,
-                estimate TEXT,
-                status TEXT,
-                created_at TEXT,
-                updated_at TEXT
-            )
-        """)
-        
-        # Materials table
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS materials (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT UNIQUE,
-                price REAL,
-                unit TEXT,
-                description TEXT,
-                updated_at TEXT
-            )
-        """)
-        
-        conn.commit()
-        conn.close()
-    
+        t = self._pool.types
+        with self._pool.connection() as conn:
+            with conn:
+                self._pool.lock_schema(conn)
+
+                # Quotes table
+                conn.execute(f"""
+                    CREATE TABLE IF NOT EXISTS quotes (
+                        id TEXT PRIMARY KEY,
+                        user_id TEXT,
+                        project_type TEXT,
+                        scope TEXT,
+                        phases TEXT,
+                        risks TEXT,
+                        image_path TEXT,
+                        vision_results {t['json_blob']},
+                        reasoning {t['json_blob']},
+                        estimate {t['json_blob']},
+                        status TEXT,
+                        created_at TEXT,
+                        updated_at TEXT
+                    )
+                """)
+
+                # Estimate versions written by re-pricing jobs (version 1 is the original estimate)
+                conn.execute(f"""
+                    CREATE TABLE IF NOT EXISTS quote_estimate_versions (
+                        id {t['serial_pk']},
+                        quote_id TEXT NOT NULL,
+                        version INTEGER NOT NULL,
+                        estimate {t['json_blob']},
+                        delta TEXT,
+                        price_snapshot_version INTEGER,
+                        job_id TEXT,
+                        created_at TEXT,
+                        UNIQUE (quote_id, version)
+                    )
+                """)
+
+                # Re-pricing job state; last_quote_id is the resume checkpoint
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS repricing_jobs (
+                        id TEXT PRIMARY KEY,
+                        status TEXT,
+                        params TEXT,
+                        last_quote_id TEXT,
+                        processed INTEGER DEFAULT 0,
+                        updated INTEGER DEFAULT 0,
+                        unchanged INTEGER DEFAULT 0,
+                        failed INTEGER DEFAULT 0,
+                        error TEXT,
+                        created_at TEXT,
+                        updated_at TEXT,
+                        finished_at TEXT
+                    )
+                """)
+
+                # Materials table
+                conn.execute(f"""
+                    CREATE TABLE IF NOT EXISTS materials (
+                        id {t['serial_pk']},
+                        name TEXT UNIQUE,
+                        price {t['real']},
+                        unit TEXT,
+                        description TEXT,
+                        updated_at TEXT
+                    )
+                """)
+
+            self._migrate(conn)
+
+    def _migrate(self, conn) -> None:
+        """Apply pending MIGRATIONS, each in its own transaction (under the schema lock)."""
+        while True:
+            with conn:
+                self._pool.lock_schema(conn)
+                version = self._pool.schema_version(conn)
+                if version >= len(MIGRATIONS):
+                    return
+                for statement in MIGRATIONS[version]:
+                    if isinstance(statement, dict):
+                        statement = statement.get(self._pool.name)
+                    if statement:
+                        conn.execute(statement)
+                self._pool.set_schema_version(conn, version + 1)
+            print(f"Database migrated to schema version {version + 1}")
+
     def is_connected(self) -> bool:
         """Check database connection"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            conn.close()
+            with self._pool.connection() as conn:
+                conn.execute("SELECT 1").fetchone()
             return True
-        except:
+        except Exception:
             return False
-    
+
+    async def ping(self) -> bool:
+        """is_connected() without blocking the event loop."""
+        return await self._run(self.is_connected)
+
     async def save_quote(self, quote_data: Dict) -> bool:
         """Save a new quote to database"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
+        return await self._run(self._save_quote, quote_data)
+
+    def _save_quote(self, quote_data: Dict) -> bool:
         try:
-            cursor.execute("""
-                INSERT INTO quotes (
-                    id, user_id, project_type, scope, phases, risks, image_path, vision_results,
-                    reasoning, estimate, status, created_at, updated_at
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (
-                quote_data["id"],
-                quote_data.get("user_id"),
-                quote_data["project_type"],
-                json.dumps(quote_data.get("scope")) if quote_data.get("scope") is not None else None,
-                json.dumps(quote_data.get("phases")) if quote_data.get("phases") is not None else None,
-                json.dumps(quote_data.get("risks")) if quote_data.get("risks") is not None else None,
-                quote_data["image_path"],
-                json.dumps(quote_data["vision_results"]),
-                json.dumps(quote_data["reasoning"]),
-                json.dumps(quote_data["estimate"]),
-                quote_data["status"],
-                quote_data["created_at"].isoformat(),
-                datetime.now(timezone.utc).isoformat()
-            ))
-            
-            conn.commit()
+            with self._pool.connection() as conn, conn:
+                conn.execute("""
+                    INSERT INTO quotes (
+                        id, user_id, project_type, scope, phases, risks, image_path, vision_results,
+                        reasoning, estimate, total_amount, status, created_at, updated_at
+                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """, (
+                    quote_data["id"],
+                    quote_data.get("user_id"),
+                    quote_data["project_type"],
+                    json.dumps(quote_data.get("scope")) if quote_data.get("scope") is not None else None,
+                    json.dumps(quote_data.get("phases")) if quote_data.get("phases") is not None else None,
+                    json.dumps(quote_data.get("risks")) if quote_data.get("risks") is not None else None,
+                    quote_data["image_path"],
+                    self._codec.encode(quote_data["vision_results"]),
+                    self._codec.encode(quote_data["reasoning"]),
+                    self._codec.encode(quote_data["estimate"]),
+                    estimate_total(quote_data["estimate"]),
+                    quote_data["status"],
+                    quote_data["created_at"].isoformat(),
+                    datetime.now(timezone.utc).isoformat()
+                ))
+                self._index_quote(
+                    conn, quote_data["id"], search_fields(quote_data), quote_data.get("user_id"), create=True
+                )
             return True
         except Exception as e:
             print(f"Database save error: {e}")
             return False
-        finally:
-            conn.close()
-    
+
     async def get_quote(self, quote_id: str) -> Optional[Dict]:
         """Retrieve a quote by ID"""
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
-        
-        cursor.execute("SELECT * FROM quotes WHERE id = ?", (quote_id,))
-        row = cursor.fetchone()
-        conn.close()
-        
+        return await self._run(self._get_quote, quote_id)
+
+    def _get_quote(self, quote_id: str) -> Optional[Dict]:
+        with self._pool.connection() as conn:
+            row = conn.execute("SELECT * FROM quotes WHERE id = ?", (quote_id,)).fetchone()
+
         if not row:
             return None
-        
+
         return self._row_to_dict(row)
-    
+
+    async def get_quote_version(self, quote_id: str) -> Optional[str]:
+        """updated_at of a quote (queued updates included), or None if it does not exist.
+
+        Reads one indexed column, so pollers can check for changes without
+        fetching and decoding the whole row.
+        """
+        return await self._run(self._get_quote_version, quote_id)
+
+    def _get_quote_version(self, quote_id: str) -> Optional[str]:
+        with self._pool.connection() as conn:
+            row = conn.execute("SELECT updated_at FROM quotes WHERE id = ?", (quote_id,)).fetchone()
+        if not row:
+            return None
+        queued = self._write_behind.peek(quote_id)
+        if queued and queued.get("updated_at"):
+            return queued["updated_at"]
+        return row["updated_at"] or ""
+
     async def list_quotes(
         self,
         limit: int = 10,
         offset: int = 0,
         project_type: Optional[str] = None,
-        user_id: Optional[str] = None
+        user_id: Optional[str] = None,
+        summary: bool = False,
+    ) -> List[Dict]:
+        """List quotes with pagination and optional user filtering
+
+        summary=True reads only SUMMARY_COLUMNS (no vision/reasoning/estimate blobs).
+        """
+        return await self._run(self._list_quotes, limit, offset, project_type, user_id, summary)
+
+    def _list_quotes(
+        self,
+        limit: int,
+        offset: int,
+        project_type: Optional[str],
+        user_id: Optional[str],
+        summary: bool = False,
     ) -> List[Dict]:
-        """List quotes with pagination and optional user filtering"""
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
-        
         query_parts = []
         params = []
-        
+
         if user_id:
             query_parts.append("user_id = ?")
             params.append(user_id)
-        
+
         if project_type:
             query_parts.append("project_type = ?")
             params.append(project_type)
-        
+
         where_clause = " AND ".join(query_parts) if query_parts else "1=1"
-        
+
         query = f"""
-            SELECT * FROM quotes 
+            SELECT {self._columns(summary)} FROM quotes
             WHERE {where_clause}
-            ORDER BY created_at DESC
+            ORDER BY created_at DESC, id DESC
             LIMIT ? OFFSET ?
         """
         params.extend([limit, offset])
-        
-        cursor.execute(query, tuple(params))
-        rows = cursor.fetchall()
-        conn.close()
-        
+
+        with self._pool.connection() as conn:
+            rows = conn.execute(query, tuple(params)).fetchall()
+
         return [self._row_to_dict(row) for row in rows]
-    
+
+    async def list_quotes_page(
+        self,
+        limit: int = 10,
+        cursor: Optional[str] = None,
+        project_type: Optional[str] = None,
+        user_id: Optional[str] = None,
+        summary: bool = False,
+    ) -> Dict[str, Any]:
+        """Keyset-paginated quotes, newest first: {"quotes", "next_cursor"}.
+
+        Unlike offsets, a cursor page costs the same at any depth; raises ValueError
+        for a malformed cursor.
+        """
+        after = decode_quote_cursor(cursor) if cursor else None
+        return await self._run(self._list_quotes_page, limit, after, project_type, user_id, summary)
+
+    def _list_quotes_page(
+        self,
+        limit: int,
+        after: Optional[Tuple[str, str]],
+        project_type: Optional[str],
+        user_id: Optional[str],
+        summary: bool = False,
+    ) -> Dict[str, Any]:
+        query_parts = []
+        params: List[Any] = []
+        if user_id:
+            query_parts.append("user_id = ?")
+            params.append(user_id)
+        if project_type:
+            query_parts.append("project_type = ?")
+            params.append(project_type)
+        if after:
+            query_parts.append("(created_at, id) < (?, ?)")
+            params.extend(after)
+        where_clause = " AND ".join(query_parts) if query_parts else "1=1"
+        # One extra row tells whether another page exists
+        params.append(limit + 1)
+
+        with self._pool.connection() as conn:
+            rows = conn.execute(
+                f"SELECT {self._columns(summary)} FROM quotes WHERE {where_clause} "
+                "ORDER BY created_at DESC, id DESC LIMIT ?",
+                params,
+            ).fetchall()
+
+        page = rows[:limit]
+        next_cursor = None
+        if len(rows) > limit and page:
+            next_cursor = encode_quote_cursor(page[-1]["created_at"], page[-1]["id"])
+        return {"quotes": [self._row_to_dict(row) for row in page], "next_cursor": next_cursor}
+
+    async def search_quotes(
+        self,
+        user_id: str,
+        query: str,
+        limit: int = 20,
+        offset: int = 0,
+        project_type: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """One user's quotes matching every word of `query`, best first: {"quotes", "next_offset"}.
+
+        Matches scope, description, material names and scene description (the last
+        word also as a prefix). Each result has SUMMARY_COLUMNS plus `snippet` and
+        `score`. Raises ValueError if the query has no words.
+        """
+        match = match_expression(self._pool.name, query, user_id)
+        if match is None:
+            raise ValueError("Search query needs at least one word")
+        return await self._run(self._search_quotes, user_id, match, limit, offset, project_type)
+
+    def _search_quotes(
+        self,
+        user_id: str,
+        match: str,
+        limit: int,
+        offset: int,
+        project_type: Optional[str],
+    ) -> Dict[str, Any]:
+        filters, params = "", [match, user_id]
+        if self._pool.name != "sqlite":
+            # Also used by the headline and the rank
+            params = [match, match, *params]
+        if project_type:
+            filters = "AND q.project_type = ?"
+            params.append(project_type)
+        # One extra row tells whether another page exists
+        params.extend([limit + 1, offset])
+        columns = ", ".join(f"q.{c}" for c in SUMMARY_COLUMNS)
+        with self._pool.connection() as conn:
+            query = SEARCH_SQL[self._pool.name].format(columns=columns, filters=filters)
+            rows = conn.execute(query, params).fetchall()
+
+        quotes = [self._row_to_dict(row) for row in rows[:limit]]
+        return {"quotes": quotes, "next_offset": offset + limit if len(rows) > limit else None}
+
+    @staticmethod
+    def _columns(summary: bool) -> str:
+        return ", ".join(SUMMARY_COLUMNS) if summary else "*"
+
     async def update_quote(self, quote_id: str, updates: Dict[str, Any]) -> bool:
-        """Update a quote"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
+        """Update a quote now (together with any updates still queued for it)"""
+        return await self._run(self._update_quote, quote_id, updates)
+
+    def _update_quote(self, quote_id: str, updates: Dict[str, Any]) -> bool:
+        queued = None
         try:
-            # Build dynamic update query
-            fields = []
-            values = []
-            for key, value in updates.items():
-                if key in ["estimate", "vision_results", "reasoning", "phases", "risks"]:
-                    value = json.dumps(value)
-                fields.append(f"{key} = ?")
-                values.append(value)
-            
-            fields.append("updated_at = ?")
-            values.append(datetime.now(timezone.utc).isoformat())
-            values.append(quote_id)
-            
-            query = f"UPDATE quotes SET {', '.join(fields)} WHERE id = ?"
-            cursor.execute(query, values)
-            
-            conn.commit()
-            return cursor.rowcount > 0
+            row = self._quote_row_updates(updates)
+            queued = self._write_behind.pop(quote_id)
+            if queued:
+                row = {**queued, **row}
+            with self._pool.connection() as conn, conn:
+                updated = self._write_quote_row(conn, quote_id, row)
+            if updated:
+                self._quote_changed(quote_id)
+            return updated
         except Exception as e:
             print(f"Database update error: {e}")
+            if queued:
+                # Not written: hand the queued updates back to the group commit
+                self._write_behind.requeue(quote_id, queued)
             return False
-        finally:
-            conn.close()
-    
+
+    async def queue_quote_update(self, quote_id: str, updates: Dict[str, Any]) -> None:
+        """Queue an update for the next group commit (write-behind).
+
+        Successive queued updates to a quote are merged, and reads see them before
+        they are committed. Use update_quote (or flush_quote_updates) for a final
+        state that must be on disk. Raises ValueError for unknown columns, since
+        the write itself happens later on another thread.
+        """
+        unknown = set(updates) - self._quote_columns
+        if unknown:
+            raise ValueError(f"Unknown quote columns: {sorted(unknown)}")
+        row = self._quote_row_updates(updates)
+        if self._write_behind.interval_sec <= 0:
+            await self._run(self._update_quote, quote_id, row)
+            return
+        self._write_behind.put(quote_id, row)
+        self._quote_changed(quote_id)
+
+    async def flush_quote_updates(self) -> int:
+        """Commit all queued quote updates now; returns how many quotes were written."""
+        return await self._run(self._write_behind.flush)
+
+    @staticmethod
+    def _quote_row_updates(updates: Dict[str, Any]) -> Dict[str, Any]:
+        """Column values for an update, with derived columns (unencoded)"""
+        row = dict(updates)
+        if "estimate" in row:
+            row["total_amount"] = estimate_total(row["estimate"])
+        row["updated_at"] = datetime.now(timezone.utc).isoformat()
+        return row
+
+    def _write_quote_row(self, conn, quote_id: str, row: Dict[str, Any]) -> bool:
+        values = []
+        for key, value in row.items():
+            if key in BLOB_COLUMNS:
+                value = self._codec.encode(value)
+            elif key in ["phases", "risks"]:
+                value = json.dumps(value)
+            values.append(value)
+        values.append(quote_id)
+        query = f"UPDATE quotes SET {', '.join(f'{key} = ?' for key in row)} WHERE id = ?"
+        updated = conn.execute(query, values).rowcount > 0
+        if updated:
+            self._index_quote(conn, quote_id, search_fields(row))
+        return updated
+
+    def _index_quote(
+        self, conn, quote_id: str, fields: Dict[str, str], user_id: Any = None, create: bool = False
+    ) -> None:
+        """Write search text for a quote (inside the caller's transaction).
+
+        create=True adds the quote_search row (new quotes, reindexing); otherwise
+        only the given fields of an existing row change.
+        """
+        if not create:
+            if fields:
+                conn.execute(
+                    f"UPDATE quote_search SET {', '.join(f'{k} = ?' for k in fields)} WHERE quote_id = ?",
+                    (*fields.values(), quote_id),
+                )
+            return
+        row = {"quote_id": quote_id, "user_id": user_id, **fields}
+        if self._pool.name == "sqlite":
+            row["owner"] = owner_token(user_id)
+        conn.execute(
+            f"INSERT INTO quote_search ({', '.join(row)}) VALUES ({', '.join('?' * len(row))}) "
+            f"ON CONFLICT (quote_id) DO UPDATE SET {', '.join(f'{c} = excluded.{c}' for c in list(row)[1:])}",
+            tuple(row.values()),
+        )
+
+    def _write_quote_batch(self, batch: Dict[str, Dict[str, Any]]) -> None:
+        """Group commit for the write-behind queue: every queued quote in one transaction"""
+        with self._pool.connection() as conn, conn:
+            for quote_id, row in batch.items():
+                self._write_quote_row(conn, quote_id, row)
+
     async def delete_quote(self, quote_id: str) -> bool:
         """Delete a quote"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute("DELETE FROM quotes WHERE id = ?", (quote_id,))
-        deleted = cursor.rowcount > 0
-        
-        conn.commit()
-        conn.close()
-        
-        return deleted
-    
-    def _row_to_dict(self, row: sqlite3.Row) -> Dict:
-        """Convert database row to dictionary"""
+        return await self._run(self._delete_quote, quote_id)
+
+    def _delete_quote(self, quote_id: str) -> bool:
+        self._write_behind.pop(quote_id)
+        with self._pool.connection() as conn, conn:
+            cursor = conn.execute("DELETE FROM quotes WHERE id = ?", (quote_id,))
+            conn.execute("DELETE FROM quote_search WHERE quote_id = ?", (quote_id,))
+            conn.execute("DELETE FROM quote_estimate_versions WHERE quote_id = ?", (quote_id,))
+        self._quote_changed(quote_id)
+        return cursor.rowcount > 0
+
+    # --- Column encoding migration (synchronous; safe to run while the API is serving) ---
+    def migrate_column_encoding(
+        self,
+        batch_size: int = 500,
+        pause_sec: float = 0.05,
+        progress=None,
+    ) -> Dict[str, Any]:
+        """Re-encode BLOB_COLUMNS of existing quotes with the configured codec, in batches.
+
+        Each batch is its own short transaction, with a pause between batches so API
+        writes are not starved of the write lock. A row updated between read and write
+        is skipped (its new value was already written with the current codec).
+        Returns counts and stored bytes before/after; run VACUUM afterwards to shrink
+        the file.
+        """
+        stats = {"codec": self._codec.name, "rows": 0, "skipped": 0, "bytes_before": 0, "bytes_after": 0}
+        columns = ", ".join(BLOB_COLUMNS)
+        last_id = ""
+        while True:
+            with self._pool.connection() as conn:
+                rows = conn.execute(
+                    f"SELECT id, updated_at, {columns} FROM quotes WHERE id > ? ORDER BY id LIMIT ?",
+                    (last_id, batch_size),
+                ).fetchall()
+                if not rows:
+                    break
+                last_id = rows[-1]["id"]
+                updates = []
+                for row in rows:
+                    if all(self._codec.is_current(row[c]) for c in BLOB_COLUMNS):
+                        continue
+                    encoded = []
+                    for c in BLOB_COLUMNS:
+                        raw = row[c]
+                        if raw is None or self._codec.is_current(raw):
+                            encoded.append(raw)
+                            continue
+                        try:
+                            encoded.append(self._codec.encode(decode_column(raw)))
+                        except (TypeError, ValueError):
+                            # Leave undecodable values as they are
+                            encoded.append(raw)
+                    sizes = (sum(map(_stored_size, (row[c] for c in BLOB_COLUMNS))), sum(map(_stored_size, encoded)))
+                    updates.append(((*encoded, row["id"], row["updated_at"]), sizes))
+                if updates:
+                    with conn:
+                        sets = ", ".join(f"{c} = ?" for c in BLOB_COLUMNS)
+                        for params, (before, after) in updates:
+                            cursor = conn.execute(
+                                f"UPDATE quotes SET {sets} WHERE id = ? AND COALESCE(updated_at, '') = COALESCE(?, '')",
+                                params,
+                            )
+                            if cursor.rowcount:
+                                stats["rows"] += 1
+                                stats["bytes_before"] += before
+                                stats["bytes_after"] += after
+                            else:
+                                stats["skipped"] += 1
+            if progress:
+                progress(stats)
+            if pause_sec:
+                time.sleep(pause_sec)
+        return stats
+
+    # --- Hot/cold tiering (synchronous; safe to run while the API is serving) ---
+    def archive_quotes(
+        self,
+        older_than_days: float,
+        batch_size: int = 200,
+        pause_sec: float = 0.05,
+        progress=None,
+    ) -> Dict[str, Any]:
+        """Move ARCHIVED_COLUMNS of quotes not created or updated for `older_than_days` to the archive.
+
+        Each batch is appended (and fsynced) to the month partitions of the archive
+        first; then, in one short transaction, the rows become stubs: the archived
+        columns are cleared and archive_ref records where the quote went. Summary
+        columns, status and timestamps stay in the row. A quote updated in between
+        is skipped (its archived record is left unreferenced). Returns counts and
+        the stored bytes moved out of the table; VACUUM afterwards to shrink it.
+        """
+        cutoff = (datetime.now(timezone.utc) - timedelta(days=older_than_days)).isoformat()
+        stats = {"rows": 0, "skipped": 0, "bytes_moved": 0, "partitions": set()}
+        # Queued updates must be in the rows before they are copied
+        self._write_behind.flush()
+        last = ("", "")
+        while True:
+            with self._pool.connection() as conn:
+                rows = conn.execute(
+                    "SELECT * FROM quotes WHERE created_at < ? AND (created_at > ? OR (created_at = ? AND id > ?)) "
+                    "AND archive_ref IS NULL ORDER BY created_at, id LIMIT ?",
+                    (cutoff, last[0], last[0], last[1], batch_size),
+                ).fetchall()
+                if not rows:
+                    break
+                last = (rows[-1]["created_at"], rows[-1]["id"])
+                rows = [
+                    row for row in rows
+                    if (row["updated_at"] or "") < cutoff and not self._write_behind.peek(row["id"])
+                ]
+                records = []
+                for row in rows:
+                    record = self._row_to_dict(row).to_dict()
+                    del record["archive_ref"], record["archived_at"]
+                    records.append(record)
+                refs = self._archive.append(records)
+                if rows:
+                    now = datetime.now(timezone.utc).isoformat()
+                    clear = ", ".join(f"{c} = NULL" for c in ARCHIVED_COLUMNS)
+                    with conn:
+                        for row in rows:
+                            ref = refs[row["id"]]
+                            cursor = conn.execute(
+                                f"UPDATE quotes SET {clear}, archive_ref = ?, archived_at = ? WHERE id = ? "
+                                "AND archive_ref IS NULL AND COALESCE(updated_at, '') = COALESCE(?, '')",
+                                (ref, now, row["id"], row["updated_at"]),
+                            )
+                            if cursor.rowcount:
+                                stats["rows"] += 1
+                                stats["bytes_moved"] += sum(_stored_size(row[c]) for c in ARCHIVED_COLUMNS)
+                                stats["partitions"].add(ref.split(":", 1)[0])
+                            else:
+                                stats["skipped"] += 1
+            if progress:
+                progress(stats)
+            if pause_sec:
+                time.sleep(pause_sec)
+        stats["partitions"] = sorted(stats["partitions"])
+        return stats
+
+    def reindex_quotes(self, batch_size: int = 500, pause_sec: float = 0.05, progress=None) -> Dict[str, Any]:
+        """(Re)build quote_search from the quotes table, in batches; returns {"rows"}.
+
+        New and updated quotes are indexed as they are written; this fills the index
+        for quotes saved before it existed. Upload descriptions are only kept in
+        quote_search, so indexed ones are preserved and older quotes have none.
+        """
+        stats = {"rows": 0}
+        last_id = ""
+        while True:
+            with self._pool.connection() as conn:
+                rows = conn.execute(
+                    "SELECT id, user_id, scope, vision_results, estimate, archive_ref FROM quotes "
+                    "WHERE id > ? ORDER BY id LIMIT ?",
+                    (last_id, batch_size),
+                ).fetchall()
+                if not rows:
+                    break
+                last_id = rows[-1]["id"]
+                with conn:
+                    for row in rows:
+                        quote = self._row_to_dict(row)
+                        self._index_quote(conn, quote["id"], search_fields(quote), quote["user_id"], create=True)
+                stats["rows"] += len(rows)
+            if progress:
+                progress(stats)
+            if pause_sec:
+                time.sleep(pause_sec)
+        return stats
+
+    def _rehydrate(self, values: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Archived record of a stub row, or None if the archive cannot be read."""
+        try:
+            record = self._archive.read(values["archive_ref"])
+        except ValueError as e:
+            print(f"Archive read error: {e}")
+            return None
+        if record.get("id") != values.get("id"):
+            print(f"Archive read error: {values['archive_ref']} holds {record.get('id')}, not {values.get('id')}")
+            return None
+        return record
+
+    # --- Re-pricing jobs (synchronous; run off the event loop) ---
+    def fetch_quotes_after(
+        self,
+        after_id: Optional[str],
+        limit: int,
+        statuses: Optional[List[str]] = None,
+    ) -> List[Dict]:
+        """Next `limit` quotes ordered by id after `after_id` (keyset scan for batch jobs).
+
+        Queued updates are committed first, so updated_at is what is on disk; pass it
+        back to save_repriced_estimates to detect rows changed in the meantime.
+        """
+        self._write_behind.flush()
+        clauses = ["id > ?"]
+        params: List[Any] = [after_id or ""]
+        if statuses:
+            clauses.append(f"status IN ({','.join('?' * len(statuses))})")
+            params.extend(statuses)
+        params.append(limit)
+        with self._pool.connection() as conn:
+            rows = conn.execute(
+                f"SELECT id, project_type, vision_results, reasoning, estimate, status, archive_ref, updated_at FROM quotes "
+                f"WHERE {' AND '.join(clauses)} ORDER BY id LIMIT ?",
+                params,
+            ).fetchall()
+        return [self._row_to_dict(row) for row in rows]
+
+    def save_repriced_estimates(
+        self,
+        job_id: str,
+        results: List[Dict[str, Any]],
+        last_quote_id: str,
+        counts: Dict[str, int],
+    ) -> None:
+        """Write new estimate versions and advance the job checkpoint in one transaction.
+
+        Each result has quote_id, updated_at (as read by fetch_quotes_after),
+        old_estimate, estimate and delta. The first time a quote is re-priced its
+        original estimate is kept as version 1. A quote updated since it was read, or
+        with updates still queued, is skipped rather than overwritten with a re-price
+        of stale inputs. `counts` gives processed, unchanged and failed; updated and
+        skipped are counted here.
+        """
+        now = datetime.now(timezone.utc).isoformat()
+        written = []
+        with self._pool.connection() as conn, conn:
+            for res in results:
+                quote_id = res["quote_id"]
+                if self._write_behind.peek(quote_id):
+                    continue
+                cursor = conn.execute(
+                    "UPDATE quotes SET estimate = ?, total_amount = ?, updated_at = ? "
+                    "WHERE id = ? AND COALESCE(updated_at, '') = COALESCE(?, '')",
+                    (
+                        self._codec.encode(res["estimate"]), estimate_total(res["estimate"]), now,
+                        quote_id, res.get("updated_at"),
+                    ),
+                )
+                if not cursor.rowcount:
+                    continue
+                written.append(quote_id)
+                current = conn.execute(
+                    "SELECT MAX(version) FROM quote_estimate_versions WHERE quote_id = ?", (quote_id,)
+                ).fetchone()[0]
+                if current is None:
+                    old = res.get("old_estimate") or {}
+                    conn.execute(
+                        "INSERT INTO quote_estimate_versions (quote_id, version, estimate, delta, "
+                        "price_snapshot_version, job_id, created_at) VALUES (?, 1, ?, NULL, ?, NULL, ?)",
+                        (quote_id, self._codec.encode(old), old.get("price_snapshot_version"), now),
+                    )
+                    current = 1
+                conn.execute(
+                    "INSERT INTO quote_estimate_versions (quote_id, version, estimate, delta, "
+                    "price_snapshot_version, job_id, created_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        quote_id, current + 1, self._codec.encode(res["estimate"]), json.dumps(res["delta"]),
+                        res["estimate"].get("price_snapshot_version"), job_id, now,
+                    ),
+                )
+                self._index_quote(conn, quote_id, search_fields({"estimate": res["estimate"]}))
+            conn.execute(
+                "UPDATE repricing_jobs SET last_quote_id = ?, processed = processed + ?, "
+                "updated = updated + ?, unchanged = unchanged + ?, failed = failed + ?, skipped = skipped + ?, "
+                "updated_at = ? WHERE id = ?",
+                (
+                    last_quote_id, counts.get("processed", 0), len(written), counts.get("unchanged", 0),
+                    counts.get("failed", 0), len(results) - len(written), now, job_id,
+                ),
+            )
+        for quote_id in written:
+            self._quote_changed(quote_id)
+
+    async def list_estimate_versions(self, quote_id: str, user_id: Optional[str] = None) -> Optional[List[Dict]]:
+        """Estimate versions of a quote, or None if it does not exist (or is not user_id's)."""
+        return await self._run(self._list_estimate_versions, quote_id, user_id)
+
+    def _list_estimate_versions(self, quote_id: str, user_id: Optional[str]) -> Optional[List[Dict]]:
+        with self._pool.connection() as conn:
+            row = conn.execute("SELECT user_id FROM quotes WHERE id = ?", (quote_id,)).fetchone()
+        if not row or (user_id is not None and row["user_id"] != user_id):
+            return None
+        return self.get_estimate_versions(quote_id)
+
+    def get_estimate_versions(self, quote_id: str) -> List[Dict]:
+        """All stored estimate versions for a quote, oldest first."""
+        with self._pool.connection() as conn:
+            rows = conn.execute(
+                "SELECT * FROM quote_estimate_versions WHERE quote_id = ? ORDER BY version", (quote_id,)
+            ).fetchall()
+        versions = []
+        for row in rows:
+            data = dict(row)
+            for field in ("estimate", "delta"):
+                data[field] = decode_column(data[field]) if data[field] else None
+            versions.append(data)
+        return versions
+
+    def create_repricing_job(self, job_id: str, params: Dict[str, Any]) -> None:
+        now = datetime.now(timezone.utc).isoformat()
+        with self._pool.connection() as conn, conn:
+            conn.execute(
+                "INSERT INTO repricing_jobs (id, status, params, created_at, updated_at) VALUES (?, 'pending', ?, ?, ?)",
+                (job_id, json.dumps(params), now, now),
+            )
+
+    def update_repricing_job(self, job_id: str, **fields: Any) -> None:
+        allowed = {"status", "error", "finished_at"}
+        updates = {k: v for k, v in fields.items() if k in allowed}
+        updates["updated_at"] = datetime.now(timezone.utc).isoformat()
+        with self._pool.connection() as conn, conn:
+            conn.execute(
+                f"UPDATE repricing_jobs SET {', '.join(f'{k} = ?' for k in updates)} WHERE id = ?",
+                [*updates.values(), job_id],
+            )
+
+    def get_repricing_job(self, job_id: str) -> Optional[Dict]:
+        with self._pool.connection() as conn:
+            row = conn.execute("SELECT * FROM repricing_jobs WHERE id = ?", (job_id,)).fetchone()
+        if not row:
+            return None
         data = dict(row)
-        
-        # Parse JSON fields
-        for field in ["vision_results", "reasoning", "estimate"]:
-            if field in data and data[field]:
-                try:
-                    data[field] = json.loads(data[field])
-                except:
-                    data[field] = {}
-        for field in ["phases", "risks"]:
-            if field in data and data[field]:
-                try:
-                    data[field] = json.loads(data[field])
-                except:
-                    data[field] = []
-        if 'scope' in data and data.get('scope'):
-            try:
-                data['scope'] = json.loads(data['scope'])
-            except:
-                # scope is often a string; if JSON decode fails, leave as string
-                pass
-        
+        data["params"] = json.loads(data["params"]) if data["params"] else {}
+        return data
+
+    def _row_to_dict(self, row) -> Dict:
+        """Convert database row to a dict-like LazyRow; JSON columns decode on first access
+
+        Updates still waiting in the write-behind queue are overlaid, so reads never
+        go backwards while a group commit is pending. Archived columns of stub rows
+        are read back from the archive; values written since archiving take precedence.
+        """
+        values = dict(row)
+        archived = None
+        if values.get("archive_ref") and any(c in values and values[c] is None for c in ARCHIVED_COLUMNS):
+            archived = self._rehydrate(values)
+        data = LazyRow(values, ROW_DECODERS)
+        if archived:
+            for c in ARCHIVED_COLUMNS:
+                if c in values and values[c] is None:
+                    data[c] = archived.get(c)
+        queued = self._write_behind.peek(data.get("id"))
+        if queued:
+            for key, value in queued.items():
+                if key in data:
+                    data[key] = value
         return data
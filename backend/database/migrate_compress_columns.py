@@ -0,0 +1,58 @@
+"""
+Migration: Re-encode vision_results, reasoning and estimate with the column codec
+Safe to run while the API is serving (small batches, short transactions)
+
+Usage (from backend/):
+    python -m database.migrate_compress_columns [--db PATH] [--batch-size 500] [--vacuum]
+"""
+
+import argparse
+import os
+
+from database.db import DatabaseService
+
+# Try common database paths
+DB_PATHS = [
+    os.getenv("DATABASE_PATH", "/data/estimategenie.db"),
+    "/app/estimategenie.db",
+    "./estimategenie.db"
+]
+
+
+def migrate(db_path=None, batch_size=500, pause_sec=0.05, vacuum=False):
+    """Compress existing rows; returns the migration stats (or None on failure)."""
+    if not db_path:
+        db_path = next((p for p in DB_PATHS if os.path.exists(p)), "/app/estimategenie.db")
+
+    print(f"Migrating database: {db_path}")
+    db = DatabaseService(db_path)
+    try:
+        def report(stats):
+            print(f"  {stats['rows']} rows re-encoded ({stats['skipped']} changed concurrently, retried on next run)")
+
+        stats = db.migrate_column_encoding(batch_size=batch_size, pause_sec=pause_sec, progress=report)
+        saved = stats["bytes_before"] - stats["bytes_after"]
+        print(f"✓ {stats['rows']} rows now use {stats['codec']}: "
+              f"{stats['bytes_before']:,} -> {stats['bytes_after']:,} bytes ({saved:,} saved)")
+        if vacuum:
+            # VACUUM rewrites the whole file and blocks writers; run it in a quiet window
+            print("Running VACUUM...")
+            with db._pool.connection() as conn:
+                conn.execute("VACUUM")
+        print("Migration complete!")
+        return stats
+    except Exception as e:
+        print(f"✗ Migration failed: {e}")
+        return None
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compress quote JSON columns with the configured codec")
+    parser.add_argument("--db", help="database path (default: first existing of DB_PATHS)")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--pause", type=float, default=0.05, help="seconds to pause between batches")
+    parser.add_argument("--vacuum", action="store_true", help="VACUUM afterwards to return freed pages to the OS")
+    args = parser.parse_args()
+    migrate(args.db, args.batch_size, args.pause, args.vacuum)
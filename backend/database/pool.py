@@ -0,0 +1,148 @@
+"""Pooled SQLite connections in WAL mode with tuned pragmas.
+
+Opening a connection (and re-reading the schema) costs more than most of our
+queries, so connections are created lazily up to `size` and reused. Each keeps a
+compiled-statement cache, so repeated queries skip SQL parsing. WAL lets readers
+run concurrently with the single writer; busy_timeout makes writers wait for the
+lock instead of failing with "database is locked".
+"""
+import os
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, Set, Union
+
+from .backend import StorageBackend
+
+
+class SQLitePool(StorageBackend):
+    """Fixed-size pool of sqlite3 connections shared across worker threads."""
+
+    name = "sqlite"
+    types = {
+        # Declared TEXT for existing databases; SQLite stores codec BLOBs in it as-is
+        "json_blob": "TEXT",
+        "real": "REAL",
+        "serial_pk": "INTEGER PRIMARY KEY AUTOINCREMENT",
+        "timestamp": "TIMESTAMP DEFAULT CURRENT_TIMESTAMP",
+    }
+
+    def __init__(
+        self,
+        db_path: Union[str, Path],
+        size: int = 4,
+        busy_timeout_ms: int = 5000,
+        cached_statements: int = 256,
+    ):
+        self.db_path = Path(db_path)
+        self.size = max(1, int(size))
+        self.busy_timeout_ms = int(busy_timeout_ms)
+        self.cached_statements = int(cached_statements)
+        self.cache_kb = int(os.getenv("SQLITE_CACHE_KB", "16384"))
+        self.mmap_mb = int(os.getenv("SQLITE_MMAP_MB", "256"))
+        self._idle: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._created = 0
+        self._closed = False
+        self._checkouts = 0
+        self._waits = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=self.busy_timeout_ms / 1000.0,
+            check_same_thread=False,
+            cached_statements=self.cached_statements,
+        )
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        # NORMAL is durable across application crashes in WAL mode; only an OS crash
+        # can lose the last transactions
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA busy_timeout={self.busy_timeout_ms}")
+        conn.execute(f"PRAGMA cache_size=-{self.cache_kb}")
+        conn.execute(f"PRAGMA mmap_size={self.mmap_mb * 1024 * 1024}")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        return conn
+
+    def _acquire(self) -> sqlite3.Connection:
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("Connection pool is closed")
+            self._checkouts += 1
+            try:
+                return self._idle.get_nowait()
+            except queue.Empty:
+                pass
+            if self._created < self.size:
+                self._created += 1
+                create = True
+            else:
+                self._waits += 1
+                create = False
+        if create:
+            try:
+                return self._connect()
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+        return self._idle.get()
+
+    def _release(self, conn: sqlite3.Connection) -> None:
+        if conn.in_transaction:
+            conn.rollback()
+        with self._lock:
+            if not self._closed:
+                self._idle.put(conn)
+                return
+            self._created -= 1
+        conn.close()
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        """Borrow a connection; an uncommitted transaction is rolled back on return."""
+        conn = self._acquire()
+        try:
+            yield conn
+        finally:
+            self._release(conn)
+
+    def close(self) -> None:
+        """Close idle connections; borrowed ones are closed when returned."""
+        with self._lock:
+            self._closed = True
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            with self._lock:
+                self._created -= 1
+            conn.close()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "size": self.size,
+                "open": self._created,
+                "idle": self._idle.qsize(),
+                "checkouts": self._checkouts,
+                "waits": self._waits,
+            }
+
+    def lock_schema(self, conn: sqlite3.Connection) -> None:
+        # Take the write lock up front so the version read and the changes are atomic
+        if not conn.in_transaction:
+            conn.execute("BEGIN IMMEDIATE")
+
+    def schema_version(self, conn: sqlite3.Connection) -> int:
+        return conn.execute("PRAGMA user_version").fetchone()[0]
+
+    def set_schema_version(self, conn: sqlite3.Connection, version: int) -> None:
+        conn.execute(f"PRAGMA user_version = {int(version)}")
+
+    def table_columns(self, conn: sqlite3.Connection, table: str) -> Set[str]:
+        return {row["name"] for row in conn.execute(f"PRAGMA table_info({table})")}
@@ -0,0 +1,240 @@
+"""PostgreSQL storage backend on an asyncpg connection pool.
+
+DatabaseService and AuthService are written against blocking DB-API-style
+connections (DatabaseService runs them on its own thread pool), so the asyncpg
+pool lives on a private event loop thread and each statement is submitted to it
+with run_coroutine_threadsafe. That keeps one pool per process regardless of
+which thread or event loop the caller is on, and lets several API replicas
+share one database.
+
+`?` placeholders are rewritten to `$1, $2, ...`; asyncpg prepares and caches
+each distinct statement per connection.
+"""
+import asyncio
+import functools
+import re
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Sequence, Set, Tuple
+
+from .backend import StorageBackend
+
+try:
+    import asyncpg
+except ImportError:  # only needed when DATABASE_URL points at PostgreSQL
+    asyncpg = None
+
+# Arbitrary application-wide key for pg_advisory_xact_lock around schema changes
+SCHEMA_LOCK_KEY = 0x71756F74
+
+_RETURNS_ROWS = re.compile(r"^\s*(SELECT|WITH|VALUES|SHOW)\b|\bRETURNING\b", re.IGNORECASE)
+
+
+@functools.lru_cache(maxsize=1024)
+def translate_placeholders(sql: str) -> Tuple[str, bool]:
+    """Rewrite `?` placeholders (outside string literals) to `$n`.
+
+    Returns (query, returns_rows).
+    """
+    out, n, in_literal = [], 0, False
+    for ch in sql:
+        if ch == "'":
+            in_literal = not in_literal
+        elif ch == "?" and not in_literal:
+            n += 1
+            out.append(f"${n}")
+            continue
+        out.append(ch)
+    return "".join(out), bool(_RETURNS_ROWS.search(sql))
+
+
+class PostgresCursor:
+    """Result of one statement, with the sqlite3 cursor methods we use."""
+
+    def __init__(self, conn: "PostgresConnection"):
+        self._conn = conn
+        self._rows: List[Any] = []
+        self._pos = 0
+        self.rowcount = -1
+
+    def execute(self, sql: str, params: Sequence[Any] = ()) -> "PostgresCursor":
+        self._rows, self.rowcount = self._conn._run(sql, params)
+        self._pos = 0
+        return self
+
+    def fetchone(self) -> Any:
+        if self._pos >= len(self._rows):
+            return None
+        self._pos += 1
+        return self._rows[self._pos - 1]
+
+    def fetchall(self) -> List[Any]:
+        rows, self._pos = self._rows[self._pos:], len(self._rows)
+        return rows
+
+    def __iter__(self) -> Iterator[Any]:
+        return iter(self.fetchall())
+
+
+class PostgresConnection:
+    """Blocking facade over a pooled asyncpg connection.
+
+    Statements outside `with conn:` autocommit; inside, they share one
+    transaction that commits on success and rolls back on error.
+    """
+
+    def __init__(self, pool: "PostgresPool", raw: Any):
+        self._pool = pool
+        self._raw = raw
+        self._tx = None
+        self._depth = 0
+
+    @property
+    def in_transaction(self) -> bool:
+        return self._tx is not None
+
+    def cursor(self) -> PostgresCursor:
+        return PostgresCursor(self)
+
+    def execute(self, sql: str, params: Sequence[Any] = ()) -> PostgresCursor:
+        return self.cursor().execute(sql, params)
+
+    def _run(self, sql: str, params: Sequence[Any]) -> Tuple[List[Any], int]:
+        query, returns_rows = translate_placeholders(sql)
+        if returns_rows:
+            rows = self._pool._call(self._raw.fetch(query, *params))
+            return rows, len(rows)
+        # Status is e.g. "UPDATE 3" or "INSERT 0 1"; the last number is the row count
+        status = self._pool._call(self._raw.execute(query, *params))
+        count = status.rsplit(" ", 1)[-1]
+        return [], int(count) if count.isdigit() else -1
+
+    def commit(self) -> None:
+        if self._tx is not None:
+            tx, self._tx, self._depth = self._tx, None, 0
+            self._pool._call(tx.commit())
+
+    def rollback(self) -> None:
+        if self._tx is not None:
+            tx, self._tx, self._depth = self._tx, None, 0
+            self._pool._call(tx.rollback())
+
+    def __enter__(self) -> "PostgresConnection":
+        if self._tx is None:
+            tx = self._raw.transaction()
+            self._pool._call(tx.start())
+            self._tx = tx
+        self._depth += 1
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        self._depth -= 1
+        if self._depth <= 0:
+            if exc_type is None:
+                self.commit()
+            else:
+                self.rollback()
+        return False
+
+
+class PostgresPool(StorageBackend):
+    """asyncpg pool of up to `size` connections, usable from any thread."""
+
+    name = "postgres"
+    types = {
+        "json_blob": "BYTEA",
+        "real": "DOUBLE PRECISION",
+        "serial_pk": "BIGSERIAL PRIMARY KEY",
+        "timestamp": "TEXT",
+    }
+
+    def __init__(self, dsn: str, size: int = 4, command_timeout: float = 60.0):
+        if asyncpg is None:
+            raise RuntimeError("DATABASE_URL points at PostgreSQL but asyncpg is not installed (pip install asyncpg)")
+        self.size = max(1, int(size))
+        self._lock = threading.Lock()
+        self._closed = False
+        self._checkouts = 0
+        self._waits = 0
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="postgres-pool", daemon=True)
+        self._thread.start()
+        try:
+            self._pool = self._call(self._create_pool(dsn, command_timeout))
+        except BaseException:
+            self._stop_loop()
+            raise
+
+    async def _create_pool(self, dsn: str, command_timeout: float) -> Any:
+        # Built inside a coroutine so the pool binds to this backend's loop
+        return await asyncpg.create_pool(dsn, min_size=1, max_size=self.size, command_timeout=command_timeout)
+
+    async def _acquire(self) -> Any:
+        return await self._pool.acquire()
+
+    def _call(self, coro) -> Any:
+        """Run a coroutine on the pool's loop and wait for its result."""
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
+
+    @contextmanager
+    def connection(self) -> Iterator[PostgresConnection]:
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("Connection pool is closed")
+            self._checkouts += 1
+            if self._pool.get_idle_size() == 0 and self._pool.get_size() >= self.size:
+                self._waits += 1
+        raw = self._call(self._acquire())
+        conn = PostgresConnection(self, raw)
+        try:
+            yield conn
+        finally:
+            try:
+                conn.rollback()
+            finally:
+                self._call(self._pool.release(raw))
+
+    def close(self) -> None:
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        try:
+            self._call(asyncio.wait_for(self._pool.close(), timeout=10))
+        except Exception:
+            self._pool.terminate()
+        self._stop_loop()
+
+    def _stop_loop(self) -> None:
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "size": self.size,
+                "open": self._pool.get_size(),
+                "idle": self._pool.get_idle_size(),
+                "checkouts": self._checkouts,
+                "waits": self._waits,
+            }
+
+    def lock_schema(self, conn: PostgresConnection) -> None:
+        conn.execute("SELECT pg_advisory_xact_lock(?)", (SCHEMA_LOCK_KEY,))
+
+    def schema_version(self, conn: PostgresConnection) -> int:
+        conn.execute("CREATE TABLE IF NOT EXISTS schema_version (version INTEGER NOT NULL)")
+        return conn.execute("SELECT MAX(version) FROM schema_version").fetchone()[0] or 0
+
+    def set_schema_version(self, conn: PostgresConnection, version: int) -> None:
+        conn.execute("DELETE FROM schema_version")
+        conn.execute("INSERT INTO schema_version (version) VALUES (?)", (version,))
+
+    def table_columns(self, conn: PostgresConnection, table: str) -> Set[str]:
+        rows = conn.execute(
+            "SELECT column_name FROM information_schema.columns "
+            "WHERE table_schema = current_schema() AND table_name = ?",
+            (table,),
+        ).fetchall()
+        return {row["column_name"] for row in rows}
@@ -0,0 +1,38 @@
+"""
+Migration: Fill the quote search index for quotes saved before it existed
+Safe to run while the API is serving (small batches, short transactions)
+
+Usage (from backend/):
+    python -m database.reindex_quotes [--db PATH] [--batch-size 500]
+"""
+
+import argparse
+
+from database.db import DatabaseService
+
+
+def reindex(db_path=None, batch_size=500, pause_sec=0.05):
+    """Index every quote for search; returns the job stats (or None on failure)."""
+    db = DatabaseService(db_path)
+    print(f"Indexing quotes for search ({db.backend.name})")
+    try:
+        def report(stats):
+            print(f"  {stats['rows']} quotes indexed")
+
+        stats = db.reindex_quotes(batch_size=batch_size, pause_sec=pause_sec, progress=report)
+        print(f"✓ {stats['rows']} quotes indexed")
+        return stats
+    except Exception as e:
+        print(f"✗ Indexing failed: {e}")
+        return None
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the full-text search index for existing quotes")
+    parser.add_argument("--db", help="SQLite database path (default: DATABASE_URL, else ./estimategenie.db)")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--pause", type=float, default=0.05, help="seconds to pause between batches")
+    args = parser.parse_args()
+    reindex(args.db, args.batch_size, args.pause)
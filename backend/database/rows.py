@@ -0,0 +1,69 @@
+"""Row mapping that decodes stored blobs only when a caller reads them."""
+from collections.abc import MutableMapping
+from typing import Any, Callable, Dict, Iterator, Optional
+
+from .codec import decode_column
+
+
+class JsonColumn:
+    """Decoder for a JSON column (plain text or codec-encoded BLOB).
+
+    Undecodable values become default_factory(), or stay raw without one. A class
+    rather than a closure so rows stay picklable (e.g. for process pools).
+    """
+
+    def __init__(self, default_factory: Optional[Callable[[], Any]] = None):
+        self.default_factory = default_factory
+
+    def __call__(self, value: Any) -> Any:
+        try:
+            return decode_column(value)
+        except (TypeError, ValueError):
+            return value if self.default_factory is None else self.default_factory()
+
+
+class LazyRow(MutableMapping):
+    """Dict-like row whose encoded columns are decoded on first access.
+
+    Listing and polling paths often read a few light columns; the large
+    vision/reasoning/estimate blobs are only parsed if something touches them.
+    Decoded values are cached, and assigning a key replaces the raw value.
+    """
+
+    def __init__(self, values: Dict[str, Any], decoders: Dict[str, Callable[[Any], Any]]):
+        self._values = values
+        self._decoders = decoders
+        # Columns still holding their encoded form; empty values are left as stored
+        self._pending = {k for k in decoders if values.get(k)}
+
+    def __getitem__(self, key: str) -> Any:
+        value = self._values[key]
+        if key in self._pending:
+            value = self._values[key] = self._decoders[key](value)
+            self._pending.discard(key)
+        return value
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        self._values[key] = value
+        self._pending.discard(key)
+
+    def __delitem__(self, key: str) -> None:
+        del self._values[key]
+        self._pending.discard(key)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._values)
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def is_decoded(self, key: str) -> bool:
+        return key not in self._pending
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Plain dict with every column decoded."""
+        return {k: self[k] for k in self._values}
+
+    def __repr__(self) -> str:
+        shown = {k: ("<encoded>" if k in self._pending else v) for k, v in self._values.items()}
+        return f"LazyRow({shown!r})"
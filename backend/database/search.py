@@ -0,0 +1,137 @@
+"""Full-text search over quotes.
+
+The searchable text lives in compressed columns (or the archive), which the
+database cannot read, so it is extracted here and stored in the plain
+`quote_search` table, one row per quote, written in the same transaction as the
+quote itself. SQLite indexes that table with an external-content FTS5 table kept
+in sync by triggers; PostgreSQL with a generated tsvector column and a GIN index.
+"""
+import hashlib
+import re
+from typing import Any, Dict, Optional, Tuple
+
+# Searchable fields, in quote_search column order (weights: higher ranks first)
+SEARCH_FIELDS = ("scope", "description", "materials", "scene")
+SEARCH_WEIGHTS = {"scope": 4.0, "description": 4.0, "materials": 2.0, "scene": 1.0}
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+
+def owner_token(user_id: Any) -> str:
+    """Single FTS5 token per user, so MATCH only walks that user's documents"""
+    return "o" + hashlib.blake2b(str(user_id).encode("utf-8"), digest_size=8).hexdigest()
+
+
+def _text(value: Any) -> str:
+    """String leaves of a JSON value, space-separated"""
+    if isinstance(value, str):
+        return value
+    if isinstance(value, dict):
+        value = value.values()
+    elif not isinstance(value, (list, tuple)):
+        return ""
+    return " ".join(t for t in (_text(v) for v in value) if t)
+
+
+def search_fields(data: Dict[str, Any]) -> Dict[str, str]:
+    """quote_search values derivable from a quote (or a partial update) with decoded columns."""
+    fields = {}
+    if "scope" in data:
+        fields["scope"] = _text(data["scope"])
+    if "description" in data:
+        fields["description"] = _text(data["description"])
+    if "estimate" in data:
+        materials = (data["estimate"] or {}).get("materials") if isinstance(data["estimate"], dict) else None
+        fields["materials"] = " ".join(
+            str(m.get("name")) for m in materials or [] if isinstance(m, dict) and m.get("name")
+        )
+    if "vision_results" in data:
+        vision = data["vision_results"] if isinstance(data["vision_results"], dict) else {}
+        fields["scene"] = _text(vision.get("scene_description"))
+    return fields
+
+
+def match_expression(backend: str, query: str, user_id: Any) -> Optional[str]:
+    """Search query for the backend: every word must match, the last one as a prefix.
+
+    Returns None if the query has no words. Only word characters are kept, so user
+    input never reaches the FTS5 / tsquery syntax. On SQLite the expression also
+    requires the user's owner token.
+    """
+    words = [w.lower() for w in _WORD.findall(query or "")][:16]
+    if not words:
+        return None
+    if backend == "sqlite":
+        terms = " ".join(f'"{w}"' for w in words) + "*"
+        return f'owner : "{owner_token(user_id)}" AND {{{" ".join(SEARCH_FIELDS)}}} : ({terms})'
+    return " & ".join(words) + ":*"
+
+
+# Schema for MIGRATIONS ({backend name: SQL}); the FTS5 table mirrors quote_search by
+# rowid. owner comes last so snippet() always prefers a text column.
+_FTS_COLUMNS = ", ".join(SEARCH_FIELDS + ("owner",))
+_NEW = ", ".join(f"new.{c}" for c in SEARCH_FIELDS + ("owner",))
+_OLD = ", ".join(f"old.{c}" for c in SEARCH_FIELDS + ("owner",))
+_TSVECTOR = " || ".join(
+    f"setweight(to_tsvector('english', coalesce({c}, '')), '{w}')"
+    for c, w in zip(SEARCH_FIELDS, "AABC", strict=True)
+)
+
+SCHEMA: Tuple[Dict[str, str], ...] = (
+    {
+        "sqlite": "CREATE TABLE IF NOT EXISTS quote_search (id INTEGER PRIMARY KEY, quote_id TEXT NOT NULL UNIQUE, "
+        "user_id TEXT, scope TEXT, description TEXT, materials TEXT, scene TEXT, owner TEXT)",
+        "postgres": "CREATE TABLE IF NOT EXISTS quote_search (id BIGSERIAL PRIMARY KEY, quote_id TEXT NOT NULL UNIQUE, "
+        "user_id TEXT, scope TEXT, description TEXT, materials TEXT, scene TEXT, "
+        f"document tsvector GENERATED ALWAYS AS ({_TSVECTOR}) STORED)",
+    },
+    {
+        "sqlite": f"CREATE VIRTUAL TABLE IF NOT EXISTS quote_search_fts USING fts5({_FTS_COLUMNS}, "
+        "content='quote_search', content_rowid='id', tokenize='porter unicode61')",
+        "postgres": "CREATE INDEX IF NOT EXISTS idx_quote_search_document ON quote_search USING GIN (document)",
+    },
+    {
+        "sqlite": "CREATE TRIGGER IF NOT EXISTS quote_search_ai AFTER INSERT ON quote_search BEGIN "
+        f"INSERT INTO quote_search_fts (rowid, {_FTS_COLUMNS}) VALUES (new.id, {_NEW}); END",
+        "postgres": None,
+    },
+    {
+        "sqlite": "CREATE TRIGGER IF NOT EXISTS quote_search_ad AFTER DELETE ON quote_search BEGIN "
+        f"INSERT INTO quote_search_fts (quote_search_fts, rowid, {_FTS_COLUMNS}) "
+        f"VALUES ('delete', old.id, {_OLD}); END",
+        "postgres": None,
+    },
+    {
+        "sqlite": "CREATE TRIGGER IF NOT EXISTS quote_search_au AFTER UPDATE ON quote_search BEGIN "
+        f"INSERT INTO quote_search_fts (quote_search_fts, rowid, {_FTS_COLUMNS}) VALUES ('delete', old.id, {_OLD}); "
+        f"INSERT INTO quote_search_fts (rowid, {_FTS_COLUMNS}) VALUES (new.id, {_NEW}); END",
+        "postgres": None,
+    },
+    {
+        "sqlite": "CREATE INDEX IF NOT EXISTS idx_quote_search_user ON quote_search (user_id)",
+        "postgres": "CREATE INDEX IF NOT EXISTS idx_quote_search_user ON quote_search (user_id)",
+    },
+)
+
+# Ranked page of one user's matches: (match, user_id, [project_type,] limit, offset).
+# Score is higher-is-better on both engines; snippets mark matches with [ ].
+_SQLITE_WEIGHTS = ", ".join(str(SEARCH_WEIGHTS[c]) for c in SEARCH_FIELDS) + ", 0.0"
+SEARCH_SQL = {
+    "sqlite": (
+        "SELECT {columns}, snippet(quote_search_fts, -1, '[', ']', '…', 12) AS snippet, "
+        f"-bm25(quote_search_fts, {_SQLITE_WEIGHTS}) AS score "
+        "FROM quote_search_fts JOIN quote_search s ON s.id = quote_search_fts.rowid "
+        "JOIN quotes q ON q.id = s.quote_id "
+        "WHERE quote_search_fts MATCH ? AND s.user_id = ? {filters} "
+        "ORDER BY score DESC, q.id LIMIT ? OFFSET ?"
+    ),
+    "postgres": (
+        "SELECT {columns}, ts_headline('english', concat_ws(' ', m.scope, m.description, m.materials, m.scene), "
+        "to_tsquery('english', ?), 'StartSel=[, StopSel=], MaxWords=12, MinWords=4') AS snippet, m.score "
+        "FROM (SELECT s.*, ts_rank_cd(s.document, to_tsquery('english', ?)) AS score "
+        "FROM quote_search s JOIN quotes q ON q.id = s.quote_id "
+        "WHERE s.document @@ to_tsquery('english', ?) AND s.user_id = ? {filters} "
+        "ORDER BY score DESC, s.quote_id LIMIT ? OFFSET ?) m "
+        "JOIN quotes q ON q.id = m.quote_id ORDER BY m.score DESC, q.id"
+    ),
+}
@@ -0,0 +1,160 @@
+"""Write-behind queue that coalesces row updates and group-commits them.
+
+Pipeline stages update the same quote several times within a few hundred
+milliseconds (vision_complete, cost_complete, ...). Each of those used to be its
+own SQLite transaction, and under burst load the write lock, not the work, was
+the limit. Queued updates are merged per key (later values win) and a background
+thread writes everything pending in one transaction every `interval_sec`, or
+sooner once `max_batch` keys are waiting.
+
+Readers see queued values through `peek`, so a poll between enqueue and commit
+is never stale. Callers that need the row on disk (final states, direct updates)
+call `flush` or `pop`.
+"""
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+# Upper bound for the retry delay after failed commits, as a multiple of the interval
+MAX_BACKOFF_FACTOR = 64
+
+
+class WriteBehindQueue:
+    """Per-key coalescing buffer flushed by `apply_batch(Dict[key, Dict[column, value]])`.
+
+    `apply_batch` must write the whole batch atomically (one transaction) or raise;
+    on failure the batch is re-queued under any newer updates and retried with backoff.
+    """
+
+    def __init__(
+        self,
+        apply_batch: Callable[[Dict[str, Dict[str, Any]]], None],
+        interval_sec: float = 0.05,
+        max_batch: int = 256,
+        name: str = "write-behind",
+    ):
+        self.interval_sec = interval_sec
+        self.max_batch = max_batch
+        self._apply_batch = apply_batch
+        self._name = name
+        self._lock = threading.Lock()
+        self._wake = threading.Condition(self._lock)
+        # Held for the duration of a batch commit so pop/flush never race one
+        self._commit_lock = threading.Lock()
+        self._pending: Dict[str, Dict[str, Any]] = {}
+        self._inflight: Dict[str, Dict[str, Any]] = {}
+        self._thread: Optional[threading.Thread] = None
+        self._closed = False
+        self._failures = 0
+        self._stats = {"queued": 0, "coalesced": 0, "batches": 0, "rows": 0, "failed_batches": 0}
+
+    def put(self, key: str, updates: Dict[str, Any]) -> None:
+        """Queue updates for `key`, merged over anything already pending for it."""
+        with self._wake:
+            if self._closed:
+                raise RuntimeError(f"{self._name} queue is closed")
+            current = self._pending.get(key)
+            if current is None:
+                self._pending[key] = dict(updates)
+            else:
+                current.update(updates)
+                self._stats["coalesced"] += 1
+            self._stats["queued"] += 1
+            self._start_flusher()
+            if len(self._pending) >= self.max_batch:
+                self._wake.notify()
+
+    def requeue(self, key: str, updates: Dict[str, Any]) -> None:
+        """Put back updates taken by `pop` whose write failed, under anything queued since."""
+        with self._wake:
+            newer = self._pending.get(key)
+            self._pending[key] = {**updates, **(newer or {})}
+            if not self._closed:
+                self._start_flusher()
+
+    def peek(self, key: str) -> Optional[Dict[str, Any]]:
+        """Updates for `key` not yet committed (a copy), or None."""
+        if not self._pending and not self._inflight:
+            return None
+        with self._lock:
+            inflight, pending = self._inflight.get(key), self._pending.get(key)
+            if inflight is None and pending is None:
+                return None
+            return {**(inflight or {}), **(pending or {})}
+
+    def pop(self, key: str) -> Optional[Dict[str, Any]]:
+        """Remove and return pending updates for `key`, waiting out a commit in progress.
+
+        Used by direct writes (which fold the pending values into their own
+        statement) and deletes (which drop them).
+        """
+        with self._commit_lock, self._lock:
+            return self._pending.pop(key, None)
+
+    def flush(self) -> int:
+        """Commit everything pending now; returns the number of keys written."""
+        with self._commit_lock:
+            with self._lock:
+                if not self._pending:
+                    return 0
+                batch, self._pending = self._pending, {}
+                self._inflight = batch
+            try:
+                self._apply_batch(batch)
+            except Exception as e:
+                with self._lock:
+                    # Newer updates queued during the attempt win over the failed batch
+                    for key, updates in self._pending.items():
+                        batch.setdefault(key, {}).update(updates)
+                    self._pending, self._inflight = batch, {}
+                    self._failures += 1
+                    self._stats["failed_batches"] += 1
+                print(f"{self._name}: commit of {len(batch)} updates failed, will retry: {e}")
+                return 0
+            with self._lock:
+                self._inflight = {}
+                self._failures = 0
+                self._stats["batches"] += 1
+                self._stats["rows"] += len(batch)
+            return len(batch)
+
+    def close(self) -> None:
+        """Stop the flusher thread and commit whatever is still pending."""
+        with self._wake:
+            self._closed = True
+            self._wake.notify()
+            thread = self._thread
+        if thread is not None:
+            thread.join()
+        self.flush()
+        if self._pending:
+            print(f"{self._name}: {len(self._pending)} queued updates could not be written on close")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {**self._stats, "pending": len(self._pending), "interval_ms": int(self.interval_sec * 1000)}
+
+    def _start_flusher(self) -> None:
+        # Caller holds self._lock
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._loop, name=self._name, daemon=True)
+            self._thread.start()
+
+    def _loop(self) -> None:
+        while True:
+            with self._wake:
+                while not self._pending and not self._closed:
+                    self._wake.wait()
+                if self._closed:
+                    return
+                # Give follow-up updates a moment to coalesce; retry failures with backoff
+                delay = self.interval_sec * min(2 ** self._failures, MAX_BACKOFF_FACTOR)
+                deadline = time.monotonic() + delay
+                while not self._closed and len(self._pending) < self.max_batch:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._wake.wait(remaining)
+                if self._closed:
+                    return
+            self.flush()
@@ -5,8 +5,8 @@ from datetime import datetime, timedelta, timezone
 from typing import Optional
 import jwt
 import os
-import sqlite3
 import re
+from database.backend import StorageBackend, create_backend
 from models.user import User
 
 SECRET_KEY = os.getenv("JWT_SECRET_KEY", "your-secret-key-change-in-production")
@@ -23,8 +23,10 @@ def is_valid_email(email: str) -> bool:
     return bool(re.match(pattern, email))
 
 class AuthService:
-    def __init__(self, db_path="estimategenie.db"):
-        self.db_path = db_path
+    def __init__(self, db_path: Optional[str] = None, backend: Optional[StorageBackend] = None):
+        """Use `backend` (e.g. DatabaseService.backend) or open one for db_path / DATABASE_URL."""
+        self._backend = backend or create_backend(db_path, size=2)
+        self.db_path = getattr(self._backend, "db_path", None)
         self.init_database()
 
     @staticmethod
@@ -39,30 +41,47 @@ class AuthService:
         except ValueError:
             return None
 
+    def _row_to_user(self, row) -> User:
+        return User(
+            id=row["id"],
+            email=row["email"],
+            name=row["name"],
+            password_hash=row["password_hash"],
+            plan=row["plan"],
+            api_key=row["api_key"],
+            created_at=self._parse_created_at(row["created_at"]),
+            stripe_customer_id=row["stripe_customer_id"],
+            subscription_status=row["subscription_status"],
+            subscription_id=row["subscription_id"],
+            quotes_used=row["quotes_used"],
+            api_calls_used=row["api_calls_used"]
+        )
+
+    def _get_user(self, column: str, value: str) -> Optional[User]:
+        with self._backend.connection() as conn:
+            row = conn.execute(f"SELECT * FROM users WHERE {column} = ?", (value,)).fetchone()
+        return self._row_to_user(row) if row else None
+
     def init_database(self):
         """Initialize users table"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS users (
-                id TEXT PRIMARY KEY,
-                email TEXT UNIQUE NOT NULL,
-                name TEXT NOT NULL,
-                password_hash TEXT NOT NULL,
-                plan TEXT DEFAULT 'free',
-                api_key TEXT UNIQUE NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                stripe_customer_id TEXT,
-                subscription_status TEXT DEFAULT 'inactive',
-                subscription_id TEXT,
-                quotes_used INTEGER DEFAULT 0,
-                api_calls_used INTEGER DEFAULT 0
-            )
-        """)
-        
-        conn.commit()
-        conn.close()
+        with self._backend.connection() as conn, conn:
+            self._backend.lock_schema(conn)
+            conn.execute(f"""
+                CREATE TABLE IF NOT EXISTS users (
+                    id TEXT PRIMARY KEY,
+                    email TEXT UNIQUE NOT NULL,
+                    name TEXT NOT NULL,
+                    password_hash TEXT NOT NULL,
+                    plan TEXT DEFAULT 'free',
+                    api_key TEXT UNIQUE NOT NULL,
+                    created_at {self._backend.types['timestamp']},
+                    stripe_customer_id TEXT,
+                    subscription_status TEXT DEFAULT 'inactive',
+                    subscription_id TEXT,
+                    quotes_used INTEGER DEFAULT 0,
+                    api_calls_used INTEGER DEFAULT 0
+                )
+            """)
 
     def create_access_token(self, user_id: str, email: str) -> str:
         """Create JWT access token"""
@@ -88,44 +107,38 @@ class AuthService:
     def register_user(self, email: str, name: str, password: str, plan: str = "free") -> Optional[User]:
         """Register a new user"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            # Check if user exists
-            cursor.execute("SELECT id FROM users WHERE email = ?", (email,))
-            if cursor.fetchone():
-                conn.close()
-                return None
-            
-            # Create user
-            import uuid
-            user_id = str(uuid.uuid4())
-            password_hash = User.hash_password(password)
-            user = User(
-                id=user_id,
-                email=email,
-                name=name,
-                password_hash=password_hash,
-                plan=plan
-            )
-            
-            # Insert into database
-            cursor.execute("""
-                INSERT INTO users (id, email, name, password_hash, plan, api_key, created_at)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-            """, (
-                user.id,
-                user.email,
-                user.name,
-                user.password_hash,
-                user.plan,
-                user.api_key,
-                user.created_at.isoformat()
-            ))
-            
-            conn.commit()
-            conn.close()
-            
+            with self._backend.connection() as conn, conn:
+                # Check if user exists
+                if conn.execute("SELECT id FROM users WHERE email = ?", (email,)).fetchone():
+                    return None
+
+                # Create user
+                import uuid
+                user_id = str(uuid.uuid4())
+                password_hash = User.hash_password(password)
+                user = User(
+                    id=user_id,
+                    email=email,
+                    name=name,
+                    password_hash=password_hash,
+                    plan=plan
+                )
+
+                # Insert into database (the UNIQUE email constraint still guards
+                # against a concurrent registration on another replica)
+                conn.execute("""
+                    INSERT INTO users (id, email, name, password_hash, plan, api_key, created_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                """, (
+                    user.id,
+                    user.email,
+                    user.name,
+                    user.password_hash,
+                    user.plan,
+                    user.api_key,
+                    user.created_at.isoformat()
+                ))
+
             return user
         except Exception as e:
             print(f"Error registering user: {e}")
@@ -134,35 +147,9 @@ class AuthService:
     def authenticate_user(self, email: str, password: str) -> Optional[User]:
         """Authenticate user with email and password"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            conn.row_factory = sqlite3.Row
-            cursor = conn.cursor()
-            
-            cursor.execute("SELECT * FROM users WHERE email = ?", (email,))
-            row = cursor.fetchone()
-            conn.close()
-            
-            if not row:
-                return None
-            
-            user = User(
-                id=row["id"],
-                email=row["email"],
-                name=row["name"],
-                password_hash=row["password_hash"],
-                plan=row["plan"],
-                api_key=row["api_key"],
-                created_at=self._parse_created_at(row["created_at"]),
-                stripe_customer_id=row["stripe_customer_id"],
-                subscription_status=row["subscription_status"],
-                subscription_id=row["subscription_id"],
-                quotes_used=row["quotes_used"],
-                api_calls_used=row["api_calls_used"]
-            )
-            
-            if not user.verify_password(password):
+            user = self._get_user("email", email)
+            if not user or not user.verify_password(password):
                 return None
-            
             return user
         except Exception as e:
             print(f"Error authenticating user: {e}")
@@ -171,67 +158,97 @@ class AuthService:
     def get_user_by_id(self, user_id: str) -> Optional[User]:
         """Get user by ID"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            conn.row_factory = sqlite3.Row
-            cursor = conn.cursor()
-            
-            cursor.execute("SELECT * FROM users WHERE id = ?", (user_id,))
-            row = cursor.fetchone()
-            conn.close()
-            
-            if not row:
-                return None
-            
-            user = User(
-                id=row["id"],
-                email=row["email"],
-                name=row["name"],
-                password_hash=row["password_hash"],
-                plan=row["plan"],
-                api_key=row["api_key"],
-                created_at=self._parse_created_at(row["created_at"]),
-                stripe_customer_id=row["stripe_customer_id"],
-                subscription_status=row["subscription_status"],
-                subscription_id=row["subscription_id"],
-                quotes_used=row["quotes_used"],
-                api_calls_used=row["api_calls_used"]
-            )
-            
-            return user
+            return self._get_user("id", user_id)
         except Exception as e:
             print(f"Error getting user: {e}")
             return None
 
+    def get_user_by_email(self, email: str) -> Optional[User]:
+        """Get user by (normalized) email"""
+        try:
+            return self._get_user("email", email)
+        except Exception as e:
+            print(f"Error getting user by email: {e}")
+            return None
+
+    def get_or_create_external_user(self, email: str, name: str, password_hash: str = "auth0") -> Optional[User]:
+        """User for an externally authenticated email (Auth0), created on first login"""
+        try:
+            with self._backend.connection() as conn, conn:
+                row = conn.execute("SELECT * FROM users WHERE email = ?", (email,)).fetchone()
+                if row:
+                    return self._row_to_user(row)
+                import uuid
+                user = User(id=str(uuid.uuid4()), email=email, name=name, password_hash=password_hash, plan="free")
+                conn.execute("""
+                    INSERT INTO users (id, email, name, password_hash, plan, api_key, created_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                """, (
+                    user.id,
+                    user.email,
+                    user.name,
+                    user.password_hash,
+                    user.plan,
+                    user.api_key,
+                    datetime.now(timezone.utc).isoformat()
+                ))
+            return user
+        except Exception as e:
+            print(f"Error creating external user: {e}")
+            return None
+
+    def _update_user(self, user_id: str, column: str, value: Optional[str]) -> bool:
+        with self._backend.connection() as conn, conn:
+            cursor = conn.execute(f"UPDATE users SET {column} = ? WHERE id = ?", (value, user_id))
+        return cursor.rowcount > 0
+
+    def update_user_name(self, user_id: str, name: str) -> bool:
+        """Update the user's display name"""
+        try:
+            return self._update_user(user_id, "name", name)
+        except Exception as e:
+            print(f"Error updating user name: {e}")
+            return False
+
+    def update_password(self, user_id: str, new_password: str) -> bool:
+        """Hash and store a new password"""
+        try:
+            return self._update_user(user_id, "password_hash", User.hash_password(new_password))
+        except Exception as e:
+            print(f"Error updating password: {e}")
+            return False
+
+    def update_user_stripe_customer(self, user_id: str, customer_id: str) -> bool:
+        """Link the user to a Stripe customer"""
+        try:
+            return self._update_user(user_id, "stripe_customer_id", customer_id)
+        except Exception as e:
+            print(f"Error updating Stripe customer: {e}")
+            return False
+
+    def regenerate_api_key(self, user_id: str) -> Optional[str]:
+        """Replace the user's API key; returns the new key"""
+        new_key = User(id="", email="", name="", password_hash="")._generate_api_key()
+        try:
+            return new_key if self._update_user(user_id, "api_key", new_key) else None
+        except Exception as e:
+            print(f"Error regenerating API key: {e}")
+            return None
+
+    def delete_user(self, user_id: str) -> bool:
+        """Delete a user account"""
+        try:
+            with self._backend.connection() as conn, conn:
+                cursor = conn.execute("DELETE FROM users WHERE id = ?", (user_id,))
+            return cursor.rowcount > 0
+        except Exception as e:
+            print(f"Error deleting user: {e}")
+            return False
+
     def get_user_by_api_key(self, api_key: str) -> Optional[User]:
         """Get user by API key"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            conn.row_factory = sqlite3.Row
-            cursor = conn.cursor()
-            
-            cursor.execute("SELECT * FROM users WHERE api_key = ?", (api_key,))
-            row = cursor.fetchone()
-            conn.close()
-            
-            if not row:
-                return None
-            
-            user = User(
-                id=row["id"],
-                email=row["email"],
-                name=row["name"],
-                password_hash=row["password_hash"],
-                plan=row["plan"],
-                api_key=row["api_key"],
-                created_at=self._parse_created_at(row["created_at"]),
-                stripe_customer_id=row["stripe_customer_id"],
-                subscription_status=row["subscription_status"],
-                subscription_id=row["subscription_id"],
-                quotes_used=row["quotes_used"],
-                api_calls_used=row["api_calls_used"]
-            )
-            
-            return user
+            return self._get_user("api_key", api_key)
         except Exception as e:
             print(f"Error getting user by API key: {e}")
             return None
@@ -239,33 +256,23 @@ class AuthService:
     def update_user_usage(self, user_id: str, quotes_used: Optional[int] = None, api_calls_used: Optional[int] = None):
         """Update user usage statistics"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            if quotes_used is not None:
-                cursor.execute("UPDATE users SET quotes_used = ? WHERE id = ?", (quotes_used, user_id))
-            
-            if api_calls_used is not None:
-                cursor.execute("UPDATE users SET api_calls_used = ? WHERE id = ?", (api_calls_used, user_id))
-            
-            conn.commit()
-            conn.close()
+            with self._backend.connection() as conn, conn:
+                if quotes_used is not None:
+                    conn.execute("UPDATE users SET quotes_used = ? WHERE id = ?", (quotes_used, user_id))
+
+                if api_calls_used is not None:
+                    conn.execute("UPDATE users SET api_calls_used = ? WHERE id = ?", (api_calls_used, user_id))
         except Exception as e:
             print(f"Error updating user usage: {e}")
 
     def update_subscription(self, user_id: str, plan: str, subscription_id: str, subscription_status: str):
         """Update user subscription info"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute("""
-                UPDATE users 
-                SET plan = ?, subscription_id = ?, subscription_status = ?
-                WHERE id = ?
-            """, (plan, subscription_id, subscription_status, user_id))
-            
-            conn.commit()
-            conn.close()
+            with self._backend.connection() as conn, conn:
+                conn.execute("""
+                    UPDATE users 
+                    SET plan = ?, subscription_id = ?, subscription_status = ?
+                    WHERE id = ?
+                """, (plan, subscription_id, subscription_status, user_id))
         except Exception as e:
             print(f"Error updating subscription: {e}")
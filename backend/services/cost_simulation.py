@@ -0,0 +1,151 @@
+"""Monte Carlo cost ranges (P10/P50/P90) for a priced estimate.
+
+Each material line and the labor line gets a mean-one lognormal cost factor whose
+spread combines quantity uncertainty (from detection confidence) and price
+uncertainty (from the spread across regional price rows). Every quote reuses one
+fixed set of standard-normal draws (common random numbers), so ranges are
+reproducible and a whole batch of quotes is sampled as one NumPy array.
+"""
+import math
+from functools import lru_cache
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; estimates are returned without a range
+    np = None
+
+# Relative quantity/hours spread at full and zero detection confidence
+QUANTITY_SIGMA_MIN = 0.05
+QUANTITY_SIGMA_MAX = 0.40
+# Floor on relative price spread for keys priced the same in every region
+PRICE_SIGMA_FLOOR = 0.03
+LABOR_RATE_SIGMA = 0.05
+
+PERCENTILES = (10, 50, 90)
+# Material lines sampled individually; cheaper lines beyond this are merged into one
+MAX_SAMPLED_LINES = 12
+
+_SEED = 0x5EED
+# Quotes per sampling chunk are capped so the factor arrays stay around this many values
+_MAX_CHUNK_VALUES = 2_000_000
+
+
+class CostRangeInputs(NamedTuple):
+    """One priced estimate to simulate."""
+
+    line_totals: Sequence[float]
+    line_price_sigmas: Sequence[float]
+    labor_total: float
+    confidence: float
+    subtype_multiplier: float
+    profit_pct: float
+    contingency_pct: float
+
+
+def quantity_sigma(confidence: float) -> float:
+    """Relative spread of detected quantities for a 0..1 detection confidence."""
+    c = min(max(float(confidence), 0.0), 1.0)
+    return QUANTITY_SIGMA_MIN + (QUANTITY_SIGMA_MAX - QUANTITY_SIGMA_MIN) * (1.0 - c)
+
+
+def price_sigma(prices: Sequence[float]) -> float:
+    """Relative spread (coefficient of variation) of a key's prices across regions."""
+    values = [p for p in prices if p and p > 0]
+    if len(values) < 2:
+        return PRICE_SIGMA_FLOOR
+    mean = sum(values) / len(values)
+    var = sum((p - mean) ** 2 for p in values) / (len(values) - 1)
+    return max(PRICE_SIGMA_FLOOR, math.sqrt(var) / mean)
+
+
+def _merge_small_lines(base, sigma):
+    """Cap sampled columns at MAX_SAMPLED_LINES by merging the cheapest lines.
+
+    The merged lines are replaced by one lognormal with the same mean and variance
+    (Fenton-Wilkinson), so sampling cost stays flat for very long material lists.
+    """
+    if base.size <= MAX_SAMPLED_LINES:
+        return base, sigma
+    order = np.argsort(base)[::-1]
+    keep, rest = order[:MAX_SAMPLED_LINES - 1], order[MAX_SAMPLED_LINES - 1:]
+    mean = base[rest].sum()
+    var = (base[rest] ** 2 * np.expm1(sigma[rest] ** 2)).sum()
+    merged_sigma = math.sqrt(math.log1p(var / mean ** 2)) if mean > 0 else 0.0
+    return np.append(base[keep], mean), np.append(sigma[keep], merged_sigma)
+
+
+@lru_cache(maxsize=4)
+def _standard_normals(samples: int):
+    """Shared draws, (samples, material lines + labor)."""
+    z = np.random.default_rng(_SEED).standard_normal((samples, MAX_SAMPLED_LINES + 1), dtype=np.float32)
+    z.flags.writeable = False
+    return z
+
+
+def simulate_cost_ranges(jobs: Sequence[CostRangeInputs], samples: int = 10000) -> List[Optional[Dict[str, Any]]]:
+    """Return P10/P50/P90 totals and per-category bands per job (None without NumPy).
+
+    Jobs are padded to the same columns (material lines, then labor) and sampled
+    together, so a batch costs one set of array operations rather than one per quote.
+    """
+    if np is None or samples <= 0 or not jobs:
+        return [None] * len(jobs)
+    cols = MAX_SAMPLED_LINES + 1
+    base = np.zeros((len(jobs), cols), dtype=np.float64)
+    sigma = np.zeros((len(jobs), cols), dtype=np.float64)
+    q_sigmas = []
+    for i, job in enumerate(jobs):
+        q_sigma = quantity_sigma(job.confidence)
+        q_sigmas.append(q_sigma)
+        line_base, line_sigma = _merge_small_lines(
+            np.array(job.line_totals, dtype=np.float64),
+            np.sqrt(q_sigma ** 2 + np.array(job.line_price_sigmas, dtype=np.float64) ** 2),
+        )
+        base[i, :line_base.size] = line_base
+        sigma[i, :line_sigma.size] = line_sigma
+        base[i, -1] = job.labor_total
+        sigma[i, -1] = math.sqrt(q_sigma ** 2 + LABOR_RATE_SIGMA ** 2)
+    subtype = np.array([job.subtype_multiplier for job in jobs], dtype=np.float64)
+
+    z = _standard_normals(samples)
+    per_chunk = max(1, _MAX_CHUNK_VALUES // (samples * cols))
+    # (job, materials/labor/subtotal, percentile)
+    pct = np.empty((len(jobs), 3, len(PERCENTILES)), dtype=np.float64)
+    for start in range(0, len(jobs), per_chunk):
+        end = start + per_chunk
+        # Mean-one lognormal factors: (jobs, samples, lines + labor); float32 halves the cost
+        f = z[None, :, :] * sigma[start:end, None, :].astype(np.float32)
+        f -= (0.5 * sigma[start:end, None, :] ** 2).astype(np.float32)
+        np.exp(f, out=f)
+        costs = f.astype(np.float64)
+        costs *= base[start:end, None, :]
+        materials = costs[:, :, :-1].sum(axis=2)
+        labor = costs[:, :, -1]
+        subtotal = (materials + labor) * subtype[start:end, None]
+        pct[start:end] = np.percentile(
+            np.stack([materials, labor, subtotal], axis=1), PERCENTILES, axis=2
+        ).transpose(1, 2, 0)
+
+    def bands(p10: float, p50: float, p90: float, scale: float = 1.0) -> Dict[str, float]:
+        return {"p10": round(p10 * scale, 2), "p50": round(p50 * scale, 2), "p90": round(p90 * scale, 2)}
+
+    # Profit, contingency and total are fixed positive multiples of the subtotal, so
+    # their percentiles are the subtotal's scaled
+    results: List[Optional[Dict[str, Any]]] = []
+    for job, q_sigma, ((m10, m50, m90), (l10, l50, l90), (s10, s50, s90)) in zip(
+        jobs, q_sigmas, pct.tolist(), strict=True
+    ):
+        total_scale = 1.0 + job.profit_pct / 100.0 + job.contingency_pct / 100.0
+        results.append({
+            "samples": samples,
+            **bands(s10, s50, s90, total_scale),
+            "breakdown": {
+                "materials": bands(m10, m50, m90),
+                "labor": bands(l10, l50, l90),
+                "profit": bands(s10, s50, s90, job.profit_pct / 100.0),
+                "contingency": bands(s10, s50, s90, job.contingency_pct / 100.0),
+            },
+            "quantity_sigma": round(q_sigma, 4),
+        })
+    return results
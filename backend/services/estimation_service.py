@@ -1,19 +1,48 @@
+import asyncio
+import copy
+import hashlib
 import json
 import time
 import re
-from typing import Dict, List, Any, Optional, Set
+import threading
+from typing import Dict, List, Any, Optional, Tuple
 from pathlib import Path
 import os
-import json as _json
-import csv
+from datetime import date
 from services.pricing_service import PricingService
+from services.cost_simulation import CostRangeInputs, price_sigma, simulate_cost_ranges
+from services.labor_rates import LaborRate, LaborRateTable, ParsedLaborFile, build_labor_table, normalize_trade, parse_labor_file
+from services.price_lists import ParsedPriceFile, PriceSnapshot, build_price_snapshot, parse_price_file
+from services.price_catalog import MappedPriceCatalog, compile_price_catalog
+from services.price_history import PriceHistory, parse_as_of
+from services.material_search import decode_cursor
+from services.regions import normalize_region
+from services.ttl_cache import TTLCache
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; batch estimates fall back to a per-job loop
+    np = None
+
+QUALITY_MULTIPLIERS = {
+    "standard": 1.0,
+    "premium": 1.3,
+    "luxury": 1.8,
+}
+
+LABOR_REGION_MULTIPLIERS = {
+    "midwest": 1.0,
+    "south": 0.85,
+    "northeast": 1.25,
+    "west": 1.35,
+}
 
 
 class EstimationService:
     """Handles cost estimation and pricing logic"""
 
     def __init__(self):
-        self.materials_db = self._load_materials_db()
+        self._base_materials = self._load_materials_db()
         self.labor_rates = self._load_labor_rates()
 
         # Optional external pricing backend (watsonx.data)
@@ -23,13 +52,45 @@ class EstimationService:
         except Exception:
             self.pricing = None
 
-        # External price list hot-reload tracking
-        self._external_price_files: List[Path] = []
-        self._external_price_mtimes: Dict[str, float] = {}
-        self._external_keys: Set[str] = set()
+        # External price lists: parsed per file, published as immutable snapshots
+        self._price_list_paths: List[Path] = []
+        self._parsed_price_files: Dict[str, ParsedPriceFile] = {}
+        self._snapshot: PriceSnapshot = build_price_snapshot(self._base_materials, [], version=0)
+        self._reload_lock = threading.Lock()
+        self._price_list_errors: Dict[str, str] = {}
+        # Set by PriceListWatcher while it owns reloads; skips request-time stat() checks
+        self._background_reload = False
+        # Memoized estimates keyed by a hash of the inputs plus the price snapshot version
+        self._estimate_cache = TTLCache(
+            max_size=int(os.getenv("ESTIMATE_CACHE_SIZE", "1024")),
+            ttl_sec=float(os.getenv("ESTIMATE_CACHE_TTL_SEC", "600")),
+        )
+        # Every observed price by effective date, for as-of estimates and lookups
+        history_file = os.getenv("PRICE_HISTORY_FILE")
+        self._price_history = PriceHistory(Path(history_file) if history_file else None)
+        self._as_of_snapshots = TTLCache(max_size=32, ttl_sec=3600)
+        # Monte Carlo samples for the P10/P50/P90 cost range; 0 disables it
+        self._cost_range_samples = int(os.getenv("ESTIMATE_COST_RANGE_SAMPLES", "10000"))
         self._price_list_reload_interval = float(os.getenv("PRICE_LIST_RELOAD_SEC", "10"))
         self._price_list_last_check = 0.0
-        self._load_external_price_lists()
+        # Optional compiled binary catalog shared by all workers via mmap
+        catalog = os.getenv("PRICE_CATALOG_FILE")
+        self._price_catalog_path: Optional[Path] = Path(catalog) if catalog else None
+        self._catalog_sources: Dict[str, Dict[str, Any]] = {}
+        if not self._load_price_catalog():
+            self._load_external_price_lists()
+
+        # Labor rate files (trade x region x effective date), reloaded like price lists
+        self._labor_rate_paths: List[Path] = []
+        self._parsed_labor_files: Dict[str, ParsedLaborFile] = {}
+        self._labor_table: LaborRateTable = build_labor_table(self.labor_rates, [], version=0)
+        self._labor_rate_errors: Dict[str, str] = {}
+        self._load_labor_rate_files()
+
+    @property
+    def materials_db(self):
+        """Read-only view of material prices in the current snapshot."""
+        return self._snapshot.materials
 
     def _load_materials_db(self) -> Dict:
         """Load material prices database"""
@@ -66,17 +127,25 @@ class EstimationService:
             "carpentry": {"rate": 60.00, "unit": "hour"},
         }
 
-    def _load_external_price_lists(self) -> None:
-        """Load one or more alternate pricing lists from file(s) to override defaults.
+    def _configured_price_list_paths(self) -> List[Path]:
+        """Resolve price list paths from env.
 
         Env vars:
         - PRICE_LIST_FILE or PRICING_FILE: single file path
         - PRICE_LIST_FILES or PRICING_FILES: comma-separated file paths
-        Supports JSON dict or list, and CSV/TSV with key,price,unit,description
         """
+        return self._configured_paths(
+            os.getenv("PRICE_LIST_FILE") or os.getenv("PRICING_FILE"),
+            os.getenv("PRICE_LIST_FILES") or os.getenv("PRICING_FILES"),
+        )
+
+    def _configured_labor_rate_paths(self) -> List[Path]:
+        """Resolve labor rate file paths from LABOR_RATE_FILE / LABOR_RATE_FILES."""
+        return self._configured_paths(os.getenv("LABOR_RATE_FILE"), os.getenv("LABOR_RATE_FILES"))
+
+    @staticmethod
+    def _configured_paths(single: Optional[str], multi: Optional[str]) -> List[Path]:
         paths: List[str] = []
-        single = os.getenv("PRICE_LIST_FILE") or os.getenv("PRICING_FILE")
-        multi = os.getenv("PRICE_LIST_FILES") or os.getenv("PRICING_FILES")
         if single:
             paths.append(single)
         if multi:
@@ -85,161 +154,227 @@ class EstimationService:
                 if p:
                     paths.append(p)
 
-        # Normalize paths
         file_paths: List[Path] = []
         for p in paths:
+            path = Path(p)
+            if not path.is_absolute():
+                path = Path.cwd() / path
+            file_paths.append(path)
+        return file_paths
+
+    def _load_external_price_lists(self) -> List[str]:
+        """Load alternate pricing lists from file(s) to override defaults.
+
+        Supports JSON dict or list, and CSV/TSV with key,price,unit,description;
+        files are streamed so very large supplier dumps load in bounded memory.
+        List and CSV rows may carry a region (e.g. "Midwest"); those are indexed by
+        (key, region) so estimates can price materials for the requested region.
+
+        Only files whose mtime/size and content hash changed are reparsed. If the
+        merged result differs from the current snapshot, a new versioned snapshot is
+        built off to the side and swapped in with a single assignment.
+        Returns the paths that were reparsed.
+        """
+        with self._reload_lock:
+            self._price_list_paths = self._configured_price_list_paths()
+            parsed_files: List[ParsedPriceFile] = []
+            fresh: List[ParsedPriceFile] = []
+            reparsed: List[str] = []
+            errors: Dict[str, str] = {}
+            cache: Dict[str, ParsedPriceFile] = {}
+            for path in self._price_list_paths:
+                previous = self._parsed_price_files.get(str(path))
+                try:
+                    if not path.exists():
+                        continue
+                    parsed = parse_price_file(path, previous)
+                    if parsed is not previous:
+                        reparsed.append(str(path))
+                        fresh.append(parsed)
+                except Exception as e:
+                    print(f"Price list load failed for {path}: {e}")
+                    errors[str(path)] = str(e)
+                    # Keep serving the last good parse of this file
+                    if previous is None:
+                        continue
+                    parsed = previous
+                cache[str(path)] = parsed
+                parsed_files.append(parsed)
+            self._parsed_price_files = cache
+            self._price_list_errors = errors
+            if fresh:
+                try:
+                    self._price_history.record_price_files(fresh)
+                except Exception as e:
+                    print(f"Price history update failed: {e}")
+                    self._price_list_errors["price_history"] = str(e)
+
+            current = self._snapshot
+            digests = tuple(pf.digest for pf in parsed_files)
+            files = tuple(pf.path for pf in parsed_files)
+            if digests != current.digests or files != current.files:
+                self._snapshot = build_price_snapshot(
+                    self._base_materials, parsed_files, version=current.version + 1
+                )
+                # Entries for the old version can never hit again
+                self._estimate_cache.clear()
+                self._compile_price_catalog()
+            self._price_list_last_check = time.time()
+            return reparsed
+
+    def _load_labor_rate_files(self) -> List[str]:
+        """Load labor rate files and publish a new LaborRateTable if any changed.
+
+        Same lifecycle as the price lists: unchanged files are not reparsed, a file
+        that fails to parse keeps its last good rows, and the table is swapped in
+        with a single assignment. Returns the paths that were reparsed.
+        """
+        with self._reload_lock:
+            self._labor_rate_paths = self._configured_labor_rate_paths()
+            parsed_files: List[ParsedLaborFile] = []
+            reparsed: List[str] = []
+            errors: Dict[str, str] = {}
+            cache: Dict[str, ParsedLaborFile] = {}
+            for path in self._labor_rate_paths:
+                previous = self._parsed_labor_files.get(str(path))
+                try:
+                    if not path.exists():
+                        continue
+                    parsed = parse_labor_file(path, previous)
+                    if parsed is not previous:
+                        reparsed.append(str(path))
+                except Exception as e:
+                    print(f"Labor rate load failed for {path}: {e}")
+                    errors[str(path)] = str(e)
+                    if previous is None:
+                        continue
+                    parsed = previous
+                cache[str(path)] = parsed
+                parsed_files.append(parsed)
+            self._parsed_labor_files = cache
+            self._labor_rate_errors = errors
+
+            current = self._labor_table
+            digests = tuple(pf.digest for pf in parsed_files)
+            files = tuple(pf.path for pf in parsed_files)
+            if digests != current.digests or files != current.files:
+                self._labor_table = build_labor_table(self.labor_rates, parsed_files, version=current.version + 1)
+                self._estimate_cache.clear()
+            return reparsed
+
+    def _labor_rate_files_changed(self) -> bool:
+        for path in self._labor_rate_paths:
+            previous = self._parsed_labor_files.get(str(path))
             try:
-                path = Path(p)
-                if not path.is_absolute():
-                    path = Path.cwd() / path
-                file_paths.append(path)
-            except Exception:
+                st = path.stat()
+            except OSError:
+                if previous is not None:
+                    return True
                 continue
+            if previous is None or not previous.is_current(st):
+                return True
+        return False
 
-        # Clear existing external overrides to handle deletions
-        for k in list(self._external_keys):
-            if k in self.materials_db:
-                del self.materials_db[k]
-        self._external_keys.clear()
-        self._external_price_files = []
+    # --- Hot reload of every watched file (price lists and labor rates) ---
+    def _watched_paths(self) -> List[Path]:
+        return list(self._price_list_paths) + list(self._labor_rate_paths)
 
-        for path in file_paths:
-            try:
-                if not path.exists():
-                    continue
-                if path.suffix.lower() == ".json":
-                    with open(path, "r", encoding="utf-8") as f:
-                        data = _json.load(f)
-                    if isinstance(data, dict):
-                        for key, rec in data.items():
-                            if not isinstance(rec, dict):
-                                continue
-                            price = rec.get("price")
-                            if price is None:
-                                continue
-                            unit = rec.get("unit", "unit")
-                            desc = rec.get("description", self.materials_db.get(key, {}).get("description"))
-                            self.materials_db[key] = {
-                                "price": float(price),
-                                "unit": unit,
-                                "description": desc or key.replace("_", " "),
-                            }
-                            self._external_keys.add(key)
-                    elif isinstance(data, list):
-                        loaded_count = 0
-                        sample_keys: List[str] = []
-                        for rec in data:
-                            if not isinstance(rec, dict):
-                                continue
-                            # Case-insensitive field extraction helpers
-                            def _ci(rec: Dict[str, Any], *names: str) -> Optional[Any]:
-                                for n in names:
-                                    if n in rec:
-                                        return rec[n]
-                                # try lowercase fallback
-                                lower = {k.lower(): v for k, v in rec.items()}
-                                for n in names:
-                                    v = lower.get(n.lower())
-                                    if v is not None:
-                                        return v
-                                return None
-
-                            price = _ci(rec, "price", "Final_Price_USD", "Base_Cost_USD")
-                            if price is None:
-                                continue
-                            key_raw = _ci(rec, "key")
-                            key = key_raw.strip() if isinstance(key_raw, str) else ""
-                            name_val = _ci(rec, "name", "material", "title", "Material")
-                            name = name_val.strip() if isinstance(name_val, str) else ""
-                            if not key:
-                                key = self._name_to_db_key(name) if name else ""
-                            if not key:
-                                continue
-                            unit_val = _ci(rec, "unit", "Unit_Type")
-                            unit = unit_val if isinstance(unit_val, str) and unit_val.strip() else self.materials_db.get(key, {}).get("unit", "unit")
-                            desc_val = _ci(rec, "description", "Description", "Category")
-                            desc = (
-                                desc_val if isinstance(desc_val, str) and desc_val.strip() else self.materials_db.get(key, {}).get("description") or (name or key.replace("_", " "))
-                            )
-                            try:
-                                self.materials_db[key] = {
-                                    "price": float(price),
-                                    "unit": unit,
-                                    "description": desc,
-                                }
-                                self._external_keys.add(key)
-                                loaded_count += 1
-                                if len(sample_keys) < 5:
-                                    sample_keys.append(key)
-                            except Exception:
-                                continue
-                        try:
-                            print(f"Price list loaded from {path}: {loaded_count} entries (e.g., {', '.join(sample_keys)})")
-                        except Exception:
-                            pass
-                elif path.suffix.lower() in (".csv", ".tsv"):
-                    delim = "," if path.suffix.lower() == ".csv" else "\t"
-                    with open(path, "r", encoding="utf-8") as f:
-                        reader = csv.DictReader(f, delimiter=delim)
-                        for row in reader:
-                            key = (row.get("key") or "").strip()
-                            if not key:
-                                continue
-                            price_field = row.get("price")
-                            if price_field is None or str(price_field).strip() == "":
-                                continue
-                            try:
-                                price = float(str(price_field).strip())
-                            except Exception:
-                                continue
-                            unit = (row.get("unit") or "unit").strip()
-                            desc = (row.get("description") or self.materials_db.get(key, {}).get("description") or key.replace("_", " ")).strip()
-                            self.materials_db[key] = {"price": price, "unit": unit, "description": desc}
-                            self._external_keys.add(key)
-                else:
-                    # Unknown extension, try JSON parse
-                    with open(path, "r", encoding="utf-8") as f:
-                        data = _json.load(f)
-                    if isinstance(data, dict):
-                        for key, rec in data.items():
-                            if not isinstance(rec, dict) or rec.get("price") is None:
-                                continue
-                            self.materials_db[key] = {
-                                "price": float(rec["price"]),
-                                "unit": rec.get("unit", "unit"),
-                                "description": rec.get("description", key.replace("_", " ")),
-                            }
-                            self._external_keys.add(key)
-
-                # Track for hot reload
-                self._external_price_files.append(path)
-                try:
-                    self._external_price_mtimes[str(path)] = path.stat().st_mtime
-                except Exception:
-                    self._external_price_mtimes[str(path)] = 0.0
-            except Exception as e:
-                print(f"Price list load failed for {path}: {e}")
+    def _watched_files_changed(self) -> bool:
+        return self._price_lists_changed() or self._labor_rate_files_changed()
+
+    def _reload_watched_files(self) -> List[str]:
+        """Reload price lists and labor rates; returns the reparsed paths."""
+        return self._load_external_price_lists() + self._load_labor_rate_files()
 
+    def _watched_file_errors(self) -> Dict[str, str]:
+        return {**self._price_list_errors, **self._labor_rate_errors}
+
+    def _price_list_sources(self) -> List[Dict[str, Any]]:
+        return [
+            {"path": str(pf.path), "mtime": pf.mtime, "size": pf.size, "digest": pf.digest}
+            for pf in self._parsed_price_files.values()
+        ]
+
+    def _compile_price_catalog(self) -> None:
+        """Write the current snapshot to PRICE_CATALOG_FILE, if configured."""
+        if not self._price_catalog_path:
+            return
+        try:
+            compile_price_catalog(self._snapshot, self._price_catalog_path, self._price_list_sources())
+        except Exception as e:
+            print(f"Price catalog compile failed for {self._price_catalog_path}: {e}")
+            self._price_list_errors[str(self._price_catalog_path)] = str(e)
+
+    def _load_price_catalog(self) -> bool:
+        """Map a compiled catalog instead of parsing the price lists.
+
+        Only used when the catalog was compiled from the currently configured files
+        and none of them changed since; otherwise the lists are parsed (and the
+        catalog recompiled) as usual.
+        """
+        if not self._price_catalog_path or not self._price_catalog_path.exists():
+            return False
+        paths = self._configured_price_list_paths()
+        try:
+            catalog = MappedPriceCatalog(self._price_catalog_path)
+            if not catalog.matches_sources(paths):
+                return False
+        except Exception as e:
+            print(f"Price catalog load failed for {self._price_catalog_path}: {e}")
+            return False
+        sources = catalog.sources
+        self._price_list_paths = paths
+        self._catalog_sources = {src["path"]: src for src in sources}
+        self._snapshot = PriceSnapshot(
+            version=int(catalog.header.get("snapshot_version") or 1),
+            materials=catalog.materials,
+            regional=catalog.regional,
+            regions=catalog.regions,
+            external_keys=catalog.external_keys,
+            files=tuple(Path(src["path"]) for src in sources),
+            digests=tuple(src["digest"] for src in sources),
+            names=catalog.names,
+            created_at=time.time(),
+            source="catalog",
+            indexes=catalog.indexes,
+        )
         self._price_list_last_check = time.time()
+        return True
+
+    def warm_price_snapshot(self) -> None:
+        """Build the current snapshot's lazy indexes (CPU-bound; run off the event loop)."""
+        self._snapshot.warm()
+
+    def _price_lists_changed(self) -> bool:
+        """Cheap stat() check of configured files against the parsed state."""
+        for path in self._price_list_paths:
+            previous = self._parsed_price_files.get(str(path))
+            mapped = self._catalog_sources.get(str(path))
+            try:
+                st = path.stat()
+            except OSError:
+                if previous is not None or mapped is not None:
+                    return True
+                continue
+            if previous is not None:
+                if not previous.is_current(st):
+                    return True
+            elif mapped is None or st.st_mtime != mapped["mtime"] or st.st_size != mapped["size"]:
+                return True
+        return False
 
     def _maybe_reload_price_lists(self) -> None:
-        if not self._external_price_files:
+        if self._background_reload or not self._watched_paths():
             return
         now = time.time()
         if now - self._price_list_last_check < self._price_list_reload_interval:
             return
-        changed = False
-        for path in self._external_price_files:
-            try:
-                mtime = path.stat().st_mtime
-                if mtime > self._external_price_mtimes.get(str(path), 0.0):
-                    changed = True
-                    break
-            except Exception:
-                changed = True
-                break
-        if changed:
+        if self._price_lists_changed():
             self._load_external_price_lists()
+        else:
+            self._price_list_last_check = now
+        if self._labor_rate_files_changed():
+            self._load_labor_rate_files()
 
     async def calculate_estimate(
         self,
@@ -247,6 +382,7 @@ class EstimationService:
         reasoning: Dict,
         project_type: str,
         advanced_options: Optional[Dict[str, Any]] = None,
+        as_of: Optional[str] = None,
     ) -> Dict[str, Any]:
         """Calculate complete project estimate with optional advanced options
         
@@ -259,11 +395,107 @@ class EstimationService:
                 - contingency_pct: float (default 0, range 0-30)
                 - profit_pct: float (default 15, range 0-50)
                 - region: "midwest", "south", "northeast", "west" (affects labor rates)
+                - as_of: ISO date to price materials and labor as they were on that day
+                - cost_range: true to add Monte Carlo P10/P50/P90 totals (default off)
+            as_of: Same as advanced_options["as_of"]; raises ValueError if not a date
         """
+        as_of = parse_as_of(as_of or (advanced_options or {}).get("as_of"))
+        if as_of:
+            advanced_options = {**(advanced_options or {}), "as_of": as_of}
 
-        # Hot-reload pricing lists if files changed
+        # Hot-reload pricing lists if files changed, then price against one snapshot
         self._maybe_reload_price_lists()
-        
+        snapshot = self._snapshot_for(as_of, self._snapshot)
+
+        cache_key = self._estimate_cache_key(vision_results, reasoning, project_type, advanced_options, snapshot)
+        if cache_key is not None:
+            cached = self._estimate_cache.get(cache_key)
+            if cached is not None:
+                return copy.deepcopy(cached)
+
+        args = (vision_results, reasoning, project_type, advanced_options, snapshot)
+        if self._uses_external_pricing(snapshot):
+            # Pricing backend fetches (and waits on other callers' fetches) block
+            estimate = await asyncio.to_thread(self._compute_estimate, *args)
+        else:
+            estimate = self._compute_estimate(*args)
+        if cache_key is not None:
+            self._estimate_cache.put(cache_key, copy.deepcopy(estimate))
+        return estimate
+
+    def _snapshot_for(self, as_of: Optional[str], snapshot: PriceSnapshot) -> PriceSnapshot:
+        """The snapshot repriced from history as of a date (cached), or itself for None."""
+        if not as_of:
+            return snapshot
+        key = (snapshot.version, self._price_history.version, as_of)
+        snap = self._as_of_snapshots.get(key)
+        if snap is None:
+            snap = self._price_history.snapshot_as_of(snapshot, as_of)
+            self._as_of_snapshots.put(key, snap)
+        return snap
+
+    def _estimate_cache_key(
+        self,
+        vision_results: Dict,
+        reasoning: Dict,
+        project_type: str,
+        advanced_options: Optional[Dict[str, Any]],
+        snapshot: PriceSnapshot,
+    ) -> Optional[str]:
+        """Stable content hash of the estimate inputs and price version; None if unhashable."""
+        if self._estimate_cache.max_size == 0:
+            return None
+        try:
+            payload = json.dumps(
+                [vision_results, reasoning, project_type, advanced_options or {}],
+                sort_keys=True,
+                separators=(",", ":"),
+                default=str,
+            )
+        except (TypeError, ValueError):
+            return None
+        digest = hashlib.sha256(payload.encode("utf-8")).hexdigest()
+        # Labor rates depend on the table version and on today's date (effective dates)
+        return f"{snapshot.version}.{self._labor_table.version}.{date.today().isoformat()}:{digest}"
+
+    def _compute_estimate(
+        self,
+        vision_results: Dict,
+        reasoning: Dict,
+        project_type: str,
+        advanced_options: Optional[Dict[str, Any]],
+        snapshot: PriceSnapshot,
+    ) -> Dict[str, Any]:
+        prep = self._prepare_estimate(vision_results, reasoning, project_type, advanced_options)
+
+        # Calculate material costs with quality multiplier and regional price rows
+        materials_cost = self._calculate_materials_cost(
+            prep["materials_needed"], quality=prep["quality"], region=prep["region"], snapshot=snapshot
+        )
+
+        # Calculate labor costs with region multiplier
+        labor_cost = self._calculate_labor_cost(prep["labor_hours"], project_type, region=prep["region"], on=prep["as_of"])
+
+        # Apply profit margin and contingency
+        subtotal = (materials_cost["total"] + labor_cost["total"]) * prep["subtype_multiplier"]
+        profit = subtotal * (prep["profit_pct"] / 100.0)
+        contingency = subtotal * (prep["contingency_pct"] / 100.0)
+        total = subtotal + profit + contingency
+
+        cost_range = self._cost_ranges([(prep, vision_results, materials_cost, labor_cost)], snapshot)[0]
+        return self._build_estimate(
+            prep, vision_results, project_type, materials_cost, labor_cost, profit, contingency, total, snapshot,
+            cost_range,
+        )
+
+    def _prepare_estimate(
+        self,
+        vision_results: Dict,
+        reasoning: Dict,
+        project_type: str,
+        advanced_options: Optional[Dict[str, Any]] = None,
+    ) -> Dict[str, Any]:
+        """Resolve options, area scaling, labor hours and subtype multiplier for one quote."""
         # Parse advanced options with defaults
         opts = advanced_options or {}
         material_quality = opts.get("quality", "standard")
@@ -277,6 +509,9 @@ class EstimationService:
         contingency_pct = self._parse_float(opts.get("contingency_pct"), default=0.0, min_val=0.0, max_val=30.0)
         profit_pct = self._parse_float(opts.get("profit_pct"), default=15.0, min_val=0.0, max_val=50.0)
         region = opts.get("region", "midwest")
+        # Monte Carlo cost ranges are opt-in: they cost far more than the estimate itself
+        cost_range = str(opts.get("cost_range", False)).lower() in ("true", "1", "yes", "on")
+        as_of = parse_as_of(opts.get("as_of"))
 
         # Extract materials from LLM reasoning
         materials_needed = reasoning.get("materials_needed", [])
@@ -308,13 +543,6 @@ class EstimationService:
                     scaled.append(m)
             materials_needed = scaled
 
-        # Calculate material costs with quality multiplier
-        materials_cost = self._calculate_materials_cost(materials_needed, quality=material_quality)
-
-        # Calculate labor costs with region multiplier
-        labor_hours = self._extract_labor_hours(reasoning) * area_factor
-        labor_cost = self._calculate_labor_cost(labor_hours, project_type, region=region)
-
         # Apply subtype multipliers for specific exterior cases (e.g., roof replacement is materially costlier)
         subtype_multiplier = 1.0
         try:
@@ -327,18 +555,33 @@ class EstimationService:
         except Exception:
             pass
 
-        # Apply profit margin and contingency
-        subtotal = (materials_cost["total"] + labor_cost["total"]) * subtype_multiplier
-        profit = subtotal * (profit_pct / 100.0)
-        contingency = subtotal * (contingency_pct / 100.0)
-        total = subtotal + profit + contingency
-
-        # Estimate timeline
-        timeline = self._estimate_timeline(labor_hours)
-
-        # Generate step-by-step plan
-        steps = self._generate_work_steps(project_type, materials_needed)
+        return {
+            "quality": material_quality,
+            "contingency_pct": contingency_pct,
+            "profit_pct": profit_pct,
+            "region": region,
+            "materials_needed": materials_needed,
+            "labor_hours": self._extract_labor_hours(reasoning) * area_factor,
+            "subtype_multiplier": subtype_multiplier,
+            "cost_range": cost_range,
+            "as_of": as_of,
+        }
 
+    def _build_estimate(
+        self,
+        prep: Dict[str, Any],
+        vision_results: Dict,
+        project_type: str,
+        materials_cost: Dict[str, Any],
+        labor_cost: Dict[str, Any],
+        profit: float,
+        contingency: float,
+        total: float,
+        snapshot: PriceSnapshot,
+        cost_range: Optional[Dict[str, Any]] = None,
+    ) -> Dict[str, Any]:
+        """Assemble the estimate payload from computed costs and the optional cost range."""
+        confidence = self._calculate_confidence(vision_results)
         return {
             "total_cost": {
                 "currency": "USD",
@@ -352,17 +595,328 @@ class EstimationService:
             },
             "materials": materials_cost["items"],
             "labor": labor_cost["items"],
-            "timeline": timeline,
-            "steps": steps,
-            "confidence_score": self._calculate_confidence(vision_results),
+            "timeline": self._estimate_timeline(prep["labor_hours"]),
+            "steps": self._generate_work_steps(project_type, prep["materials_needed"]),
+            "confidence_score": confidence,
+            "cost_range": cost_range,
+            "price_snapshot_version": snapshot.version,
+            "priced_as_of": snapshot.as_of,
             "options_applied": {
-                "quality": material_quality,
-                "contingency_pct": contingency_pct,
-                "profit_pct": profit_pct,
-                "region": region,
+                "quality": prep["quality"],
+                "contingency_pct": prep["contingency_pct"],
+                "profit_pct": prep["profit_pct"],
+                "region": prep["region"],
             },
         }
 
+    def _cost_ranges(
+        self,
+        jobs: List[Tuple[Dict[str, Any], Dict, Dict[str, Any], Dict[str, Any]]],
+        snapshot: PriceSnapshot,
+    ) -> List[Optional[Dict[str, Any]]]:
+        """P10/P50/P90 ranges for (prep, vision_results, materials_cost, labor_cost) jobs.
+
+        Jobs that opted in are simulated together in one vectorized call; the rest (and
+        every job when sampling is disabled or NumPy is missing) get None.
+        """
+        ranges: List[Optional[Dict[str, Any]]] = [None] * len(jobs)
+        wanted = [j for j, job in enumerate(jobs) if job[0]["cost_range"]]
+        if not wanted or self._cost_range_samples <= 0:
+            return ranges
+        spreads = snapshot.regional_prices
+        inputs = []
+        for j in wanted:
+            prep, vision_results, materials_cost, labor_cost = jobs[j]
+            inputs.append(CostRangeInputs(
+                [item["total"] for item in materials_cost["items"]],
+                [
+                    price_sigma(spreads.get(snapshot.resolver.resolve(str(m.get("name", "")).strip()), ()))
+                    for m in prep["materials_needed"]
+                ],
+                round(labor_cost["total"], 2),
+                self._calculate_confidence(vision_results),
+                prep["subtype_multiplier"],
+                prep["profit_pct"],
+                prep["contingency_pct"],
+            ))
+        for j, cost_range in zip(wanted, simulate_cost_ranges(inputs, self._cost_range_samples), strict=True):
+            ranges[j] = cost_range
+        return ranges
+
+    def calculate_estimates_batch(self, jobs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Estimate many pre-analyzed jobs at once, returning results in input order.
+
+        Each job is a dict with vision_results, reasoning, project_type and optional
+        options (same as calculate_estimate's advanced_options). Prices are resolved
+        once per distinct (key, region) and the quantity x price x multiplier math runs
+        as NumPy arrays across the whole batch; numbers match the scalar path. Falls
+        back to a per-job loop when NumPy is not installed.
+        """
+        self._maybe_reload_price_lists()
+        snapshot = self._snapshot
+        inputs = [
+            (
+                job.get("vision_results") or {},
+                job.get("reasoning") or {},
+                job.get("project_type") or "general",
+            )
+            for job in jobs
+        ]
+        preps = [
+            self._prepare_estimate(vision, reasoning, project_type, job.get("options"))
+            for (vision, reasoning, project_type), job in zip(inputs, jobs, strict=True)
+        ]
+        if not preps:
+            return []
+
+        # Jobs priced as of different dates are vectorized per date
+        groups: Dict[Optional[str], List[int]] = {}
+        for j, prep in enumerate(preps):
+            groups.setdefault(prep["as_of"], []).append(j)
+        if len(groups) == 1:
+            return self._estimate_prepared_batch(inputs, preps, self._snapshot_for(preps[0]["as_of"], snapshot))
+        results: List[Optional[Dict[str, Any]]] = [None] * len(preps)
+        for as_of, idxs in groups.items():
+            estimates = self._estimate_prepared_batch(
+                [inputs[j] for j in idxs], [preps[j] for j in idxs], self._snapshot_for(as_of, snapshot)
+            )
+            for j, estimate in zip(idxs, estimates, strict=True):
+                results[j] = estimate
+        return results
+
+    def _estimate_prepared_batch(
+        self,
+        inputs: List[Tuple[Dict, Dict, str]],
+        preps: List[Dict[str, Any]],
+        snapshot: PriceSnapshot,
+    ) -> List[Dict[str, Any]]:
+        n = len(preps)
+        if np is None:
+            # No NumPy means no cost ranges either (simulate_cost_ranges returns None)
+            results = []
+            for (vision, _, project_type), prep in zip(inputs, preps, strict=True):
+                materials_cost = self._calculate_materials_cost(
+                    prep["materials_needed"], quality=prep["quality"], region=prep["region"], snapshot=snapshot
+                )
+                labor_cost = self._calculate_labor_cost(prep["labor_hours"], project_type, region=prep["region"], on=prep["as_of"])
+                subtotal = (materials_cost["total"] + labor_cost["total"]) * prep["subtype_multiplier"]
+                profit = subtotal * (prep["profit_pct"] / 100.0)
+                contingency = subtotal * (prep["contingency_pct"] / 100.0)
+                results.append(self._build_estimate(
+                    prep, vision, project_type, materials_cost, labor_cost,
+                    profit, contingency, subtotal + profit + contingency, snapshot,
+                ))
+            return results
+
+        # Flatten every material line in the batch; price each distinct (key, region) once
+        line_job: List[int] = []
+        line_qty: List[float] = []
+        line_price: List[float] = []
+        line_meta: List[Tuple[str, Any, Dict[str, Any]]] = []
+        price_cache: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        resolved = [
+            [snapshot.resolver.resolve(str(m.get("name", "")).strip()) for m in prep["materials_needed"]]
+            for prep in preps
+        ]
+        external = self._external_prices([key for keys in resolved for key in keys], snapshot)
+        for j, prep in enumerate(preps):
+            region_slug = normalize_region(prep["region"])
+            for material, db_key in zip(prep["materials_needed"], resolved[j], strict=True):
+                raw_name = str(material.get("name", "")).strip()
+                price_data = price_cache.get((db_key, region_slug))
+                if price_data is None:
+                    price_data = self._price_record(db_key, region_slug, snapshot, external)
+                    price_cache[(db_key, region_slug)] = price_data
+                quantity = self._parse_quantity(material.get("quantity", 0))
+                line_job.append(j)
+                line_qty.append(float(quantity))
+                line_price.append(float(price_data.get("price", 10.0)))
+                line_meta.append((raw_name or db_key.replace("_", " "), quantity, {
+                    "unit": material.get("unit") or price_data.get("unit") or "unit",
+                }))
+
+        quality_mult = np.array([self._quality_multiplier(p["quality"]) for p in preps], dtype=np.float64)
+        job_idx = np.array(line_job, dtype=np.intp)
+        unit_price = np.array(line_price, dtype=np.float64) * quality_mult[job_idx]
+        line_total = np.array(line_qty, dtype=np.float64) * unit_price
+        # bincount adds weights in line order, matching the scalar running sum
+        materials_total = np.bincount(job_idx, weights=line_total, minlength=n)
+
+        labor = [
+            self._labor_rate(project_type, p["region"], p["as_of"])
+            for (_, _, project_type), p in zip(inputs, preps, strict=True)
+        ]
+        hours = np.array([p["labor_hours"] for p in preps], dtype=np.float64)
+        hourly_rate = np.array([rate for _, rate, _ in labor], dtype=np.float64) * np.array(
+            [mult for _, _, mult in labor], dtype=np.float64
+        )
+        labor_total = hours * hourly_rate
+
+        subtype = np.array([p["subtype_multiplier"] for p in preps], dtype=np.float64)
+        profit_frac = np.array([p["profit_pct"] / 100.0 for p in preps], dtype=np.float64)
+        contingency_frac = np.array([p["contingency_pct"] / 100.0 for p in preps], dtype=np.float64)
+        subtotal = (materials_total + labor_total) * subtype
+        profit = subtotal * profit_frac
+        contingency = subtotal * contingency_frac
+        total = subtotal + profit + contingency
+
+        # Back to Python floats so round() matches the scalar path exactly
+        unit_price_l = unit_price.tolist()
+        line_total_l = line_total.tolist()
+        items: List[List[Dict[str, Any]]] = [[] for _ in range(n)]
+        for i, j in enumerate(line_job):
+            name, quantity, extra = line_meta[i]
+            items[j].append({
+                "name": name,
+                "quantity": quantity,
+                "unit": extra["unit"],
+                "unit_price": round(unit_price_l[i], 2),
+                "total": round(line_total_l[i], 2),
+            })
+
+        materials_total_l = materials_total.tolist()
+        labor_total_l = labor_total.tolist()
+        hourly_rate_l = hourly_rate.tolist()
+        profit_l, contingency_l, total_l = profit.tolist(), contingency.tolist(), total.tolist()
+        costs = []
+        for j, ((vision, _, _), prep) in enumerate(zip(inputs, preps, strict=True)):
+            trade, base_rate, multiplier = labor[j]
+            labor_cost = {
+                "items": [{
+                    "trade": trade,
+                    "hours": prep["labor_hours"],
+                    "rate": round(hourly_rate_l[j], 2),
+                    "base_rate": base_rate,
+                    "region_multiplier": multiplier,
+                    "total": round(labor_total_l[j], 2),
+                }],
+                "total": labor_total_l[j],
+            }
+            materials_cost = {"items": items[j], "total": materials_total_l[j]}
+            costs.append((prep, vision, materials_cost, labor_cost))
+
+        # One Monte Carlo simulation for every job in the batch that asked for a range
+        ranges = self._cost_ranges(costs, snapshot)
+        return [
+            self._build_estimate(
+                prep, vision, project_type, materials_cost, labor_cost,
+                profit_l[j], contingency_l[j], total_l[j], snapshot, ranges[j],
+            )
+            for j, ((_, _, project_type), (prep, vision, materials_cost, labor_cost)) in enumerate(
+                zip(inputs, costs, strict=True)
+            )
+        ]
+
+    def calculate_pricing_matrix(
+        self,
+        vision_results: Dict,
+        reasoning: Dict,
+        project_type: str,
+        grid: Optional[Dict[str, List[Any]]] = None,
+        advanced_options: Optional[Dict[str, Any]] = None,
+    ) -> Dict[str, Any]:
+        """Totals for every quality x region x contingency x profit combination.
+
+        Material lines and labor hours are resolved once; only the option-dependent
+        multipliers vary, so the whole grid is computed in one vectorized pass. A
+        missing grid axis uses the single value implied by advanced_options. Every
+        cell equals calculate_estimate's total for that combination.
+
+        Returns axes, totals[q][r][c][p], materials[q][r], labor[r] and profit /
+        contingency per cell.
+        """
+        self._maybe_reload_price_lists()
+        grid = grid or {}
+        prep = self._prepare_estimate(vision_results, reasoning, project_type, advanced_options)
+        snapshot = self._snapshot_for(prep["as_of"], self._snapshot)
+
+        qualities = [str(q) for q in grid.get("quality") or [prep["quality"]]]
+        regions = [str(r) for r in grid.get("region") or [prep["region"]]]
+        contingencies = [
+            self._parse_float(c, default=0.0, min_val=0.0, max_val=30.0)
+            for c in grid.get("contingency_pct") or [prep["contingency_pct"]]
+        ]
+        profits = [
+            self._parse_float(p, default=15.0, min_val=0.0, max_val=50.0)
+            for p in grid.get("profit_pct") or [prep["profit_pct"]]
+        ]
+
+        # Resolve each line once; only its unit price varies by region
+        lines = []
+        keys = [snapshot.resolver.resolve(str(m.get("name", "")).strip()) for m in prep["materials_needed"]]
+        external = self._external_prices(keys, snapshot)
+        for material, db_key in zip(prep["materials_needed"], keys, strict=True):
+            quantity = float(self._parse_quantity(material.get("quantity", 0)))
+            prices = []
+            for region in regions:
+                rec = self._price_record(db_key, normalize_region(region), snapshot, external)
+                prices.append(float(rec.get("price", 10.0)))
+            lines.append((quantity, prices))
+
+        quality_mult = [self._quality_multiplier(q) for q in qualities]
+        labor = [self._labor_rate(project_type, r, prep["as_of"]) for r in regions]
+        hours = prep["labor_hours"]
+        subtype = prep["subtype_multiplier"]
+
+        if np is not None:
+            qm = np.array(quality_mult, dtype=np.float64)[:, None]
+            materials = np.zeros((len(qualities), len(regions)), dtype=np.float64)
+            # Accumulate line by line so each cell sums in the same order as the scalar path
+            for quantity, prices in lines:
+                materials += quantity * (np.array(prices, dtype=np.float64)[None, :] * qm)
+            labor_total = hours * (
+                np.array([rate for _, rate, _ in labor], dtype=np.float64)
+                * np.array([mult for _, _, mult in labor], dtype=np.float64)
+            )
+            subtotal = (materials + labor_total[None, :]) * subtype
+            profit = subtotal[:, :, None] * (np.array(profits, dtype=np.float64) / 100.0)
+            contingency = subtotal[:, :, None] * (np.array(contingencies, dtype=np.float64) / 100.0)
+            total = subtotal[:, :, None, None] + profit[:, :, None, :] + contingency[:, :, :, None]
+            materials_l, labor_l = materials.tolist(), labor_total.tolist()
+            profit_l, contingency_l, total_l = profit.tolist(), contingency.tolist(), total.tolist()
+        else:
+            materials_l = []
+            for m in quality_mult:
+                row = []
+                for ri in range(len(regions)):
+                    acc = 0.0
+                    for quantity, prices in lines:
+                        acc += quantity * (prices[ri] * m)
+                    row.append(acc)
+                materials_l.append(row)
+            labor_l = [hours * (rate * mult) for _, rate, mult in labor]
+            subtotal_l = [[(materials_l[qi][ri] + labor_l[ri]) * subtype for ri in range(len(regions))] for qi in range(len(qualities))]
+            profit_l = [[[st * (p / 100.0) for p in profits] for st in row] for row in subtotal_l]
+            contingency_l = [[[st * (c / 100.0) for c in contingencies] for st in row] for row in subtotal_l]
+            total_l = [
+                [
+                    [[st + pr + co for pr in profit_l[qi][ri]] for co in contingency_l[qi][ri]]
+                    for ri, st in enumerate(row)
+                ]
+                for qi, row in enumerate(subtotal_l)
+            ]
+
+        def _r(values):
+            if isinstance(values, list):
+                return [_r(v) for v in values]
+            return round(values, 2)
+
+        return {
+            "axes": {
+                "quality": qualities,
+                "region": regions,
+                "contingency_pct": contingencies,
+                "profit_pct": profits,
+            },
+            "currency": "USD",
+            "totals": _r(total_l),
+            "materials": _r(materials_l),
+            "labor": _r(labor_l),
+            "profit": _r(profit_l),
+            "contingency": _r(contingency_l),
+            "price_snapshot_version": snapshot.version,
+        }
+
     def _parse_float(self, value: Any, default: float = 0.0, min_val: Optional[float] = None, max_val: Optional[float] = None) -> float:
         """Parse and clamp a float value"""
         try:
@@ -387,43 +941,40 @@ class EstimationService:
         except Exception:
             return 16.0
 
-    def _calculate_materials_cost(self, materials: List[Dict], quality: str = "standard") -> Dict:
+    def _calculate_materials_cost(
+        self,
+        materials: List[Dict],
+        quality: str = "standard",
+        region: Optional[str] = None,
+        snapshot: Optional[PriceSnapshot] = None,
+    ) -> Dict:
         """Calculate total material costs with quality multiplier
         
         Args:
             materials: List of material dicts
             quality: "standard" (1.0x), "premium" (1.3x), "luxury" (1.8x)
+            region: Optional region; uses regional price rows when the price lists have them
+            snapshot: Price snapshot to use (defaults to the current one)
         """
-        quality_multipliers = {
-            "standard": 1.0,
-            "premium": 1.3,
-            "luxury": 1.8,
-        }
-        multiplier = quality_multipliers.get(quality.lower(), 1.0)
+        snap = snapshot or self._snapshot
+        multiplier = self._quality_multiplier(quality)
+        region_slug = normalize_region(region)
         
         items: List[Dict[str, Any]] = []
         total = 0.0
 
-        for material in materials:
+        # Resolve every line first so the pricing service is asked once per quote
+        keys = [snap.resolver.resolve(str(material.get("name", "")).strip()) for material in materials]
+        external = self._external_prices(keys, snap)
+
+        for material, db_key in zip(materials, keys, strict=True):
             raw_name = str(material.get("name", "")).strip()
-            db_key = self._name_to_db_key(raw_name)
 
             # Parse quantity (can be number or string like "3 50lb bags")
             quantity_val = material.get("quantity", 0)
             quantity = self._parse_quantity(quantity_val)
 
-            # Prefer external pricing if available
-            price_data = None
-            if self.pricing is not None:
-                try:
-                    rec = self.pricing.get_price(db_key)
-                    if rec and rec.get("price") is not None:
-                        price_data = {"price": float(rec["price"]), "unit": rec.get("unit") or "unit"}
-                except Exception:
-                    price_data = None
-            # Fallback to local DB
-            if price_data is None:
-                price_data = self.materials_db.get(db_key, {"price": 10.0, "unit": "unit"})
+            price_data = self._price_record(db_key, region_slug, snap, external)
             unit_price = float(price_data.get("price", 10.0)) * multiplier
             line_total = float(quantity) * unit_price
 
@@ -441,6 +992,54 @@ class EstimationService:
 
         return {"items": items, "total": total}
 
+    def _quality_multiplier(self, quality: str) -> float:
+        return QUALITY_MULTIPLIERS.get(quality.lower(), 1.0)
+
+    def _uses_external_pricing(self, snapshot: Optional[PriceSnapshot] = None) -> bool:
+        """Whether pricing against the snapshot may call the (blocking) pricing service.
+
+        The pricing service only knows current prices, so as-of snapshots skip it.
+        """
+        if self.pricing is None or not self.pricing.is_enabled():
+            return False
+        return snapshot is None or not snapshot.as_of
+
+    def _external_prices(self, keys: List[str], snapshot: Optional[PriceSnapshot] = None) -> Dict[str, Dict[str, Any]]:
+        """Bulk-fetch prices for keys from the pricing service; empty when it is disabled."""
+        if not keys or not self._uses_external_pricing(snapshot):
+            return {}
+        try:
+            return self.pricing.get_prices(keys)
+        except Exception:
+            return {}
+
+    def _price_record(
+        self,
+        key: str,
+        region_slug: str,
+        snapshot: PriceSnapshot,
+        external: Optional[Dict[str, Dict[str, Any]]] = None,
+    ) -> Dict[str, Any]:
+        """Price for one key: external pricing service, then local DB (regional row first).
+
+        Pass `external` from _external_prices to avoid a pricing service call per key.
+        """
+        if external is None:
+            external = self._external_prices([key], snapshot)
+        rec = external.get(key)
+        if rec and rec.get("price") is not None:
+            return {"price": float(rec["price"]), "unit": rec.get("unit") or "unit"}
+        return self._local_price(key, region_slug, snapshot) or {"price": 10.0, "unit": "unit"}
+
+    def _local_price(self, key: str, region_slug: str = "", snapshot: Optional[PriceSnapshot] = None) -> Optional[Dict[str, Any]]:
+        """Return the price row for key in the given region, else the flat entry."""
+        snap = snapshot or self._snapshot
+        if region_slug:
+            rec = snap.regional.get((key, region_slug))
+            if rec is not None:
+                return rec
+        return snap.materials.get(key)
+
     def _parse_quantity(self, value: Any) -> float:
         """Parse quantity which may be numeric or a string like '3 50lb bags'."""
         try:
@@ -455,73 +1054,20 @@ class EstimationService:
             return 0.0
 
     def _name_to_db_key(self, name: str) -> str:
-        """Map common material names to database keys."""
-        n = name.lower().strip()
-        mapping = {
-            "floor & wall tile": "tile",
-            "floor and wall tile": "tile",
-            "tile": "tile",
-            "unsanded grout": "grout",
-            "grout": "grout",
-            "grout sealer": "grout_sealer",
-            "thin-set mortar": "thin_set_mortar",
-            "thin set mortar": "thin_set_mortar",
-            "thinset": "thin_set_mortar",
-            "tile adhesive": "adhesive",
-            "adhesive": "adhesive",
-            "cement backer board": "cement_backer_board",
-            "backer board": "cement_backer_board",
-            "cement board": "cement_backer_board",
-            "lumber (2x4x8 treated)": "lumber_2x4_treated",
-            "lumber (2x4x8 untreated)": "lumber_2x4",
-            "2x4": "lumber_2x4",
-            "concrete (3000 psi)": "concrete_3000psi",
-            "concrete": "concrete_3000psi",
-            "drywall": "drywall",
-            "joint compound": "joint_compound",
-            "paint": "paint",
-            "primer": "primer",
-            "backsplash tile": "backsplash",
-            "countertop": "countertop",
-            "cabinets": "cabinets",
-        }
-        if n in mapping:
-            return mapping[n]
-        if "tile" in n and "backer" not in n:
-            return "tile"
-        if "grout" in n and "sealer" not in n:
-            return "grout"
-        if "sealer" in n and "grout" in n:
-            return "grout_sealer"
-        if "backer" in n or "cement board" in n:
-            return "cement_backer_board"
-        if "thin" in n and "mortar" in n:
-            return "thin_set_mortar"
-        if "2x4" in n:
-            return "lumber_2x4"
-        if "concrete" in n:
-            return "concrete_3000psi"
-        return n.replace(" ", "_")
-
-    def _calculate_labor_cost(self, hours: float, project_type: str, region: str = "midwest") -> Dict:
+        """Map a material name to a database key via the compiled resolver."""
+        return self._snapshot.resolver.resolve(name)
+
+    def _calculate_labor_cost(self, hours: float, project_type: str, region: str = "midwest", on: Optional[str] = None) -> Dict:
         """Calculate labor costs with regional adjustment
         
         Args:
             hours: Labor hours
             project_type: Project type
             region: "midwest" (1.0x), "south" (0.85x), "northeast" (1.25x), "west" (1.35x)
+            on: ISO date whose labor rates apply (rates with a later effective date are
+                ignored); None for the rates in force today
         """
-        region_multipliers = {
-            "midwest": 1.0,
-            "south": 0.85,
-            "northeast": 1.25,
-            "west": 1.35,
-        }
-        multiplier = region_multipliers.get(region.lower(), 1.0)
-        
-        trade = self._map_project_to_trade(project_type)
-        rate_info = self.labor_rates.get(trade, self.labor_rates["general"])
-        base_rate = rate_info["rate"]
+        trade, base_rate, multiplier = self._labor_rate(project_type, region, on)
         hourly_rate = base_rate * multiplier
         total = hours * hourly_rate
         return {
@@ -538,6 +1084,19 @@ class EstimationService:
             "total": total,
         }
 
+    def _labor_rate(self, project_type: str, region: str = "midwest", on: Optional[str] = None) -> Tuple[str, float, float]:
+        """Return (trade, base hourly rate, region multiplier) for a project on date `on`.
+
+        Regional rows from the labor rate files are already regional, so they get a
+        1.0 multiplier; trade-wide rates keep the built-in region multipliers.
+        """
+        trade = self._map_project_to_trade(project_type)
+        table = self._labor_table
+        entry = table.lookup(trade, normalize_region(region), on) or table.lookup("general", normalize_region(region), on)
+        if entry.region:
+            return trade, entry.rate, 1.0
+        return trade, entry.rate, LABOR_REGION_MULTIPLIERS.get(region.lower(), 1.0)
+
     def _map_project_to_trade(self, project_type: str) -> str:
         mapping = {
             "bathroom": "tile",
@@ -591,51 +1150,121 @@ class EstimationService:
         avg_confidence = sum(d.get("confidence", 0) for d in detections) / len(detections)
         return round(min(avg_confidence * 0.9, 0.85), 2)
 
-    async def search_materials(self, query: str, limit: int = 10) -> List[Dict]:
-        results = []
-        query_lower = query.lower()
-        for name, data in self.materials_db.items():
-            if query_lower in name or query_lower in data.get("description", "").lower():
-                results.append(
-                    {
-                        "name": name,
-                        "price": data["price"],
-                        "unit": data["unit"],
-                        "description": data["description"],
-                    }
-                )
-        return results[:limit]
+    async def search_materials(self, query: str, limit: int = 10, offset: int = 0) -> List[Dict]:
+        return self.search_materials_page(query, limit, offset)["results"]
+
+    def search_materials_page(
+        self,
+        query: str,
+        limit: int = 10,
+        offset: int = 0,
+        cursor: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """Ranked material search with offset or cursor pagination.
+
+        Returns {"results", "total", "next_cursor"}; a cursor overrides offset. Raises
+        ValueError for a cursor that is malformed or was issued by another index version
+        (price lists reloaded), since its offset no longer points into the same ranking.
+        """
+        index = self._snapshot.search_index
+        if cursor:
+            offset, version = decode_cursor(cursor)
+            if version != index.version:
+                raise ValueError("Invalid or expired cursor")
+        return index.search(query, limit=limit, offset=offset)
+
+    async def get_labor_rates(
+        self,
+        trade: Optional[str] = None,
+        region: Optional[str] = None,
+        as_of: Optional[str] = None,
+    ) -> Dict:
+        """Rates in force by trade, optionally filtered to trades and priced for a region/date.
+
+        `trade` may be a comma-separated list; `as_of` is an ISO date (default today).
+        """
+        table = self._labor_table
+        trades = [normalize_trade(t) for t in trade.split(",") if t.strip()] if trade else None
+        if trades and len(trades) == 1 and table.lookup(trades[0]) is None:
+            return {trade: None}
+        rates = table.effective_rates(trades, normalize_region(region), as_of)
+        return {t: self._labor_rate_info(rate, region) for t, rate in rates.items()}
+
+    def _labor_rate_info(self, rate: LaborRate, region: Optional[str]) -> Dict[str, Any]:
+        multiplier = 1.0 if rate.region or not region else LABOR_REGION_MULTIPLIERS.get(region.lower(), 1.0)
+        return {
+            "rate": round(rate.rate * multiplier, 2),
+            "unit": rate.unit,
+            "base_rate": rate.rate,
+            "region": rate.region or None,
+            "region_multiplier": multiplier,
+            "effective_date": rate.effective_date or None,
+            "source": rate.source,
+            "description": rate.description,
+        }
 
-    async def get_labor_rates(self, trade: Optional[str] = None) -> Dict:
-        if trade:
-            return {trade: self.labor_rates.get(trade)}
-        return self.labor_rates
+    def labor_rate_status(self) -> Dict[str, Any]:
+        return {**self._labor_table.status(), "load_errors": self._labor_rate_errors}
 
     # --- Utilities for ops/endpoints ---
     def reload_price_lists(self) -> Dict[str, Any]:
         """Force reload of external price lists and return a summary."""
-        self._load_external_price_lists()
+        reparsed = self._load_external_price_lists()
+        snap = self._snapshot
         return {
-            "files": [str(p) for p in self._external_price_files],
-            "keys_loaded": len(self._external_keys),
+            "files": [str(p) for p in snap.files],
+            "reparsed_files": reparsed,
+            "snapshot_version": snap.version,
+            "keys_loaded": len(snap.external_keys),
+            "regions": sorted(snap.regions),
             "last_check": self._price_list_last_check,
             "interval_sec": self._price_list_reload_interval,
+            "ingest": self.price_list_ingest_stats(),
         }
 
-    def lookup_price(self, key_or_name: str) -> Dict[str, Any]:
-        """Lookup price for a given key or raw name using all layers (pricing service -> local DB)."""
-        key = self._name_to_db_key(key_or_name)
+    def price_history(self, key_or_name: str, region: Optional[str] = None) -> Dict[str, Any]:
+        """Full price timeline for a key (flat and, if given, one region)."""
+        key = self._snapshot.resolver.resolve(key_or_name)
+        region_slug = normalize_region(region)
+        result: Dict[str, Any] = {"key": key, "timeline": self._price_history.timeline(key)}
+        if region_slug:
+            result["region"] = region_slug
+            result["regional_timeline"] = self._price_history.timeline(key, region_slug)
+        return result
+
+    def price_list_ingest_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Row counts from the last parse of each configured price list."""
+        return {path: pf.ingest_stats() for path, pf in self._parsed_price_files.items()}
+
+    def lookup_price(self, key_or_name: str, region: Optional[str] = None, as_of: Optional[str] = None) -> Dict[str, Any]:
+        """Lookup price for a given key or raw name using all layers (pricing service -> local DB).
+
+        With `as_of` (ISO date) the price in force on that date is returned from the
+        price history, falling back to the current price when the key has no history then.
+        """
+        as_of = parse_as_of(as_of)
+        snap = self._snapshot
+        key = snap.resolver.resolve(key_or_name)
+        region_slug = normalize_region(region)
+        if as_of:
+            for region_key in ((region_slug, "") if region_slug else ("",)):
+                hist = self._price_history.price_at(key, region_key, as_of)
+                if hist is not None:
+                    result = {"key": key, "source": "price-history", "as_of": as_of, **hist}
+                    if region_key:
+                        result["region"] = region_key
+                    result["unit"] = result["unit"] or "unit"
+                    return result
         # Try external pricing service first
-        if self.pricing is not None:
-            try:
-                rec = self.pricing.get_price(key)
-                if rec and rec.get("price") is not None:
-                    return {"key": key, "source": "external", "price": float(rec["price"]), "unit": rec.get("unit") or "unit"}
-            except Exception:
-                pass
+        rec = self._external_prices([key], self._snapshot_for(as_of, snap)).get(key)
+        if rec and rec.get("price") is not None:
+            return {"key": key, "source": "external", "price": float(rec["price"]), "unit": rec.get("unit") or "unit"}
         # Fallback to local DB
-        rec = self.materials_db.get(key)
+        if region_slug and (key, region_slug) in snap.regional:
+            rec = snap.regional[(key, region_slug)]
+            return {"key": key, "source": "external-list", "region": region_slug, "price": float(rec.get("price", 0.0)), "unit": rec.get("unit", "unit")}
+        rec = snap.materials.get(key)
         if rec:
-            src = "external-list" if key in self._external_keys else "local"
+            src = "external-list" if key in snap.external_keys else "local"
             return {"key": key, "source": src, "price": float(rec.get("price", 0.0)), "unit": rec.get("unit", "unit")}
         return {"key": key, "source": "none"}
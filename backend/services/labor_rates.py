@@ -0,0 +1,240 @@
+"""Labor rate matrix (trade x region x effective date) loaded from JSON/CSV files.
+
+Rate files are parsed like price lists: each file only when its mtime/size and
+content hash change. The rows are merged over the built-in trade rates into a
+LaborRateTable: a dense trade x region x effective-date grid. Each cell already
+holds the rate in force for that combination, so a lookup is one bisect over the
+effective dates plus an index computation.
+"""
+import csv
+import hashlib
+import io
+import json
+import re
+import time
+from bisect import bisect_right
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from services.price_lists import resolve_columns
+from services.regions import normalize_region
+
+LABOR_FIELD_ALIASES: Dict[str, Tuple[str, ...]] = {
+    "trade": ("trade", "Trade", "craft", "Craft"),
+    "region": ("region", "Region"),
+    "rate": ("rate", "hourly_rate", "Rate_USD", "Hourly_Rate_USD"),
+    "unit": ("unit", "Unit", "Unit_Type"),
+    "effective_date": ("effective_date", "effective", "effective_from", "Effective_Date"),
+    "description": ("description", "Description", "union", "Union"),
+}
+
+# Rows without an effective date apply from the beginning of time
+ALWAYS = ""
+
+
+class LaborRate(NamedTuple):
+    trade: str
+    region: str
+    rate: float
+    unit: str
+    effective_date: str
+    source: str
+    description: Optional[str] = None
+
+
+def normalize_trade(trade: Any) -> str:
+    return re.sub(r"[\s\-]+", "_", str(trade or "").strip().lower())
+
+
+def _parse_effective_date(value: Any) -> str:
+    """Return an ISO date string, or ALWAYS when the value is empty."""
+    if value is None or (isinstance(value, str) and not value.strip()):
+        return ALWAYS
+    if isinstance(value, (date, datetime)):
+        return value.strftime("%Y-%m-%d")
+    return datetime.fromisoformat(str(value).strip()[:10]).strftime("%Y-%m-%d")
+
+
+@dataclass
+class ParsedLaborFile:
+    """Rows parsed from one labor rate file plus the file state they came from."""
+
+    path: Path
+    mtime: float
+    size: int
+    digest: str
+    rows: List[LaborRate] = field(default_factory=list)
+    row_errors: int = 0
+
+    def is_current(self, stat_result) -> bool:
+        return stat_result.st_mtime == self.mtime and stat_result.st_size == self.size
+
+
+def _add_row(parsed: ParsedLaborFile, row: Dict[str, Any]) -> None:
+    trade = normalize_trade(row.get("trade"))
+    rate = row.get("rate")
+    if not trade or rate is None or (isinstance(rate, str) and not rate.strip()):
+        parsed.row_errors += 1
+        return
+    try:
+        value = float(rate.strip() if isinstance(rate, str) else rate)
+        effective = _parse_effective_date(row.get("effective_date"))
+    except (TypeError, ValueError):
+        parsed.row_errors += 1
+        return
+    unit = row.get("unit")
+    description = row.get("description")
+    parsed.rows.append(LaborRate(
+        trade=trade,
+        region=normalize_region(row.get("region")),
+        rate=value,
+        unit=unit.strip() if isinstance(unit, str) and unit.strip() else "hour",
+        effective_date=effective,
+        source=str(parsed.path),
+        description=description.strip() if isinstance(description, str) and description.strip() else None,
+    ))
+
+
+def _canonical_row(values: Iterable[Any], header: List[str]) -> Dict[str, Any]:
+    columns = resolve_columns(header, LABOR_FIELD_ALIASES)
+    values = list(values)
+    return {fld: values[i] for fld, i in columns.items() if i < len(values)}
+
+
+def parse_labor_file(path: Path, previous: Optional[ParsedLaborFile] = None) -> ParsedLaborFile:
+    """Parse one labor rate file, reusing `previous` if the file is unchanged.
+
+    JSON may be a list of rows or a {trade: {"rate", "unit"}} / {trade: rate} dict;
+    CSV/TSV need a header with at least trade and rate columns.
+    """
+    st = path.stat()
+    if previous is not None and previous.is_current(st):
+        return previous
+    raw = path.read_bytes()
+    digest = hashlib.sha256(raw).hexdigest()
+    if previous is not None and previous.digest == digest:
+        previous.mtime, previous.size = st.st_mtime, st.st_size
+        return previous
+
+    parsed = ParsedLaborFile(path=path, mtime=st.st_mtime, size=st.st_size, digest=digest)
+    text = raw.decode("utf-8-sig")
+    suffix = path.suffix.lower()
+    if suffix in (".csv", ".tsv"):
+        reader = csv.reader(io.StringIO(text), delimiter="," if suffix == ".csv" else "\t")
+        header = [h.strip() for h in next(reader, [])]
+        for values in reader:
+            if values:
+                _add_row(parsed, _canonical_row(values, header))
+    else:
+        data = json.loads(text)
+        if isinstance(data, dict):
+            for trade, rec in data.items():
+                if isinstance(rec, dict):
+                    _add_row(parsed, {**_canonical_row(rec.values(), list(rec)), "trade": trade})
+                else:
+                    _add_row(parsed, {"trade": trade, "rate": rec})
+        elif isinstance(data, list):
+            for rec in data:
+                if isinstance(rec, dict):
+                    _add_row(parsed, _canonical_row(rec.values(), list(rec)))
+                else:
+                    parsed.row_errors += 1
+    print(f"Labor rates loaded from {path}: {len(parsed.rows)} rows ({parsed.row_errors} errors)")
+    return parsed
+
+
+class LaborRateTable:
+    """Dense trade x region x effective-date grid of the rate in force for each cell.
+
+    Region "" holds trade-wide rates; regional cells without their own row fall back
+    to it, so callers can tell a regional rate from a default one by `LaborRate.region`.
+    """
+
+    def __init__(
+        self,
+        rows: List[LaborRate],
+        version: int,
+        files: Tuple[Path, ...] = (),
+        digests: Tuple[str, ...] = (),
+    ):
+        self.version = version
+        self.files = files
+        self.digests = digests
+        self.created_at = time.time()
+        self.trades: List[str] = sorted({r.trade for r in rows})
+        self.regions: List[str] = [""] + sorted({r.region for r in rows if r.region})
+        self.dates: List[str] = sorted({ALWAYS} | {r.effective_date for r in rows})
+        self._trade_index = {t: i for i, t in enumerate(self.trades)}
+        self._region_index = {r: i for i, r in enumerate(self.regions)}
+        self.row_count = len(rows)
+
+        # Explicit row per (date, region, trade); later files override earlier ones
+        date_index = {d: i for i, d in enumerate(self.dates)}
+        explicit: Dict[Tuple[int, int, int], LaborRate] = {}
+        for r in rows:
+            explicit[(date_index[r.effective_date], self._region_index[r.region], self._trade_index[r.trade])] = r
+
+        n_dates, n_regions, n_trades = len(self.dates), len(self.regions), len(self.trades)
+        stride = n_regions * n_trades
+        cells: List[Optional[LaborRate]] = [None] * (n_dates * stride)
+        # Region 0 (trade-wide) is filled first so regional cells can fall back to it
+        for ri in range(n_regions):
+            for ti in range(n_trades):
+                own: Optional[LaborRate] = None
+                for d in range(n_dates):
+                    # A rate stays in force until a later effective date replaces it
+                    own = explicit.get((d, ri, ti), own)
+                    cells[d * stride + ri * n_trades + ti] = own if own is not None or ri == 0 else cells[d * stride + ti]
+        self._cells = cells
+
+    def lookup(self, trade: str, region: str = "", on: Optional[str] = None) -> Optional[LaborRate]:
+        """Rate in force for trade/region on the ISO date `on` (default today)."""
+        ti = self._trade_index.get(trade)
+        if ti is None:
+            return None
+        d = bisect_right(self.dates, on or date.today().isoformat()) - 1
+        ri = self._region_index.get(region, 0)
+        return self._cells[(d * len(self.regions) + ri) * len(self.trades) + ti]
+
+    def effective_rates(
+        self, trades: Optional[Iterable[str]] = None, region: str = "", on: Optional[str] = None
+    ) -> Dict[str, LaborRate]:
+        return {
+            t: rate
+            for t in (trades if trades is not None else self.trades)
+            if (rate := self.lookup(t, region, on)) is not None
+        }
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "version": self.version,
+            "files": [str(p) for p in self.files],
+            "rows": self.row_count,
+            "trades": len(self.trades),
+            "regions": [r for r in self.regions if r],
+            "effective_dates": [d for d in self.dates if d],
+            "created_at": self.created_at,
+        }
+
+
+def build_labor_table(
+    base: Dict[str, Dict[str, Any]],
+    parsed_files: List[ParsedLaborFile],
+    version: int,
+) -> LaborRateTable:
+    """Merge parsed files (in order) over the built-in trade rates."""
+    rows = [
+        LaborRate(trade=t, region="", rate=float(rec["rate"]), unit=rec.get("unit") or "hour",
+                  effective_date=ALWAYS, source="built-in")
+        for t, rec in base.items()
+    ]
+    for pf in parsed_files:
+        rows.extend(pf.rows)
+    return LaborRateTable(
+        rows,
+        version=version,
+        files=tuple(pf.path for pf in parsed_files),
+        digests=tuple(pf.digest for pf in parsed_files),
+    )
@@ -0,0 +1,228 @@
+"""Resolve free-text material names (as returned by the LLM) to price database keys.
+
+The resolver is compiled once from the built-in aliases plus every loaded price list
+and rebuilt by EstimationService whenever the lists reload; a compiled price catalog
+stores its tables so mapped workers share them.
+"""
+import re
+from array import array
+from bisect import bisect_left
+from collections import Counter
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Sequence, Set
+
+# Common material names mapped to built-in database keys
+MATERIAL_ALIASES: Dict[str, str] = {
+    "floor & wall tile": "tile",
+    "floor and wall tile": "tile",
+    "tile": "tile",
+    "unsanded grout": "grout",
+    "grout": "grout",
+    "grout sealer": "grout_sealer",
+    "thin-set mortar": "thin_set_mortar",
+    "thin set mortar": "thin_set_mortar",
+    "thinset": "thin_set_mortar",
+    "tile adhesive": "adhesive",
+    "adhesive": "adhesive",
+    "cement backer board": "cement_backer_board",
+    "backer board": "cement_backer_board",
+    "cement board": "cement_backer_board",
+    "lumber (2x4x8 treated)": "lumber_2x4_treated",
+    "lumber (2x4x8 untreated)": "lumber_2x4",
+    "2x4": "lumber_2x4",
+    "concrete (3000 psi)": "concrete_3000psi",
+    "concrete": "concrete_3000psi",
+    "drywall": "drywall",
+    "joint compound": "joint_compound",
+    "paint": "paint",
+    "primer": "primer",
+    "backsplash tile": "backsplash",
+    "countertop": "countertop",
+    "cabinets": "cabinets",
+}
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def _rule_based_key(n: str) -> Optional[str]:
+    """Substring heuristics for the built-in keys; n must already be lowercased."""
+    if "tile" in n and "backer" not in n:
+        return "tile"
+    if "grout" in n and "sealer" not in n:
+        return "grout"
+    if "sealer" in n and "grout" in n:
+        return "grout_sealer"
+    if "backer" in n or "cement board" in n:
+        return "cement_backer_board"
+    if "thin" in n and "mortar" in n:
+        return "thin_set_mortar"
+    if "2x4" in n:
+        return "lumber_2x4"
+    if "concrete" in n:
+        return "concrete_3000psi"
+    return None
+
+
+def canonical_material_key(name: str) -> str:
+    """Derive a database key from a name using only the built-in aliases and rules.
+
+    Used to assign keys to price list rows that have a name but no key, so keys stay
+    stable regardless of which other lists are loaded.
+    """
+    n = name.lower().strip()
+    if n in MATERIAL_ALIASES:
+        return MATERIAL_ALIASES[n]
+    return _rule_based_key(n) or n.replace(" ", "_")
+
+
+def _tokens(text: str) -> List[str]:
+    out = []
+    for tok in _TOKEN_RE.findall(text.lower()):
+        # Fold simple plurals so "sheets" matches "sheet"
+        if len(tok) > 3 and tok.endswith("s") and not tok.endswith("ss"):
+            tok = tok[:-1]
+        out.append(tok)
+    return out
+
+
+def _trigrams(tokens: Iterable[str]) -> Set[str]:
+    grams: Set[str] = set()
+    for tok in tokens:
+        padded = f" {tok} "
+        for i in range(len(padded) - 2):
+            grams.add(padded[i:i + 3])
+    return grams
+
+
+def _signature(tokens: Iterable[str]) -> str:
+    return " ".join(sorted(set(tokens)))
+
+
+def _find(values: Sequence[str], value: str) -> int:
+    """Position of value in a sorted sequence, or -1."""
+    i = bisect_left(values, value)
+    return i if i < len(values) and values[i] == value else -1
+
+
+def build_resolver_tables(known_keys: Iterable[str], names: Optional[Mapping[str, str]] = None) -> Dict[str, Any]:
+    """Lookup tables for MaterialNameResolver: lists of str and array("I") columns.
+
+    exact_texts / exact_keys  sorted alias, key and catalog name texts -> key
+    sig_texts / sig_keys      sorted token-set signatures -> key
+    cand_keys / cand_sizes    trigram candidates (aliases first) and their trigram counts
+    gram_vocab                sorted trigrams, with gram_offsets / gram_cands postings
+    """
+    entries: Dict[str, str] = dict(MATERIAL_ALIASES)
+    for key in known_keys:
+        entries.setdefault(key.lower(), key)
+        entries.setdefault(key.replace("_", " ").lower(), key)
+    for name, key in (names or {}).items():
+        entries.setdefault(name.lower().strip(), key)
+
+    by_tokens: Dict[str, str] = {}
+    cand_keys: List[str] = []
+    cand_sizes = array("I")
+    postings: Dict[str, List[int]] = {}
+    for text, key in entries.items():
+        toks = _tokens(text)
+        if not toks:
+            continue
+        by_tokens.setdefault(_signature(toks), key)
+        grams = _trigrams(toks)
+        idx = len(cand_keys)
+        cand_keys.append(key)
+        cand_sizes.append(len(grams))
+        for g in grams:
+            postings.setdefault(g, []).append(idx)
+
+    exact_texts = sorted(entries)
+    sig_texts = sorted(by_tokens)
+    gram_vocab = sorted(postings)
+    gram_offsets = array("I", [0])
+    gram_cands = array("I")
+    for g in gram_vocab:
+        gram_cands.extend(postings[g])
+        gram_offsets.append(len(gram_cands))
+    return {
+        "exact_texts": exact_texts,
+        "exact_keys": [entries[t] for t in exact_texts],
+        "sig_texts": sig_texts,
+        "sig_keys": [by_tokens[t] for t in sig_texts],
+        "cand_keys": cand_keys,
+        "cand_sizes": cand_sizes,
+        "gram_vocab": gram_vocab,
+        "gram_offsets": gram_offsets,
+        "gram_cands": gram_cands,
+    }
+
+
+class MaterialNameResolver:
+    """Token-signature and char-trigram index over known material names.
+
+    Resolution order: exact alias/key/catalog name, same token set, best trigram match
+    above `min_score`, built-in substring rules, then the slugified name. `tables` are
+    build_resolver_tables(known_keys, names), e.g. mapped from a compiled catalog;
+    they are built when not given.
+    """
+
+    def __init__(
+        self,
+        known_keys: Iterable[str],
+        names: Optional[Mapping[str, str]] = None,
+        min_score: float = 0.6,
+        cache_size: int = 4096,
+        tables: Optional[Mapping[str, Any]] = None,
+    ):
+        self.min_score = min_score
+        self.tables = tables if tables is not None else build_resolver_tables(known_keys, names)
+        self._cand_keys: Sequence[str] = self.tables["cand_keys"]
+        self._cand_sizes: Sequence[int] = self.tables["cand_sizes"]
+        self._gram_vocab: Sequence[str] = self.tables["gram_vocab"]
+        self._gram_offsets: Sequence[int] = self.tables["gram_offsets"]
+        self._gram_cands: Sequence[int] = self.tables["gram_cands"]
+        self.resolve = lru_cache(maxsize=cache_size)(self._resolve)
+
+    def __len__(self) -> int:
+        return len(self._cand_keys)
+
+    def _lookup(self, texts: str, keys: str, value: str) -> Optional[str]:
+        i = _find(self.tables[texts], value)
+        return self.tables[keys][i] if i >= 0 else None
+
+    def _resolve(self, name: str) -> str:
+        n = name.lower().strip()
+        key = self._lookup("exact_texts", "exact_keys", n)
+        if key is not None:
+            return key
+        toks = _tokens(n)
+        key = self._lookup("sig_texts", "sig_keys", _signature(toks))
+        if key is not None:
+            return key
+        # Catalog names first: the substring rules would fold any "... tile ..." SKU into "tile"
+        key = self._best_fuzzy(toks)
+        if key is not None:
+            return key
+        key = _rule_based_key(n)
+        if key is not None:
+            return key
+        return n.replace(" ", "_")
+
+    def _best_fuzzy(self, toks: List[str]) -> Optional[str]:
+        grams = _trigrams(toks)
+        if not grams:
+            return None
+        overlap: Counter = Counter()
+        for g in grams:
+            i = _find(self._gram_vocab, g)
+            if i >= 0:
+                overlap.update(self._gram_cands[self._gram_offsets[i]:self._gram_offsets[i + 1]])
+        best_idx = -1
+        best_score = 0.0
+        for idx, shared in overlap.items():
+            score = 2.0 * shared / (len(grams) + self._cand_sizes[idx])
+            # Ties go to the earlier (alias/key) entry
+            if score > best_score or (score == best_score and idx < best_idx):
+                best_idx, best_score = idx, score
+        if best_idx >= 0 and best_score >= self.min_score:
+            return self._cand_keys[best_idx]
+        return None
@@ -0,0 +1,382 @@
+"""Token/prefix inverted index over the materials database for typeahead search.
+
+The index is a set of flat tables (see build_search_tables): sorted keys and tokens,
+and per token the docs whose key or description holds it, in static rank order.
+Parsed price lists build them in memory; a compiled catalog (services.price_catalog)
+stores them, so workers read them in place from the shared mapping. Queries never
+scan the full catalog.
+"""
+import base64
+import heapq
+import json
+import re
+from array import array
+from bisect import bisect_left
+from typing import (
+    AbstractSet,
+    Any,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+)
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+# Prefixes shorter than this match a large share of the catalog; their postings are
+# precomputed (in static rank order) instead of merged per query.
+_SHORT_PREFIX = 3
+# Matches visited in rank order before ranking falls back to partitioning all of them
+_WALK_BUDGET = 2000
+# Sorts after every token character; bounds a prefix range of the vocabulary
+_PREFIX_END = "\U0010ffff"
+
+# Match strength per query token; lower ranks first
+_KEY_EXACT, _KEY_PREFIX, _DESC_EXACT, _DESC_PREFIX = 0, 1, 2, 3
+
+
+def _tokenize(text: str) -> List[str]:
+    return _TOKEN_RE.findall(text.lower())
+
+
+def encode_cursor(offset: int, version: int) -> str:
+    raw = json.dumps({"o": offset, "v": version}, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[int, Optional[int]]:
+    """Return (offset, index version) from an opaque cursor; bad cursors decode to (0, None)."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        return max(0, int(data.get("o", 0))), data.get("v")
+    except Exception:
+        return 0, None
+
+
+def _put_postings(tables: Dict[str, Any], name: str, lists: Iterable[Iterable[int]], rank: array) -> None:
+    """Store posting lists as CSR columns `<name>_offsets` / `<name>_docs`, each list in rank order."""
+    offsets = array("I", [0])
+    docs = array("I")
+    for d in lists:
+        docs.extend(sorted(d, key=rank.__getitem__))
+        offsets.append(len(docs))
+    tables[f"{name}_offsets"] = offsets
+    tables[f"{name}_docs"] = docs
+
+
+def build_search_tables(materials: Mapping[str, Dict[str, Any]]) -> Dict[str, Any]:
+    """Index tables for `materials`: lists of str and array("I") columns.
+
+    keys        sorted material keys; a doc id is a position in it
+    rank        static rank per doc: shorter keys first, then alphabetical
+    vocab       sorted tokens, with key_* and desc_* postings per token
+    short_vocab sorted prefixes under _SHORT_PREFIX chars, with short_* (any token)
+                and short_key_* (key tokens) postings per prefix
+    """
+    keys = sorted(materials)
+    key_postings: Dict[str, List[int]] = {}
+    desc_postings: Dict[str, List[int]] = {}
+    for idx, key in enumerate(keys):
+        for tok in set(_tokenize(key)):
+            key_postings.setdefault(tok, []).append(idx)
+        for tok in set(_tokenize(str(materials[key].get("description") or ""))):
+            desc_postings.setdefault(tok, []).append(idx)
+    rank = array("I", bytes(4 * len(keys)))
+    for pos, idx in enumerate(sorted(range(len(keys)), key=lambda i: (len(keys[i]), keys[i]))):
+        rank[idx] = pos
+    vocab = sorted(key_postings.keys() | desc_postings.keys())
+    short: Dict[str, Set[int]] = {}
+    short_keys: Dict[str, Set[int]] = {}
+    for tok in vocab:
+        for n in range(1, min(len(tok), _SHORT_PREFIX - 1) + 1):
+            short.setdefault(tok[:n], set()).update(key_postings.get(tok, ()), desc_postings.get(tok, ()))
+            short_keys.setdefault(tok[:n], set()).update(key_postings.get(tok, ()))
+    short_vocab = sorted(short)
+
+    tables: Dict[str, Any] = {"keys": keys, "rank": rank, "vocab": vocab, "short_vocab": short_vocab}
+    _put_postings(tables, "key", (key_postings.get(t, ()) for t in vocab), rank)
+    _put_postings(tables, "desc", (desc_postings.get(t, ()) for t in vocab), rank)
+    _put_postings(tables, "short", (short[p] for p in short_vocab), rank)
+    _put_postings(tables, "short_key", (short_keys.get(p, ()) for p in short_vocab), rank)
+    return tables
+
+
+def _find(values: Sequence[str], value: str) -> int:
+    """Position of value in a sorted sequence, or -1."""
+    i = bisect_left(values, value)
+    return i if i < len(values) and values[i] == value else -1
+
+
+def _merged(lists: List[Sequence[int]], rank: Sequence[int]) -> Iterator[int]:
+    """Docs of rank-ordered lists in rank order; a doc in several lists repeats adjacently."""
+    if len(lists) == 1:
+        return iter(lists[0])
+    return heapq.merge(*lists, key=rank.__getitem__)
+
+
+def _union(lists: Iterable[Iterable[int]]) -> AbstractSet[int]:
+    return frozenset().union(*lists)
+
+
+class _TokenDocs(NamedTuple):
+    """Rank-ordered posting lists for one query token."""
+
+    docs: List[Sequence[int]]  # union: docs with any token starting with it
+    key_prefix: List[Sequence[int]]  # union: docs with a key token starting with it
+    key_exact: Sequence[int]
+    desc_exact: Sequence[int]
+
+    def size(self) -> int:
+        return sum(len(d) for d in self.docs)
+
+
+class _Probe:
+    """Membership in a rank-ordered doc stream, probed in ascending rank."""
+
+    __slots__ = ("_docs", "_rank", "_head")
+
+    def __init__(self, docs: Iterator[int], rank: Sequence[int]):
+        self._docs = docs
+        self._rank = rank
+        self._head = next(docs, None)
+
+    def __call__(self, idx: int, idx_rank: int) -> bool:
+        while self._head is not None and self._rank[self._head] < idx_rank:
+            self._head = next(self._docs, None)
+        return self._head == idx
+
+
+class MaterialSearchIndex:
+    """Inverted index from key/description tokens to material keys.
+
+    `tables` are build_search_tables(materials), e.g. mapped from a compiled catalog;
+    they are built when not given. Records are only read for the returned page.
+    """
+
+    def __init__(
+        self,
+        materials: Mapping[str, Dict[str, Any]],
+        version: int = 0,
+        tables: Optional[Mapping[str, Any]] = None,
+    ):
+        self.version = version
+        self.tables = tables if tables is not None else build_search_tables(materials)
+        self._materials = materials
+        self._keys: Sequence[str] = self.tables["keys"]
+        self._rank: Sequence[int] = self.tables["rank"]
+        self._vocab: Sequence[str] = self.tables["vocab"]
+        self._short_vocab: Sequence[str] = self.tables["short_vocab"]
+        # Slices of a memoryview share its buffer, so postings are never copied
+        self._csr = {
+            name: (self.tables[f"{name}_offsets"], memoryview(self.tables[f"{name}_docs"]))
+            for name in ("key", "desc", "short", "short_key")
+        }
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def _postings(self, name: str, i: int) -> Sequence[int]:
+        offsets, docs = self._csr[name]
+        return docs[offsets[i]:offsets[i + 1]]
+
+    def _token_docs(self, qt: str) -> _TokenDocs:
+        exact = _find(self._vocab, qt)
+        key_exact = self._postings("key", exact) if exact >= 0 else ()
+        desc_exact = self._postings("desc", exact) if exact >= 0 else ()
+        if len(qt) < _SHORT_PREFIX:
+            i = _find(self._short_vocab, qt)
+            if i < 0:
+                return _TokenDocs([], [], (), ())
+            return _TokenDocs([self._postings("short", i)], [self._postings("short_key", i)], key_exact, desc_exact)
+        terms = range(bisect_left(self._vocab, qt), bisect_left(self._vocab, qt + _PREFIX_END))
+        key_prefix = [p for p in (self._postings("key", t) for t in terms) if len(p)]
+        desc_prefix = [p for p in (self._postings("desc", t) for t in terms) if len(p)]
+        return _TokenDocs(key_prefix + desc_prefix, key_prefix, key_exact, desc_exact)
+
+    def _walk_top(
+        self,
+        toks: List[_TokenDocs],
+        matched: Optional[AbstractSet[int]],
+        exact: Optional[int],
+        walk: _TokenDocs,
+        needed: int,
+    ) -> Optional[List[int]]:
+        """The first `needed` matches, found by visiting them in static rank order.
+
+        Matches are bucketed by strength (each bucket stays in rank order) until the
+        bucket of the best strength any match has is full. Strength is read by
+        advancing each token's rank-ordered postings along the walk. Returns None if
+        that takes more than a small multiple of `needed` steps; _by_strength handles
+        those. `matched` None means every doc of `walk` matches.
+        """
+        rank = self._rank
+
+        def has(lists: Iterable[Sequence[int]]) -> bool:
+            if matched is None:
+                return any(len(docs) for docs in lists)
+            return any(not matched.isdisjoint(docs) for docs in lists)
+
+        floor = 0
+        probes = []
+        for tok in toks:
+            if not has([tok.key_exact]):
+                if has(tok.key_prefix):
+                    floor += _KEY_PREFIX
+                elif has([tok.desc_exact]):
+                    floor += _DESC_EXACT
+                else:
+                    floor += _DESC_PREFIX
+            probes.append((
+                _Probe(iter(tok.key_exact), rank),
+                _Probe(_merged(tok.key_prefix, rank), rank),
+                _Probe(iter(tok.desc_exact), rank),
+            ))
+        budget = max(_WALK_BUDGET, 4 * needed)
+        buckets: Dict[int, List[int]] = {}
+        last = -1
+        for idx in _merged(walk.docs, rank):
+            budget -= 1
+            if budget < 0:
+                return None
+            if idx == last or idx == exact or (matched is not None and idx not in matched):
+                continue
+            last = idx
+            idx_rank = rank[idx]
+            strength = 0
+            for key_exact, key_prefix, desc_exact in probes:
+                # Probe every stream so each stays aligned with the walk
+                in_key_exact = key_exact(idx, idx_rank)
+                in_key_prefix = key_prefix(idx, idx_rank)
+                in_desc_exact = desc_exact(idx, idx_rank)
+                if in_key_exact:
+                    continue
+                if in_key_prefix:
+                    strength += _KEY_PREFIX
+                elif in_desc_exact:
+                    strength += _DESC_EXACT
+                else:
+                    strength += _DESC_PREFIX
+            bucket = buckets.setdefault(strength, [])
+            if len(bucket) < needed:
+                bucket.append(idx)
+            if strength == floor and len(bucket) >= needed:
+                break
+        top = [] if exact is None else [exact]
+        for strength in sorted(buckets):
+            top.extend(buckets[strength])
+        return top[:needed]
+
+    def _by_strength(self, matched: AbstractSet[int], toks: List[_TokenDocs]) -> Dict[int, AbstractSet[int]]:
+        """Partition matched docs by match strength, summed over the query tokens."""
+        parts: Dict[int, AbstractSet[int]] = {0: matched}
+        for tok in toks:
+            key_exact = frozenset(tok.key_exact)
+            key_prefix = _union(tok.key_prefix)
+            desc_exact = frozenset(tok.desc_exact)
+            split: Dict[int, Set[int]] = {}
+            for strength, part in parts.items():
+                in_key = part & key_prefix
+                in_desc = (part & desc_exact) - in_key
+                by_class = (
+                    (_KEY_EXACT, in_key & key_exact),
+                    (_KEY_PREFIX, in_key - key_exact),
+                    (_DESC_EXACT, in_desc),
+                    (_DESC_PREFIX, part - in_key - in_desc),
+                )
+                for cls, docs in by_class:
+                    if docs:
+                        split.setdefault(strength + cls, set()).update(docs)
+            parts = split
+        return parts
+
+    def _top(
+        self, parts: Dict[int, AbstractSet[int]], total: int, exact: Optional[int], walk: _TokenDocs, needed: int
+    ) -> List[int]:
+        """The first `needed` matches: the exact slug, then by strength, then static rank."""
+        top = [] if exact is None else [exact]
+        rank = self._rank.__getitem__
+        for strength in sorted(parts):
+            if len(top) >= needed:
+                break
+            part = parts[strength]
+            want = needed - len(top)
+            if len(part) * 8 < total:
+                top.extend(i for i in heapq.nsmallest(want + 1, part, key=rank) if i != exact)
+            else:
+                # A large share of the matches: walk them in rank order until enough are found
+                last = -1
+                taken = 0
+                for idx in _merged(walk.docs, self._rank):
+                    if idx == last or idx == exact or idx not in part:
+                        continue
+                    last = idx
+                    top.append(idx)
+                    taken += 1
+                    if taken >= want:
+                        break
+        return top[:needed]
+
+    def _result(self, idx: int) -> Dict[str, Any]:
+        key = self._keys[idx]
+        rec = self._materials[key]
+        return {
+            "name": key,
+            "price": rec["price"],
+            "unit": rec["unit"],
+            "description": rec.get("description"),
+        }
+
+    def search(self, query: str, limit: int = 10, offset: int = 0) -> Dict[str, Any]:
+        """Return one ranked page: every query token must prefix-match a key or description token."""
+        limit = max(0, int(limit))
+        offset = max(0, int(offset))
+        q_tokens = list(dict.fromkeys(_tokenize(query)))
+
+        if not q_tokens:
+            total = len(self._keys)
+            page = list(range(offset, min(total, offset + limit)))
+        else:
+            toks = [self._token_docs(qt) for qt in q_tokens]
+            walk = min(toks, key=_TokenDocs.size)
+            matched: Optional[AbstractSet[int]] = None
+            if len(toks) == 1 and len(walk.docs) == 1:
+                # One posting list holds exactly the matches; no doc set is needed
+                total = len(walk.docs[0])
+            else:
+                # Intersect smallest doc sets first; stop as soon as nothing is left
+                matched = _union(walk.docs)
+                for tok in sorted(toks, key=_TokenDocs.size):
+                    if not matched:
+                        break
+                    if tok is not walk:
+                        # Probe the postings against the smaller set instead of building theirs
+                        matched = _union(matched.intersection(docs) for docs in tok.docs)
+                total = len(matched)
+            page = []
+            if total and limit:
+                exact: Optional[int] = _find(self._keys, "_".join(q_tokens))
+                # A key equal to a single query token always matches it
+                if exact < 0 or (matched is not None and exact not in matched):
+                    exact = None
+                # Only the first offset+limit results are ordered
+                needed = offset + limit
+                top = self._walk_top(toks, matched, exact, walk, needed)
+                if top is None:
+                    if matched is None:
+                        matched = _union(walk.docs)
+                    top = self._top(self._by_strength(matched, toks), total, exact, walk, needed)
+                page = top[offset:]
+
+        next_offset = offset + len(page)
+        return {
+            "results": [self._result(i) for i in page],
+            "total": total,
+            "next_cursor": encode_cursor(next_offset, self.version) if next_offset < total else None,
+        }
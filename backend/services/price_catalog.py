@@ -0,0 +1,456 @@
+"""Compiled binary price catalog that uvicorn workers can mmap read-only.
+
+Layout (little-endian):
+    b"EGPCAT01" | u32 header length | JSON header | padding to 8 | sections
+
+The JSON header holds metadata (sources, regions, counts) and the byte offset of
+every section. Sections are plain arrays read in place through memoryview:
+
+    strings   u32 offsets[n+1] + utf-8 blob (interned units, descriptions, names)
+    flat      materials table
+    regional  table keyed by "key<US>region"
+    names     u32 name string ids + u32 flat row ids (display name -> key)
+    indexes   the search index and name resolver tables, one section per column:
+              string lists as u32 offsets[n+1] + utf-8 blob, integer columns as u32[n]
+
+Each table stores u32 key offsets[n+1] + key blob (sorted by utf-8 bytes),
+f64 prices[n], u32 unit ids[n], u32 description ids[n] and u8 external flags[n].
+All workers mapping the same file share a single page-cache copy, indexes included,
+so warming a mapped snapshot does not copy the catalog into each worker.
+
+Usage:
+    python -m services.price_catalog --out pricing/price_catalog.bin
+"""
+import argparse
+import json
+import mmap
+import os
+import struct
+import time
+from array import array
+from collections.abc import Mapping, Sequence, Set
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+MAGIC = b"EGPCAT01"
+FORMAT_VERSION = 2
+_REGION_SEP = "\x1f"
+
+
+class _StringInterner:
+    def __init__(self) -> None:
+        self.ids: Dict[str, int] = {}
+        self.values: List[str] = []
+
+    def add(self, value: Optional[str]) -> int:
+        value = value or ""
+        idx = self.ids.get(value)
+        if idx is None:
+            idx = len(self.values)
+            self.ids[value] = idx
+            self.values.append(value)
+        return idx
+
+
+def _pack_strings(values: List[bytes]) -> Tuple[bytes, bytes]:
+    offsets = array("I", [0])
+    for v in values:
+        offsets.append(offsets[-1] + len(v))
+    return offsets.tobytes(), b"".join(values)
+
+
+def _pad(buf: bytearray) -> None:
+    buf.extend(b"\0" * (-len(buf) % 8))
+
+
+def _append(buf: bytearray, sections: Dict[str, int], name: str, data: bytes) -> None:
+    _pad(buf)
+    sections[name] = len(buf)
+    buf.extend(data)
+
+
+def _write_table(
+    buf: bytearray,
+    sections: Dict[str, int],
+    prefix: str,
+    rows: Dict[str, Dict[str, Any]],
+    external: Set,
+    strings: _StringInterner,
+) -> List[str]:
+    keys = sorted(rows, key=lambda k: k.encode("utf-8"))
+    key_offsets, key_blob = _pack_strings([k.encode("utf-8") for k in keys])
+    prices = array("d", (float(rows[k]["price"]) for k in keys))
+    units = array("I", (strings.add(rows[k].get("unit")) for k in keys))
+    descs = array("I", (strings.add(rows[k].get("description")) for k in keys))
+    flags = bytes(1 if k in external else 0 for k in keys)
+    _append(buf, sections, f"{prefix}_key_offsets", key_offsets)
+    _append(buf, sections, f"{prefix}_keys", key_blob)
+    _append(buf, sections, f"{prefix}_prices", prices.tobytes())
+    _append(buf, sections, f"{prefix}_units", units.tobytes())
+    _append(buf, sections, f"{prefix}_descs", descs.tobytes())
+    _append(buf, sections, f"{prefix}_flags", flags)
+    return keys
+
+
+def _write_index(buf: bytearray, sections: Dict[str, int], group: str, tables: Dict[str, Any]) -> Dict[str, Any]:
+    """Write index columns as sections `<group>.<column>`; returns their header entries."""
+    columns: Dict[str, Any] = {}
+    for name, values in tables.items():
+        section = f"{group}.{name}"
+        if isinstance(values, (array, memoryview)):
+            _append(buf, sections, section, array("I", values).tobytes())
+            columns[name] = {"type": "u32", "count": len(values)}
+        else:
+            offsets, blob = _pack_strings([v.encode("utf-8") for v in values])
+            _append(buf, sections, f"{section}.offsets", offsets)
+            _append(buf, sections, section, blob)
+            columns[name] = {"type": "str", "count": len(values)}
+    return columns
+
+
+def compile_price_catalog(snapshot, out_path: Path, sources: List[Dict[str, Any]]) -> Path:
+    """Write `snapshot` to out_path atomically.
+
+    `sources` records the price files (path, mtime, size, digest) the snapshot was
+    built from, so loaders can tell whether the catalog is stale.
+    """
+    out_path = Path(out_path)
+    strings = _StringInterner()
+    body = bytearray()
+    sections: Dict[str, int] = {}
+
+    flat_rows = {k: snapshot.materials[k] for k in snapshot.materials}
+    flat_keys = _write_table(body, sections, "flat", flat_rows, snapshot.external_keys, strings)
+    regional_rows = {f"{k}{_REGION_SEP}{r}": rec for (k, r), rec in snapshot.regional.items()}
+    _write_table(body, sections, "regional", regional_rows, set(regional_rows), strings)
+
+    row_of = {k: i for i, k in enumerate(flat_keys)}
+    name_pairs = [(strings.add(n), row_of[k]) for n, k in snapshot.names.items() if k in row_of]
+    _append(body, sections, "name_ids", array("I", (n for n, _ in name_pairs)).tobytes())
+    _append(body, sections, "name_rows", array("I", (r for _, r in name_pairs)).tobytes())
+
+    # Search doc ids are positions in the sorted flat keys, which the loader maps in place
+    search_tables = {k: v for k, v in snapshot.search_index.tables.items() if k != "keys"}
+    indexes = {
+        "search": _write_index(body, sections, "search", search_tables),
+        "resolver": _write_index(body, sections, "resolver", dict(snapshot.resolver.tables)),
+    }
+
+    str_offsets, str_blob = _pack_strings([v.encode("utf-8") for v in strings.values])
+    _append(body, sections, "str_offsets", str_offsets)
+    _append(body, sections, "strings", str_blob)
+
+    header = json.dumps(
+        {
+            "format": FORMAT_VERSION,
+            "snapshot_version": snapshot.version,
+            "compiled_at": time.time(),
+            "sources": sources,
+            "regions": sorted(snapshot.regions),
+            "counts": {
+                "flat": len(flat_keys),
+                "regional": len(regional_rows),
+                "names": len(name_pairs),
+                "strings": len(strings.values),
+            },
+            "sections": sections,
+            "indexes": indexes,
+        },
+        separators=(",", ":"),
+    ).encode("utf-8")
+    prefix = bytearray(MAGIC + struct.pack("<I", len(header)) + header)
+    _pad(prefix)
+
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = out_path.with_name(f".{out_path.name}.{os.getpid()}.tmp")
+    with open(tmp, "wb") as f:
+        f.write(prefix)
+        f.write(body)
+    # Workers that already mapped the old file keep their (unlinked) copy
+    os.replace(tmp, out_path)
+    return out_path
+
+
+class _StringList(Sequence):
+    """List of strings packed as u32 offsets[n+1] + utf-8 blob; decoded per access."""
+
+    def __init__(self, offsets: memoryview, blob: memoryview, count: int):
+        self._offsets = offsets
+        self._blob = blob
+        self._n = count
+
+    def __len__(self) -> int:
+        return self._n
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(self._n))]
+        if i < 0:
+            i += self._n
+        if not 0 <= i < self._n:
+            raise IndexError(i)
+        return bytes(self._blob[self._offsets[i]:self._offsets[i + 1]]).decode("utf-8")
+
+
+class _Table:
+    """Sorted key table over the mapped buffer; lookups are a bisect on raw bytes."""
+
+    def __init__(self, catalog: "MappedPriceCatalog", prefix: str, count: int):
+        self._cat = catalog
+        self._n = count
+        self._key_offsets = catalog._section(f"{prefix}_key_offsets", count + 1, "I")
+        self._keys = catalog._raw_section(f"{prefix}_keys", self._key_offsets[count] if count else 0)
+        self._prices = catalog._section(f"{prefix}_prices", count, "d")
+        self._units = catalog._section(f"{prefix}_units", count, "I")
+        self._descs = catalog._section(f"{prefix}_descs", count, "I")
+        self._flags = catalog._raw_section(f"{prefix}_flags", count)
+
+    def __len__(self) -> int:
+        return self._n
+
+    def key_bytes(self, i: int) -> bytes:
+        return bytes(self._keys[self._key_offsets[i]:self._key_offsets[i + 1]])
+
+    def keys(self) -> _StringList:
+        return _StringList(self._key_offsets, self._keys, self._n)
+
+    def lower_bound(self, target: bytes) -> int:
+        lo, hi = 0, self._n
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.key_bytes(mid) < target:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def find(self, key: str) -> int:
+        target = key.encode("utf-8")
+        lo = self.lower_bound(target)
+        if lo < self._n and self.key_bytes(lo) == target:
+            return lo
+        return -1
+
+    def price(self, i: int) -> float:
+        return self._prices[i]
+
+    def record(self, i: int) -> Dict[str, Any]:
+        return {
+            "price": self._prices[i],
+            "unit": self._cat.string(self._units[i]) or "unit",
+            "description": self._cat.string(self._descs[i]),
+        }
+
+    def is_external(self, i: int) -> bool:
+        return bool(self._flags[i])
+
+
+class _FlatView(Mapping):
+    def __init__(self, table: _Table):
+        self._t = table
+
+    def __getitem__(self, key: str) -> Dict[str, Any]:
+        i = self._t.find(key) if isinstance(key, str) else -1
+        if i < 0:
+            raise KeyError(key)
+        return self._t.record(i)
+
+    def __iter__(self) -> Iterator[str]:
+        for i in range(len(self._t)):
+            yield self._t.key_bytes(i).decode("utf-8")
+
+    def __len__(self) -> int:
+        return len(self._t)
+
+
+class _RegionalView(Mapping):
+    def __init__(self, table: _Table):
+        self._t = table
+
+    def __getitem__(self, key: Tuple[str, str]) -> Dict[str, Any]:
+        i = self._t.find(f"{key[0]}{_REGION_SEP}{key[1]}") if isinstance(key, tuple) else -1
+        if i < 0:
+            raise KeyError(key)
+        return self._t.record(i)
+
+    def __iter__(self) -> Iterator[Tuple[str, str]]:
+        for i in range(len(self._t)):
+            k, _, r = self._t.key_bytes(i).decode("utf-8").partition(_REGION_SEP)
+            yield (k, r)
+
+    def __len__(self) -> int:
+        return len(self._t)
+
+
+class _RegionalPrices(Mapping):
+    """Key -> every regional price, read from the regional table's "key<US>region" range."""
+
+    def __init__(self, table: _Table):
+        self._t = table
+        self._count: Optional[int] = None
+
+    def __getitem__(self, key: str) -> Tuple[float, ...]:
+        if not isinstance(key, str):
+            raise KeyError(key)
+        prefix = f"{key}{_REGION_SEP}".encode("utf-8")
+        lo = self._t.lower_bound(prefix)
+        # The separator sorts below every key character, so the range ends at prefix+1
+        hi = self._t.lower_bound(prefix[:-1] + bytes([prefix[-1] + 1]))
+        if lo == hi:
+            raise KeyError(key)
+        return tuple(self._t.price(i) for i in range(lo, hi))
+
+    def __iter__(self) -> Iterator[str]:
+        last = None
+        for i in range(len(self._t)):
+            k = self._t.key_bytes(i).decode("utf-8").partition(_REGION_SEP)[0]
+            if k != last:
+                yield k
+                last = k
+
+    def __len__(self) -> int:
+        if self._count is None:
+            self._count = sum(1 for _ in self)
+        return self._count
+
+
+class _ExternalKeys(Set):
+    def __init__(self, table: _Table):
+        self._t = table
+        self._count: Optional[int] = None
+
+    def __contains__(self, key: object) -> bool:
+        i = self._t.find(key) if isinstance(key, str) else -1
+        return i >= 0 and self._t.is_external(i)
+
+    def __iter__(self) -> Iterator[str]:
+        for i in range(len(self._t)):
+            if self._t.is_external(i):
+                yield self._t.key_bytes(i).decode("utf-8")
+
+    def __len__(self) -> int:
+        if self._count is None:
+            self._count = sum(1 for i in range(len(self._t)) if self._t.is_external(i))
+        return self._count
+
+
+class _NamesView(Mapping):
+    def __init__(self, catalog: "MappedPriceCatalog", flat: _Table, count: int):
+        self._cat = catalog
+        self._flat = flat
+        self._ids = catalog._section("name_ids", count, "I")
+        self._rows = catalog._section("name_rows", count, "I")
+        self._index: Optional[Dict[str, int]] = None
+
+    def _lookup(self) -> Dict[str, int]:
+        if self._index is None:
+            self._index = {self._cat.string(n): i for i, n in enumerate(self._ids)}
+        return self._index
+
+    def __getitem__(self, name: str) -> str:
+        i = self._lookup()[name]
+        return self._flat.key_bytes(self._rows[i]).decode("utf-8")
+
+    def __iter__(self) -> Iterator[str]:
+        for n in self._ids:
+            yield self._cat.string(n)
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+
+class MappedPriceCatalog:
+    """Read-only, zero-copy view of a compiled catalog file."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        with open(self.path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._buf = memoryview(self._mm)
+        if bytes(self._buf[:8]) != MAGIC:
+            raise ValueError(f"{self.path} is not a compiled price catalog")
+        (header_len,) = struct.unpack_from("<I", self._mm, 8)
+        self.header: Dict[str, Any] = json.loads(bytes(self._buf[12:12 + header_len]))
+        if self.header.get("format") != FORMAT_VERSION:
+            raise ValueError(f"Unsupported price catalog format: {self.header.get('format')}")
+        self._body = 12 + header_len + (-(12 + header_len) % 8)
+        counts = self.header["counts"]
+        self._str_offsets = self._section("str_offsets", counts["strings"] + 1, "I")
+        self._strings = self._raw_section("strings", self._str_offsets[counts["strings"]])
+        self._string_cache: Dict[int, str] = {}
+        flat = _Table(self, "flat", counts["flat"])
+        regional = _Table(self, "regional", counts["regional"])
+        self.materials = _FlatView(flat)
+        self.regional = _RegionalView(regional)
+        self.external_keys = _ExternalKeys(flat)
+        self.names = _NamesView(self, flat, counts["names"])
+        self.regions = frozenset(self.header.get("regions") or [])
+        # Prebuilt tables for PriceSnapshot(indexes=...), all read through the mapping
+        self.indexes: Dict[str, Any] = {
+            group: self._index(group, columns) for group, columns in self.header["indexes"].items()
+        }
+        self.indexes["search"]["keys"] = flat.keys()
+        self.indexes["regional_prices"] = _RegionalPrices(regional)
+
+    def _index(self, group: str, columns: Dict[str, Any]) -> Dict[str, Any]:
+        tables: Dict[str, Any] = {}
+        for name, col in columns.items():
+            section, count = f"{group}.{name}", col["count"]
+            if col["type"] == "u32":
+                tables[name] = self._section(section, count, "I")
+            else:
+                offsets = self._section(f"{section}.offsets", count + 1, "I")
+                tables[name] = _StringList(offsets, self._raw_section(section, offsets[count]), count)
+        return tables
+
+    def _raw_section(self, name: str, nbytes: int) -> memoryview:
+        start = self._body + self.header["sections"][name]
+        return self._buf[start:start + nbytes]
+
+    def _section(self, name: str, count: int, fmt: str) -> memoryview:
+        return self._raw_section(name, count * struct.calcsize(fmt)).cast(fmt)
+
+    def string(self, idx: int) -> str:
+        # Units and categories repeat heavily, so decode each interned string once
+        s = self._string_cache.get(idx)
+        if s is None:
+            s = bytes(self._strings[self._str_offsets[idx]:self._str_offsets[idx + 1]]).decode("utf-8")
+            self._string_cache[idx] = s
+        return s
+
+    @property
+    def sources(self) -> List[Dict[str, Any]]:
+        return list(self.header.get("sources") or [])
+
+    def matches_sources(self, paths: List[Path]) -> bool:
+        """True if the catalog was compiled from exactly these files, unchanged since."""
+        sources = self.sources
+        if [s.get("path") for s in sources] != [str(p) for p in paths if p.exists()]:
+            return False
+        for src in sources:
+            try:
+                st = os.stat(src["path"])
+            except OSError:
+                return False
+            if st.st_mtime != src.get("mtime") or st.st_size != src.get("size"):
+                return False
+        return True
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compile price lists into a binary catalog")
+    parser.add_argument("--out", default=os.getenv("PRICE_CATALOG_FILE", "pricing/price_catalog.bin"))
+    args = parser.parse_args()
+
+    # Compile from the configured price lists only, never from an existing catalog
+    os.environ["PRICE_CATALOG_FILE"] = ""
+    from services.estimation_service import EstimationService
+
+    service = EstimationService()
+    path = compile_price_catalog(service._snapshot, Path(args.out), service._price_list_sources())
+    counts = MappedPriceCatalog(path).header["counts"]
+    print(f"Compiled price catalog {path}: {counts['flat']} materials, {counts['regional']} regional rows")
+
+
+if __name__ == "__main__":
+    main()
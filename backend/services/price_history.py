@@ -0,0 +1,208 @@
+"""Append-only price history with per-key timelines for as-of pricing.
+
+Every price observed in a loaded price list is appended (once per change) to a
+JSON Lines file, dated by the row's `Updated` column or else the day it was
+loaded. In memory each (key, region) pair keeps a timeline of compact parallel
+arrays (date ordinals, prices, units) sorted by effective date, so the price in
+force on any date is one bisect away.
+"""
+import json
+import threading
+import time
+from array import array
+from bisect import bisect_right
+from dataclasses import replace
+from datetime import date, datetime
+from pathlib import Path
+from types import MappingProxyType
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from services.price_lists import ParsedPriceFile, PriceSnapshot
+
+# (key, region); region "" is the flat (all-region) price
+TimelineKey = Tuple[str, str]
+
+
+def parse_as_of(value: Any) -> Optional[str]:
+    """Normalize an as-of value to an ISO date string; raises ValueError if invalid."""
+    if value is None or (isinstance(value, str) and not value.strip()):
+        return None
+    if isinstance(value, (date, datetime)):
+        return value.strftime("%Y-%m-%d")
+    return datetime.fromisoformat(str(value).strip()[:10]).strftime("%Y-%m-%d")
+
+
+class _Timeline:
+    __slots__ = ("days", "prices", "units")
+
+    def __init__(self) -> None:
+        self.days = array("i")
+        self.prices = array("d")
+        self.units: List[Optional[str]] = []
+
+    def index_at(self, day: int) -> int:
+        """Index of the entry in force on `day`, or -1 if the timeline starts later."""
+        return bisect_right(self.days, day) - 1
+
+    def set(self, day: int, price: float, unit: Optional[str]) -> None:
+        i = self.index_at(day)
+        if i >= 0 and self.days[i] == day:
+            self.prices[i] = price
+            self.units[i] = unit
+            return
+        # Usually appends; older effective dates are inserted in place
+        self.days.insert(i + 1, day)
+        self.prices.insert(i + 1, price)
+        self.units.insert(i + 1, unit)
+
+    def __len__(self) -> int:
+        return len(self.days)
+
+
+class PriceHistory:
+    """Per-(key, region) price timelines, optionally persisted to an append-only file."""
+
+    def __init__(self, path: Optional[Path] = None):
+        self.path = path
+        self.version = 0
+        self._timelines: Dict[TimelineKey, _Timeline] = {}
+        self._lock = threading.Lock()
+        if path is not None and path.exists():
+            self._load()
+
+    def __len__(self) -> int:
+        return sum(len(t) for t in self._timelines.values())
+
+    def _load(self) -> None:
+        loaded = bad = 0
+        with self.path.open("r", encoding="utf-8") as fh:
+            for line in fh:
+                try:
+                    rec = json.loads(line)
+                    day = date.fromisoformat(rec["effective"]).toordinal()
+                    self._timeline((rec["key"], rec.get("region") or "")).set(day, float(rec["price"]), rec.get("unit"))
+                    loaded += 1
+                except (ValueError, KeyError, TypeError):
+                    bad += 1
+        self.version += 1
+        print(f"Price history loaded from {self.path}: {loaded} entries ({bad} unreadable lines)")
+
+    def _timeline(self, tkey: TimelineKey) -> _Timeline:
+        timeline = self._timelines.get(tkey)
+        if timeline is None:
+            timeline = self._timelines[tkey] = _Timeline()
+        return timeline
+
+    def record(self, observations: Iterable[Tuple[str, str, float, Optional[str], str, str]]) -> int:
+        """Append (key, region, price, unit, effective ISO date, source) rows that change a timeline.
+
+        A row matching the price already in force on its date is skipped, so reloading
+        the same lists (or restarting) does not grow the history. Returns rows appended.
+        """
+        appended: List[Dict[str, Any]] = []
+        with self._lock:
+            now = time.time()
+            for key, region, price, unit, effective, source in observations:
+                day = date.fromisoformat(effective).toordinal()
+                timeline = self._timeline((key, region))
+                i = timeline.index_at(day)
+                if i >= 0 and timeline.prices[i] == price and timeline.units[i] == unit:
+                    continue
+                timeline.set(day, price, unit)
+                appended.append({
+                    "key": key, "region": region, "price": price, "unit": unit,
+                    "effective": effective, "recorded_at": now, "source": source,
+                })
+            if appended:
+                self.version += 1
+                if self.path is not None:
+                    self.path.parent.mkdir(parents=True, exist_ok=True)
+                    with self.path.open("a", encoding="utf-8") as fh:
+                        fh.writelines(json.dumps(rec, separators=(",", ":")) + "\n" for rec in appended)
+        return len(appended)
+
+    def record_price_files(self, parsed_files: Iterable[ParsedPriceFile], loaded_on: Optional[str] = None) -> int:
+        """Record every entry of freshly parsed price files, in merge order."""
+        today = loaded_on or date.today().isoformat()
+
+        def observations():
+            for pf in parsed_files:
+                for key, rec in pf.entries.items():
+                    yield key, "", rec["price"], rec["unit"], _effective(rec, today), str(pf.path)
+                for (key, region), rec in pf.regional.items():
+                    yield key, region, rec["price"], rec["unit"], _effective(rec, today), str(pf.path)
+
+        return self.record(observations())
+
+    def price_at(self, key: str, region: str, as_of: str) -> Optional[Dict[str, Any]]:
+        """Price in force for (key, region) on the as-of date, or None without history."""
+        timeline = self._timelines.get((key, region))
+        if timeline is None:
+            return None
+        i = timeline.index_at(date.fromisoformat(as_of).toordinal())
+        if i < 0:
+            return None
+        return {
+            "price": timeline.prices[i],
+            "unit": timeline.units[i],
+            "effective_date": date.fromordinal(timeline.days[i]).isoformat(),
+        }
+
+    def timeline(self, key: str, region: str = "") -> List[Dict[str, Any]]:
+        timeline = self._timelines.get((key, region))
+        if timeline is None:
+            return []
+        return [
+            {"effective_date": date.fromordinal(d).isoformat(), "price": p, "unit": u}
+            for d, p, u in zip(timeline.days, timeline.prices, timeline.units, strict=True)
+        ]
+
+    def snapshot_as_of(self, base: PriceSnapshot, as_of: str) -> PriceSnapshot:
+        """Copy of `base` with every key that has history priced as it was on `as_of`.
+
+        Keys without history on that date keep their current price. Only keys present
+        in `base` are repriced, so its resolver and search index are reused.
+        """
+        day = date.fromisoformat(as_of).toordinal()
+        materials: Dict[str, Dict[str, Any]] = dict(base.materials)
+        regional: Dict[Tuple[str, str], Dict[str, Any]] = dict(base.regional)
+        with self._lock:
+            for (key, region), timeline in self._timelines.items():
+                if key not in materials:
+                    continue
+                i = timeline.index_at(day)
+                if i < 0:
+                    continue
+                if region:
+                    prev = regional.get((key, region)) or materials[key]
+                    regional[(key, region)] = _historic(prev, timeline, i)
+                else:
+                    materials[key] = _historic(materials[key], timeline, i)
+        snap = replace(
+            base,
+            materials=MappingProxyType(materials),
+            regional=MappingProxyType(regional),
+            regions=frozenset(region for _, region in regional),
+            as_of=as_of,
+            # Regional prices differ from base; the key and name tables are shared below
+            indexes=None,
+        )
+        # Same keys and names as base, so share its lazily built indexes
+        snap.__dict__["resolver"] = base.resolver
+        snap.__dict__["search_index"] = base.search_index
+        return snap
+
+
+def _effective(rec: Dict[str, Any], default: str) -> str:
+    try:
+        return parse_as_of(rec.get("updated")) or default
+    except ValueError:
+        return default
+
+
+def _historic(prev: Dict[str, Any], timeline: _Timeline, i: int) -> Dict[str, Any]:
+    return {
+        "price": timeline.prices[i],
+        "unit": timeline.units[i] or prev.get("unit") or "unit",
+        "description": prev.get("description"),
+    }
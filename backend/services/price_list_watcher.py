@@ -0,0 +1,137 @@
+"""Background watcher that reloads price lists and labor rates off the request path.
+
+Uses filesystem notifications (inotify via `watchfiles`) when available and falls
+back to polling file stats every PRICE_LIST_RELOAD_SEC. Bursts of changes are
+debounced into one reload, and the reload itself runs in a worker thread.
+"""
+import asyncio
+import os
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set
+
+try:
+    from watchfiles import awatch
+except ImportError:  # watchfiles is optional; polling works everywhere
+    awatch = None
+
+
+class PriceListWatcher:
+    """Watches the EstimationService price list and labor rate files and reloads them on change."""
+
+    def __init__(
+        self,
+        estimation_service,
+        debounce_sec: Optional[float] = None,
+        poll_interval_sec: Optional[float] = None,
+        use_notify: Optional[bool] = None,
+    ):
+        self.service = estimation_service
+        self.debounce_sec = debounce_sec if debounce_sec is not None else float(os.getenv("PRICE_LIST_DEBOUNCE_SEC", "0.5"))
+        self.poll_interval_sec = (
+            poll_interval_sec if poll_interval_sec is not None else estimation_service._price_list_reload_interval
+        )
+        if use_notify is None:
+            use_notify = os.getenv("PRICE_LIST_WATCH_MODE", "auto").lower() != "poll"
+        self.mode = "notify" if (use_notify and awatch is not None) else "poll"
+
+        self._task: Optional[asyncio.Task] = None
+        self._stop_event: Optional[asyncio.Event] = None
+        self.reload_count = 0
+        self.failure_count = 0
+        self.last_reload_at: Optional[float] = None
+        self.last_reload_ms: Optional[float] = None
+        self.last_reparsed: List[str] = []
+        self.last_error: Optional[str] = None
+
+    def is_running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self) -> None:
+        """Start watching; request-time reload checks are disabled while running."""
+        if self.is_running():
+            return
+        self._stop_event = asyncio.Event()
+        self.service._background_reload = True
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._stop_event.set()
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        self.service._background_reload = False
+
+    async def _run(self) -> None:
+        if self.mode == "notify":
+            try:
+                await self._watch_notify()
+                return
+            except Exception as e:
+                # e.g. inotify watch limit reached; keep reloading by polling
+                self.last_error = f"notify watcher failed, polling instead: {e}"
+                self.mode = "poll"
+        await self._watch_poll()
+
+    async def _watch_notify(self) -> None:
+        paths = self.service._watched_paths()
+        if not paths:
+            return await self._watch_poll()
+        watched: Set[str] = {str(p) for p in paths}
+        # Watch the directories so atomic replace-by-rename is seen as well
+        dirs = sorted({str(p.parent) for p in paths if p.parent.exists()})
+        async for changes in awatch(
+            *dirs,
+            debounce=int(self.debounce_sec * 1000),
+            stop_event=self._stop_event,
+            recursive=False,
+        ):
+            if any(str(Path(changed)) in watched for _, changed in changes):
+                await self.reload()
+
+    async def _watch_poll(self) -> None:
+        while not self._stop_event.is_set():
+            await asyncio.sleep(self.poll_interval_sec)
+            changed = await asyncio.to_thread(self.service._watched_files_changed)
+            if not changed:
+                continue
+            # Let writers finish before parsing
+            await asyncio.sleep(self.debounce_sec)
+            await self.reload()
+
+    async def reload(self) -> None:
+        """Reload the watched files in a worker thread and record the outcome."""
+        started = time.perf_counter()
+        try:
+            self.last_reparsed = await asyncio.to_thread(self.service._reload_watched_files)
+            self.last_error = None
+            errors = self.service._watched_file_errors()
+            if errors:
+                self.failure_count += 1
+                self.last_error = "; ".join(f"{path}: {err}" for path, err in errors.items())
+        except Exception as e:
+            self.failure_count += 1
+            self.last_error = str(e)
+        finally:
+            self.reload_count += 1
+            self.last_reload_at = time.time()
+            self.last_reload_ms = round((time.perf_counter() - started) * 1000, 2)
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "running": self.is_running(),
+            "mode": self.mode,
+            "debounce_sec": self.debounce_sec,
+            "poll_interval_sec": self.poll_interval_sec,
+            "reload_count": self.reload_count,
+            "failure_count": self.failure_count,
+            "last_reload_at": self.last_reload_at,
+            "last_reload_ms": self.last_reload_ms,
+            "last_reparsed_files": self.last_reparsed,
+            "last_error": self.last_error,
+        }
@@ -0,0 +1,454 @@
+"""External price list parsing and immutable price snapshots.
+
+Each configured file is streamed into a ParsedPriceFile, and only reparsed when its
+mtime/size and content hash change. The parsed files are merged over the
+built-in materials into a PriceSnapshot that EstimationService swaps in as a whole,
+so requests always price against one consistent catalog version.
+"""
+import csv
+import hashlib
+import json
+import os
+import sys
+import time
+from dataclasses import dataclass, field
+from functools import cached_property, lru_cache
+from pathlib import Path
+from types import MappingProxyType
+from typing import (
+    AbstractSet,
+    Any,
+    Callable,
+    Dict,
+    FrozenSet,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Tuple,
+)
+
+from services.material_resolver import MaterialNameResolver, canonical_material_key
+from services.material_search import MaterialSearchIndex
+from services.regions import normalize_region
+
+# key -> {"price": float, "unit": str|None, "description": str|None, "label": str, "updated": str|None}
+RawEntries = Dict[str, Dict[str, Any]]
+
+
+@dataclass
+class ParsedPriceFile:
+    """Entries parsed from one price list file plus the file state they came from."""
+
+    path: Path
+    mtime: float
+    size: int
+    digest: str
+    entries: RawEntries = field(default_factory=dict)
+    regional: Dict[Tuple[str, str], Dict[str, Any]] = field(default_factory=dict)
+    names: Dict[str, str] = field(default_factory=dict)
+    rows_read: int = 0
+    rows_loaded: int = 0
+    rows_skipped: int = 0
+    row_errors: int = 0
+    parse_ms: float = 0.0
+
+    def is_current(self, stat_result) -> bool:
+        return stat_result.st_mtime == self.mtime and stat_result.st_size == self.size
+
+    def ingest_stats(self) -> Dict[str, Any]:
+        return {
+            "rows_read": self.rows_read,
+            "rows_loaded": self.rows_loaded,
+            "rows_skipped": self.rows_skipped,
+            "row_errors": self.row_errors,
+            "parse_ms": self.parse_ms,
+        }
+
+
+@dataclass(frozen=True)
+class PriceSnapshot:
+    """Read-only merged view of built-in and external prices at one version.
+
+    The name resolver, search index and regional price spread are derived lazily,
+    so a snapshot mapped from a compiled catalog is usable immediately; warm()
+    builds them ahead of the first request.
+    """
+
+    version: int
+    materials: Mapping[str, Dict[str, Any]]
+    regional: Mapping[Tuple[str, str], Dict[str, Any]]
+    regions: FrozenSet[str]
+    external_keys: AbstractSet[str]
+    files: Tuple[Path, ...]
+    digests: Tuple[str, ...]
+    names: Mapping[str, str]
+    created_at: float
+    source: str = "parsed"
+    # Set on snapshots repriced from the price history
+    as_of: Optional[str] = None
+    # Prebuilt "search" / "resolver" tables and "regional_prices" view, as mapped from
+    # a compiled catalog; the lazy indexes are built from the data when absent
+    indexes: Optional[Mapping[str, Any]] = None
+
+    def _prebuilt(self, name: str) -> Any:
+        return self.indexes.get(name) if self.indexes else None
+
+    @cached_property
+    def resolver(self) -> MaterialNameResolver:
+        return MaterialNameResolver(self.materials.keys(), self.names, tables=self._prebuilt("resolver"))
+
+    @cached_property
+    def regional_prices(self) -> Mapping[str, Tuple[float, ...]]:
+        """Every regional price per key, for estimating price spread across regions."""
+        prebuilt = self._prebuilt("regional_prices")
+        if prebuilt is not None:
+            return prebuilt
+        prices: Dict[str, List[float]] = {}
+        for (key, _), rec in self.regional.items():
+            prices.setdefault(key, []).append(float(rec["price"]))
+        return MappingProxyType({k: tuple(v) for k, v in prices.items()})
+
+    @cached_property
+    def search_index(self) -> MaterialSearchIndex:
+        return MaterialSearchIndex(self.materials, version=self.version, tables=self._prebuilt("search"))
+
+    def warm(self) -> "PriceSnapshot":
+        """Build the lazy indexes now; call off the request path."""
+        _ = (self.resolver, self.search_index, self.regional_prices)
+        return self
+
+
+# Canonical field -> accepted column names, in priority order
+FIELD_ALIASES: Dict[str, Tuple[str, ...]] = {
+    "key": ("key",),
+    "price": ("price", "Final_Price_USD", "Base_Cost_USD"),
+    "name": ("name", "material", "title", "Material"),
+    "unit": ("unit", "Unit_Type"),
+    "description": ("description", "Description", "Category"),
+    "region": ("region",),
+    "updated": ("updated", "Updated", "effective_date", "last_updated"),
+}
+
+# Rows between progress callbacks while ingesting a file
+PROGRESS_EVERY = max(1, int(os.getenv("PRICE_LIST_PROGRESS_ROWS", "100000")))
+_READ_CHUNK = 1 << 16
+_WS = " \t\r\n"
+
+ProgressCallback = Callable[[Path, int], None]
+
+# Region columns hold a handful of distinct spellings
+_region_slug = lru_cache(maxsize=1024)(normalize_region)
+
+
+def resolve_columns(
+    header: Sequence[str], field_aliases: Optional[Dict[str, Tuple[str, ...]]] = None
+) -> Dict[str, int]:
+    """Map canonical fields to header positions; exact names win over case-insensitive ones."""
+    exact = {name: i for i, name in reversed(list(enumerate(header)))}
+    lowered = {str(name).strip().lower(): i for i, name in reversed(list(enumerate(header)))}
+    columns: Dict[str, int] = {}
+    for fld, aliases in (field_aliases or FIELD_ALIASES).items():
+        for alias in aliases:
+            if alias in exact:
+                columns[fld] = exact[alias]
+                break
+        else:
+            for alias in aliases:
+                if alias.lower() in lowered:
+                    columns[fld] = lowered[alias.lower()]
+                    break
+    return columns
+
+
+def _str_or_none(value: Any) -> Optional[str]:
+    return value.strip() if isinstance(value, str) and value.strip() else None
+
+
+def _file_digest(path: Path) -> str:
+    h = hashlib.sha256()
+    with path.open("rb") as fh:
+        for chunk in iter(lambda: fh.read(_READ_CHUNK), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class _JsonStream:
+    """Incremental reader for the items of a top-level JSON array or object.
+
+    Only the current item and one read chunk are held in memory.
+    """
+
+    def __init__(self, fh, chunk_size: int = _READ_CHUNK):
+        self._fh = fh
+        self._chunk_size = chunk_size
+        self._decoder = json.JSONDecoder()
+        self._buf = ""
+        self._pos = 0
+        self._eof = False
+
+    def _fill(self) -> bool:
+        if self._eof:
+            return False
+        data = self._fh.read(self._chunk_size)
+        if not data:
+            self._eof = True
+            return False
+        self._buf = self._buf[self._pos:] + data
+        self._pos = 0
+        return True
+
+    def peek(self) -> str:
+        """Next non-whitespace character without consuming it ("" at end of input)."""
+        while True:
+            while self._pos < len(self._buf) and self._buf[self._pos] in _WS:
+                self._pos += 1
+            if self._pos < len(self._buf):
+                return self._buf[self._pos]
+            if not self._fill():
+                return ""
+
+    def expect(self, char: str) -> None:
+        found = self.peek()
+        if found != char:
+            raise ValueError(f"Malformed JSON: expected {char!r}, found {found or 'end of file'!r}")
+        self._pos += 1
+
+    def value(self) -> Any:
+        self.peek()
+        while True:
+            try:
+                obj, end = self._decoder.raw_decode(self._buf, self._pos)
+            except json.JSONDecodeError:
+                if self._fill():
+                    continue
+                raise
+            # A number or literal ending at the buffer edge may continue in the next chunk
+            if end == len(self._buf) and self._fill():
+                continue
+            self._pos = end
+            return obj
+
+    def _after_item(self, close: str) -> bool:
+        nxt = self.peek()
+        if nxt == ",":
+            self._pos += 1
+            return True
+        self.expect(close)
+        return False
+
+    def items(self, allow_list: bool = True) -> Iterator[Tuple[Optional[str], Any]]:
+        """Yield (key, value) for an object or (None, value) for an array."""
+        opener = self.peek()
+        if opener == "{":
+            self._pos += 1
+            if self.peek() == "}":
+                return
+            while True:
+                key = self.value()
+                if not isinstance(key, str):
+                    raise ValueError("Malformed JSON: object keys must be strings")
+                self.expect(":")
+                yield key, self.value()
+                if not self._after_item("}"):
+                    return
+        elif opener == "[":
+            if not allow_list:
+                return
+            self._pos += 1
+            if self.peek() == "]":
+                return
+            while True:
+                yield None, self.value()
+                if not self._after_item("]"):
+                    return
+        else:
+            # Scalars and other documents carry no price rows
+            self.value()
+
+
+def _add_row(
+    parsed: ParsedPriceFile, row: Sequence[Any], columns: Dict[str, int], derived_keys: Dict[str, str]
+) -> None:
+    """Validate one list/CSV row against the resolved columns and record it."""
+
+    def col(fld: str) -> Any:
+        i = columns.get(fld)
+        return row[i] if i is not None and i < len(row) else None
+
+    price = col("price")
+    if price is None or (isinstance(price, str) and not price.strip()):
+        parsed.rows_skipped += 1
+        return
+    key_raw = col("key")
+    key = key_raw.strip() if isinstance(key_raw, str) else ""
+    name_val = col("name")
+    name = name_val.strip() if isinstance(name_val, str) else ""
+    if not key and name:
+        # Supplier dumps repeat names across regions; derive each key once
+        key = derived_keys.get(name)
+        if key is None:
+            key = derived_keys[name] = canonical_material_key(name)
+    if not key:
+        parsed.rows_skipped += 1
+        return
+    try:
+        value = float(price.strip() if isinstance(price, str) else price)
+    except (TypeError, ValueError):
+        parsed.row_errors += 1
+        return
+    unit = _str_or_none(col("unit"))
+    entry = {
+        "price": value,
+        "unit": sys.intern(unit) if unit else None,
+        "description": _str_or_none(col("description")),
+        "label": name or key.replace("_", " "),
+        "updated": _str_or_none(col("updated")),
+    }
+    if name:
+        parsed.names[name] = key
+    parsed.entries[key] = entry
+    region_raw = col("region")
+    region = _region_slug(region_raw) if isinstance(region_raw, str) else normalize_region(region_raw)
+    if region:
+        parsed.regional[(key, region)] = entry
+    parsed.rows_loaded += 1
+
+
+def _ingest_json(fh, parsed: ParsedPriceFile, progress: ProgressCallback, allow_list: bool = True) -> None:
+    # JSON list rows usually share one shape, so resolve aliases once per distinct key set
+    column_cache: Dict[Tuple[str, ...], Dict[str, int]] = {}
+    derived_keys: Dict[str, str] = {}
+    for key, rec in _JsonStream(fh).items(allow_list=allow_list):
+        parsed.rows_read += 1
+        if parsed.rows_read % PROGRESS_EVERY == 0:
+            progress(parsed.path, parsed.rows_read)
+        if not isinstance(rec, dict):
+            parsed.row_errors += 1
+            continue
+        if key is not None:
+            # Dict form: {"key": {"price": ..., "unit": ..., "description": ...}}
+            if rec.get("price") is None:
+                parsed.rows_skipped += 1
+                continue
+            try:
+                price = float(rec["price"])
+            except (TypeError, ValueError):
+                parsed.row_errors += 1
+                continue
+            parsed.entries[key] = {
+                "price": price,
+                "unit": rec.get("unit") or "unit",
+                "description": _str_or_none(rec.get("description")),
+                "label": key.replace("_", " "),
+                "updated": _str_or_none(rec.get("updated") or rec.get("Updated")),
+            }
+            parsed.rows_loaded += 1
+            continue
+        header = tuple(rec)
+        columns = column_cache.get(header)
+        if columns is None:
+            if len(column_cache) >= 256:
+                column_cache.clear()
+            columns = column_cache[header] = resolve_columns(header)
+        _add_row(parsed, tuple(rec.values()), columns, derived_keys)
+
+
+def _ingest_delimited(fh, delim: str, parsed: ParsedPriceFile, progress: ProgressCallback) -> None:
+    reader = csv.reader(fh, delimiter=delim)
+    header = next(reader, None)
+    if not header:
+        return
+    columns = resolve_columns([h.strip() for h in header])
+    derived_keys: Dict[str, str] = {}
+    for row in reader:
+        if not row:
+            continue
+        parsed.rows_read += 1
+        if parsed.rows_read % PROGRESS_EVERY == 0:
+            progress(parsed.path, parsed.rows_read)
+        _add_row(parsed, row, columns, derived_keys)
+
+
+def _print_progress(path: Path, rows: int) -> None:
+    print(f"Price list {path}: {rows} rows read")
+
+
+def parse_price_file(
+    path: Path,
+    previous: Optional[ParsedPriceFile] = None,
+    progress: Optional[ProgressCallback] = None,
+) -> ParsedPriceFile:
+    """Parse one price list, reusing `previous` if the file is unchanged.
+
+    Unchanged mtime/size skips reading entirely; a changed mtime with identical
+    content (same hash) keeps the previous entries without reparsing. Files are
+    hashed and parsed in chunks, so memory grows with the number of distinct
+    keys rather than the file size.
+    """
+    st = path.stat()
+    if previous is not None and previous.is_current(st):
+        return previous
+    digest = _file_digest(path)
+    if previous is not None and previous.digest == digest:
+        previous.mtime, previous.size = st.st_mtime, st.st_size
+        return previous
+
+    progress = progress or _print_progress
+    parsed = ParsedPriceFile(path=path, mtime=st.st_mtime, size=st.st_size, digest=digest)
+    started = time.perf_counter()
+    suffix = path.suffix.lower()
+    if suffix in (".csv", ".tsv"):
+        with path.open("r", encoding="utf-8-sig", newline="") as fh:
+            _ingest_delimited(fh, "," if suffix == ".csv" else "\t", parsed, progress)
+    else:
+        with path.open("r", encoding="utf-8-sig") as fh:
+            # Unknown extensions only accept the JSON dict form
+            _ingest_json(fh, parsed, progress, allow_list=suffix == ".json")
+    parsed.parse_ms = round((time.perf_counter() - started) * 1000, 2)
+    sample = ", ".join(list(parsed.entries)[:5])
+    print(
+        f"Price list loaded from {path}: {parsed.rows_loaded} entries from {parsed.rows_read} rows "
+        f"({parsed.rows_skipped} skipped, {parsed.row_errors} errors) (e.g., {sample})"
+    )
+    return parsed
+
+
+def _merge_entry(rec: Dict[str, Any], prev: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "price": rec["price"],
+        "unit": rec["unit"] or prev.get("unit") or "unit",
+        "description": rec["description"] or prev.get("description") or rec["label"],
+    }
+
+
+def build_price_snapshot(
+    base: Dict[str, Dict[str, Any]],
+    parsed_files: List[ParsedPriceFile],
+    version: int,
+) -> PriceSnapshot:
+    """Merge parsed files (in order) over the built-in materials into a new snapshot."""
+    materials: Dict[str, Dict[str, Any]] = {k: dict(v) for k, v in base.items()}
+    regional: Dict[Tuple[str, str], Dict[str, Any]] = {}
+    external_keys = set()
+    names: Dict[str, str] = {}
+    for pf in parsed_files:
+        for key, rec in pf.entries.items():
+            materials[key] = _merge_entry(rec, materials.get(key, {}))
+            external_keys.add(key)
+        for (key, region), rec in pf.regional.items():
+            regional[(key, region)] = _merge_entry(rec, materials.get(key, {}))
+        names.update(pf.names)
+
+    return PriceSnapshot(
+        version=version,
+        materials=MappingProxyType(materials),
+        regional=MappingProxyType(regional),
+        regions=frozenset(region for _, region in regional),
+        external_keys=frozenset(external_keys),
+        files=tuple(pf.path for pf in parsed_files),
+        digests=tuple(pf.digest for pf in parsed_files),
+        names=MappingProxyType(names),
+        created_at=time.time(),
+    ).warm()
@@ -1,26 +1,247 @@
 import os
-from typing import Optional, Dict, Any
+import sqlite3
+import threading
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence
 
+from services.ttl_cache import TTLCache
 
-class PricingService:
-    """Disabled pricing service - no external pricing backend configured.
-    
-    Always returns None to fallback to local/external price lists.
+# Cached marker for keys the backend does not know, so misses are not refetched every quote
+_NOT_FOUND = object()
+
+# SQLite's default limit on bound parameters is 999
+_SQL_BATCH = 500
+
+
+class PricingBackend:
+    """Source of authoritative material prices; subclasses implement fetch_prices."""
+
+    name = "none"
+
+    def fetch_prices(self, keys: Sequence[str]) -> Dict[str, Dict[str, Any]]:
+        """Return {key: {"price": float, "unit": str}} for the keys that are known."""
+        raise NotImplementedError
+
+
+class SQLPricingBackend(PricingBackend):
+    """Prices from a local SQLite table (key TEXT PRIMARY KEY, price REAL, unit TEXT).
+
+    Stands in for the watsonx.data / trino backend in development and single-node deploys.
     """
 
+    name = "sql"
+
+    def __init__(self, db_path: str, table: str = "material_prices"):
+        if not table.isidentifier():
+            raise ValueError(f"Invalid pricing table name: {table}")
+        self.db_path = db_path
+        self.table = table
+        self.init_schema()
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.db_path)
+
+    def init_schema(self) -> None:
+        conn = self._connect()
+        try:
+            conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {self.table} ("
+                "key TEXT PRIMARY KEY, price REAL NOT NULL, unit TEXT, "
+                "updated_at TEXT DEFAULT CURRENT_TIMESTAMP)"
+            )
+            conn.commit()
+        finally:
+            conn.close()
+
+    def upsert_prices(self, rows: Iterable[Dict[str, Any]]) -> int:
+        """Insert or replace rows of {"key", "price", "unit"}; returns the row count."""
+        data = [(r["key"], float(r["price"]), r.get("unit")) for r in rows]
+        conn = self._connect()
+        try:
+            conn.executemany(
+                f"INSERT INTO {self.table} (key, price, unit) VALUES (?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET price = excluded.price, unit = excluded.unit, "
+                "updated_at = CURRENT_TIMESTAMP",
+                data,
+            )
+            conn.commit()
+        finally:
+            conn.close()
+        return len(data)
+
+    def fetch_prices(self, keys: Sequence[str]) -> Dict[str, Dict[str, Any]]:
+        found: Dict[str, Dict[str, Any]] = {}
+        conn = self._connect()
+        try:
+            for start in range(0, len(keys), _SQL_BATCH):
+                chunk = keys[start:start + _SQL_BATCH]
+                placeholders = ",".join("?" * len(chunk))
+                cursor = conn.execute(
+                    f"SELECT key, price, unit FROM {self.table} WHERE key IN ({placeholders})", chunk
+                )
+                for key, price, unit in cursor:
+                    if price is not None:
+                        found[key] = {"price": float(price), "unit": unit or "unit"}
+        finally:
+            conn.close()
+        return found
+
+
+# Backend factories selected by PRICING_BACKEND; register others (e.g. watsonx) here
+BACKENDS: Dict[str, Callable[[], PricingBackend]] = {
+    "sql": lambda: SQLPricingBackend(
+        os.getenv("PRICING_DB_PATH", "pricing/prices.db"),
+        table=os.getenv("PRICING_TABLE", "material_prices"),
+    ),
+}
+
+
+class _Flight:
+    """One in-progress backend fetch that concurrent callers can wait on."""
+
     def __init__(self) -> None:
-        self.enabled = False
-        self._cache: Dict[str, Dict[str, Any]] = {}
-        
-        # Check if watsonx is configured
-        if os.getenv("WXD_HOST") and os.getenv("WXD_TOKEN"):
+        self.done = threading.Event()
+        self.result: Any = _NOT_FOUND
+
+
+class PricingService:
+    """Cached, batched access to an external pricing backend.
+
+    Lookups go through a TTL cache (misses are cached for a shorter negative TTL), and
+    keys already being fetched by another caller are waited on instead of refetched,
+    so concurrent quotes for the same materials share one backend round-trip. With no
+    backend configured every lookup returns nothing and callers fall back to price lists.
+    """
+
+    def __init__(self, backend: Optional[PricingBackend] = None) -> None:
+        if backend is None:
+            backend = self._configured_backend()
+        self.backend = backend
+        self.enabled = backend is not None
+        self.negative_ttl_sec = float(os.getenv("PRICING_NEGATIVE_TTL_SEC", "60"))
+        self._cache = TTLCache(
+            max_size=int(os.getenv("PRICING_CACHE_SIZE", "10000")),
+            ttl_sec=float(os.getenv("PRICING_CACHE_TTL_SEC", "300")),
+        )
+        self._flights: Dict[str, _Flight] = {}
+        self._flights_lock = threading.Lock()
+        self.backend_calls = 0
+        self.backend_keys = 0
+        self.backend_errors = 0
+        self.coalesced_keys = 0
+
+    @staticmethod
+    def _configured_backend() -> Optional[PricingBackend]:
+        kind = os.getenv("PRICING_BACKEND", "").strip().lower()
+        if kind in BACKENDS:
+            backend = BACKENDS[kind]()
+            print(f"PricingService: using {backend.name} pricing backend")
+            return backend
+        if kind:
+            print(f"PricingService: unknown PRICING_BACKEND '{kind}', external pricing disabled")
+        elif os.getenv("WXD_HOST") and os.getenv("WXD_TOKEN"):
             print("PricingService: watsonx.data configuration detected but disabled")
         else:
             print("PricingService: no external pricing backend configured")
-    def get_price(self, key: str) -> Optional[Dict[str, Any]]:
-        """Return None - no external pricing backend configured."""
         return None
 
+    def get_price(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return {"price", "unit"} for one key, or None if the backend does not have it."""
+        return self.get_prices([key]).get(key)
+
+    def get_prices(self, keys: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        """Return prices for every known key in one backend round-trip at most.
+
+        Blocks on the backend (or on another caller's fetch of the same keys); async
+        code should call it through asyncio.to_thread unless has_cached() is true.
+        """
+        if self.backend is None:
+            return {}
+        found: Dict[str, Dict[str, Any]] = {}
+        missing: List[str] = []
+        for key in dict.fromkeys(keys):
+            cached = self._cache.get(key)
+            if cached is None:
+                missing.append(key)
+            elif cached is not _NOT_FOUND:
+                found[key] = cached
+        if not missing:
+            return found
+
+        # Claim keys nobody is fetching; wait on the rest. A fetch that finished since
+        # the cache check above has already filled the cache, so check it again here.
+        owned: List[str] = []
+        waiting: Dict[str, _Flight] = {}
+        with self._flights_lock:
+            for key in missing:
+                flight = self._flights.get(key)
+                if flight is not None:
+                    waiting[key] = flight
+                    continue
+                cached = self._cache.get(key)
+                if cached is None:
+                    self._flights[key] = _Flight()
+                    owned.append(key)
+                elif cached is not _NOT_FOUND:
+                    found[key] = cached
+            if owned:
+                self.backend_calls += 1
+                self.backend_keys += len(owned)
+        if owned:
+            self._fetch(owned, found)
+        for key, flight in waiting.items():
+            flight.done.wait()
+            if flight.result is not _NOT_FOUND:
+                found[key] = flight.result
+        if waiting:
+            with self._flights_lock:
+                self.coalesced_keys += len(waiting)
+        return found
+
+    def _fetch(self, keys: List[str], found: Dict[str, Dict[str, Any]]) -> None:
+        fetched: Dict[str, Dict[str, Any]] = {}
+        failed = False
+        try:
+            fetched = self.backend.fetch_prices(keys)
+        except Exception as e:
+            # Errors are not negatively cached; the next quote retries
+            failed = True
+            with self._flights_lock:
+                self.backend_errors += 1
+            print(f"PricingService: backend lookup failed: {e}")
+        finally:
+            # Cache results before releasing the flights, so no caller can miss both
+            for key in keys:
+                rec = fetched.get(key)
+                if rec is not None:
+                    self._cache.put(key, rec)
+                    found[key] = rec
+                elif not failed:
+                    self._cache.put(key, _NOT_FOUND, ttl_sec=self.negative_ttl_sec)
+            with self._flights_lock:
+                flights = [self._flights.pop(key) for key in keys]
+            for key, flight in zip(keys, flights, strict=True):
+                flight.result = fetched.get(key, _NOT_FOUND)
+                flight.done.set()
+
+    def invalidate(self, keys: Optional[Iterable[str]] = None) -> None:
+        """Drop cached prices for keys, or everything when keys is None."""
+        if keys is None:
+            self._cache.clear()
+            return
+        for key in keys:
+            self._cache.invalidate(key)
+
     def is_enabled(self) -> bool:
-        """Always returns False - external pricing disabled."""
-        return False
+        return self.enabled
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "backend": self.backend.name if self.backend is not None else None,
+            "backend_calls": self.backend_calls,
+            "backend_keys": self.backend_keys,
+            "backend_errors": self.backend_errors,
+            "coalesced_keys": self.coalesced_keys,
+            "negative_ttl_sec": self.negative_ttl_sec,
+            "cache": self._cache.stats(),
+        }
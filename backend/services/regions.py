@@ -0,0 +1,23 @@
+"""Region names shared by price lists and quote options."""
+import re
+from typing import Optional
+
+# Canonical region slugs used to key regional price rows. Catalog rows carry names like
+# "West Coast"; the quote `region` option uses the short names on the left.
+REGION_ALIASES = {
+    "northeast": "northeast",
+    "southeast": "southeast",
+    "south": "southeast",
+    "midwest": "midwest",
+    "southwest": "southwest",
+    "west": "west_coast",
+    "west_coast": "west_coast",
+}
+
+
+def normalize_region(region: Optional[str]) -> str:
+    """Map a region name from a price list or request option to its canonical slug."""
+    if not region:
+        return ""
+    slug = re.sub(r"[\s\-]+", "_", str(region).strip().lower())
+    return REGION_ALIASES.get(slug, slug)
@@ -0,0 +1,235 @@
+"""Bulk re-pricing of stored quotes after price lists change.
+
+Quotes are streamed out of the database in id order, in chunks. Each chunk is
+re-estimated from its stored vision results and reasoning in a process pool; the
+worker processes use EstimationService.calculate_estimates_batch, so a chunk is
+priced in one vectorized pass. Changed quotes get a new estimate version plus a
+delta, and the job checkpoint (last quote id) advances in the same transaction,
+so an interrupted job resumes where it stopped.
+
+Run from the backend directory:
+    python -m services.repricing --db estimategenie.db --workers 4
+    python -m services.repricing --db estimategenie.db --resume <job_id>
+"""
+import argparse
+import multiprocessing
+import uuid
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+from database.db import DatabaseService
+
+# Option keys carried over from the stored estimate's options_applied
+_REPRICE_OPTIONS = ("quality", "contingency_pct", "profit_pct", "region")
+
+# One EstimationService per worker process, created by _init_worker
+_worker_service = None
+
+
+def _init_worker() -> None:
+    global _worker_service
+    from services.estimation_service import EstimationService
+
+    _worker_service = EstimationService()
+
+
+def _job_for_quote(quote: Dict[str, Any]) -> Dict[str, Any]:
+    old = quote.get("estimate") or {}
+    options = {k: v for k, v in (old.get("options_applied") or {}).items() if k in _REPRICE_OPTIONS}
+    # Only keep Monte Carlo ranges on quotes that already had one
+    options["cost_range"] = old.get("cost_range") is not None
+    return {
+        "vision_results": quote.get("vision_results") or {},
+        "reasoning": quote.get("reasoning") or {},
+        "project_type": quote.get("project_type") or "general",
+        "options": options,
+    }
+
+
+def estimate_delta(old: Dict[str, Any], new: Dict[str, Any]) -> Dict[str, Any]:
+    """Summary of what re-pricing changed: totals, categories and per-line unit prices."""
+    old_total = float((old.get("total_cost") or {}).get("amount") or 0.0)
+    new_total = float(new["total_cost"]["amount"])
+    old_breakdown = (old.get("total_cost") or {}).get("breakdown") or {}
+    new_breakdown = new["total_cost"]["breakdown"]
+    old_prices = {m.get("name"): m.get("unit_price") for m in old.get("materials") or []}
+    changed_lines = [
+        {"name": m["name"], "old_unit_price": old_prices.get(m["name"]), "new_unit_price": m["unit_price"]}
+        for m in new.get("materials") or []
+        if old_prices.get(m["name"]) != m["unit_price"]
+    ]
+    return {
+        "old_total": old_total,
+        "new_total": new_total,
+        "change": round(new_total - old_total, 2),
+        "change_pct": round((new_total - old_total) / old_total * 100.0, 2) if old_total else None,
+        "breakdown": {
+            k: round(float(new_breakdown.get(k) or 0.0) - float(old_breakdown.get(k) or 0.0), 2)
+            for k in ("materials", "labor", "profit", "contingency")
+        },
+        "changed_lines": changed_lines,
+        "price_snapshot_version": {"old": old.get("price_snapshot_version"), "new": new.get("price_snapshot_version")},
+    }
+
+
+def reprice_chunk(quotes: List[Dict[str, Any]], service=None) -> Tuple[List[Dict[str, Any]], int, int]:
+    """Re-estimate a chunk of quotes; returns (changed results, unchanged count, failed count)."""
+    service = service or _worker_service
+    if service is None:
+        _init_worker()
+        service = _worker_service
+    jobs, sources, failed = [], [], 0
+    for quote in quotes:
+        try:
+            jobs.append(_job_for_quote(quote))
+            sources.append(quote)
+        except Exception:
+            failed += 1
+    try:
+        estimates = service.calculate_estimates_batch(jobs)
+    except Exception:
+        # One bad quote must not sink the chunk: fall back to pricing them one by one
+        estimates = []
+        for job in jobs:
+            try:
+                estimates.append(service.calculate_estimates_batch([job])[0])
+            except Exception:
+                estimates.append(None)
+    changed, unchanged = [], 0
+    for quote, estimate in zip(sources, estimates, strict=True):
+        if estimate is None:
+            failed += 1
+            continue
+        old = quote.get("estimate") or {}
+        delta = estimate_delta(old, estimate)
+        if delta["change"] == 0 and not delta["changed_lines"]:
+            unchanged += 1
+            continue
+        changed.append({
+            "quote_id": quote["id"], "updated_at": quote.get("updated_at"),
+            "old_estimate": old, "estimate": estimate, "delta": delta,
+        })
+    return changed, unchanged, failed
+
+
+class RepricingJob:
+    """Re-prices stored quotes in chunks with a process pool; resumable by job id."""
+
+    def __init__(
+        self,
+        db: DatabaseService,
+        chunk_size: int = 500,
+        workers: int = 0,
+        statuses: Optional[List[str]] = None,
+        job_id: Optional[str] = None,
+        progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+    ):
+        self.db = db
+        self.chunk_size = max(1, int(chunk_size))
+        self.workers = max(0, int(workers))
+        self.statuses = statuses if statuses is not None else ["completed"]
+        self.progress = progress
+        self.resumed = False
+        if job_id is not None:
+            job = db.get_repricing_job(job_id)
+            if job is None:
+                raise ValueError(f"Unknown re-pricing job: {job_id}")
+            self.job_id = job_id
+            self.statuses = job["params"].get("statuses", self.statuses)
+            self.resumed = True
+        else:
+            self.job_id = f"reprice_{uuid.uuid4().hex[:12]}"
+            db.create_repricing_job(
+                self.job_id, {"chunk_size": self.chunk_size, "workers": self.workers, "statuses": self.statuses}
+            )
+
+    def _chunks(self, after_id: Optional[str]):
+        while True:
+            quotes = self.db.fetch_quotes_after(after_id, self.chunk_size, self.statuses)
+            if not quotes:
+                return
+            after_id = quotes[-1]["id"]
+            yield quotes
+
+    def _commit(self, quotes: List[Dict[str, Any]], outcome: Tuple[List[Dict[str, Any]], int, int]) -> None:
+        changed, unchanged, failed = outcome
+        self.db.save_repriced_estimates(
+            self.job_id,
+            changed,
+            last_quote_id=quotes[-1]["id"],
+            counts={"processed": len(quotes), "unchanged": unchanged, "failed": failed},
+        )
+        if self.progress:
+            self.progress(self.db.get_repricing_job(self.job_id))
+
+    def run(self) -> Dict[str, Any]:
+        """Process every remaining quote; returns the final job record."""
+        job = self.db.get_repricing_job(self.job_id)
+        if job["status"] == "completed":
+            return job
+        self.db.update_repricing_job(self.job_id, status="running", error=None)
+        try:
+            chunks = self._chunks(job.get("last_quote_id"))
+            if self.workers == 0:
+                from services.estimation_service import EstimationService
+
+                service = EstimationService()
+                for quotes in chunks:
+                    self._commit(quotes, reprice_chunk(quotes, service))
+            else:
+                # spawn: forking the threaded API process could copy held locks into workers
+                ctx = multiprocessing.get_context("spawn")
+                with ProcessPoolExecutor(max_workers=self.workers, mp_context=ctx, initializer=_init_worker) as pool:
+                    # Bounded in-flight window; results are committed in id order so the
+                    # checkpoint never skips an unfinished chunk
+                    pending: Deque[Tuple[List[Dict[str, Any]], Future]] = deque()
+                    for quotes in chunks:
+                        pending.append((quotes, pool.submit(reprice_chunk, quotes)))
+                        if len(pending) >= self.workers * 2:
+                            done_quotes, future = pending.popleft()
+                            self._commit(done_quotes, future.result())
+                    while pending:
+                        done_quotes, future = pending.popleft()
+                        self._commit(done_quotes, future.result())
+        except BaseException as e:
+            self.db.update_repricing_job(self.job_id, status="interrupted", error=str(e) or type(e).__name__)
+            raise
+        self.db.update_repricing_job(
+            self.job_id, status="completed", finished_at=datetime.now(timezone.utc).isoformat()
+        )
+        return self.db.get_repricing_job(self.job_id)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Re-price stored quotes against the current price lists")
+    parser.add_argument("--db", help="SQLite database path (default: DATABASE_URL, else estimategenie.db)")
+    parser.add_argument("--chunk-size", type=int, default=500)
+    parser.add_argument("--workers", type=int, default=4, help="worker processes (0 = in-process)")
+    parser.add_argument("--status", action="append", dest="statuses", help="quote status to include (repeatable)")
+    parser.add_argument("--resume", metavar="JOB_ID", help="resume an interrupted job")
+    args = parser.parse_args()
+
+    def report(job: Dict[str, Any]) -> None:
+        print(
+            f"{job['id']}: {job['processed']} processed, {job['updated']} updated, "
+            f"{job['unchanged']} unchanged, {job['skipped']} skipped, {job['failed']} failed "
+            f"(at {job['last_quote_id']})"
+        )
+
+    job = RepricingJob(
+        DatabaseService(args.db),
+        chunk_size=args.chunk_size,
+        workers=args.workers,
+        statuses=args.statuses,
+        job_id=args.resume,
+        progress=report,
+    )
+    print(f"Re-pricing job {job.job_id} ({'resumed' if job.resumed else 'new'})")
+    result = job.run()
+    print(f"Re-pricing job {result['id']} {result['status']}")
+
+
+if __name__ == "__main__":
+    main()
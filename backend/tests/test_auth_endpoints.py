@@ -0,0 +1,84 @@
+import importlib
+
+import pytest
+from fastapi.testclient import TestClient
+
+from database.backend import create_backend
+from services.auth_service import AuthService
+
+
+class _Payments:
+    def is_configured(self, require_webhook=False):
+        return True
+
+    def create_customer(self, email, name):
+        return "cus_123"
+
+    def create_checkout_session(self, **kwargs):
+        return {"session_id": "cs_1", "url": "https://checkout.example/cs_1"}
+
+
+class _Auth0:
+    def is_configured(self):
+        return True
+
+    async def exchange_code_for_token(self, code, redirect_uri):
+        return {"access_token": "auth0-token"}
+
+    async def verify_token(self, token):
+        return {"sub": "auth0|1"}
+
+    def get_user_info(self, user_id):
+        return {"email": "oauth@example.com", "name": "Sam"}
+
+
+@pytest.fixture
+def api(database_url, tmp_path, monkeypatch):
+    """(app module, AuthService, client) with the users table on the database under test."""
+    monkeypatch.chdir(tmp_path)
+    app_module = importlib.import_module("app")
+    backend = create_backend(database_url=database_url)
+    service = AuthService(backend=backend)
+    monkeypatch.setattr(app_module, "auth_service", service)
+    monkeypatch.setattr(app_module, "payment_service", _Payments())
+    monkeypatch.setattr(app_module, "auth0_service", _Auth0())
+    yield app_module, service, TestClient(app_module.app)
+    backend.close()
+
+
+def test_account_endpoints_use_the_storage_backend(api):
+    _, service, client = api
+    user = service.register_user("pat@example.com", "Pat", "secret-pass")
+    headers = {"Authorization": f"Bearer {service.create_access_token(user.id, user.email)}"}
+
+    assert client.put("/api/v1/auth/update-profile", json={"name": "Patricia"}, headers=headers).status_code == 200
+    assert service.get_user_by_id(user.id).name == "Patricia"
+
+    r = client.put(
+        "/api/v1/auth/change-password",
+        json={"current_password": "secret-pass", "new_password": "another-pass"},
+        headers=headers,
+    )
+    assert r.status_code == 200
+    assert service.authenticate_user("pat@example.com", "another-pass").id == user.id
+
+    new_key = client.post("/api/v1/auth/regenerate-key", headers=headers).json()["api_key"]
+    assert service.get_user_by_api_key(new_key).id == user.id
+
+    assert client.delete("/api/v1/auth/delete-account", headers=headers).status_code == 200
+    assert service.get_user_by_id(user.id) is None
+    assert client.get("/api/v1/auth/me", headers=headers).status_code == 404
+
+
+def test_signup_and_auth0_login_write_through_the_storage_backend(api):
+    _, service, client = api
+    r = client.post(
+        "/api/v1/auth/register",
+        json={"email": "pro@example.com", "name": "Pro", "password": "secret-pass", "plan": "pro"},
+    )
+    assert r.status_code == 200 and r.json()["checkout_session_id"] == "cs_1"
+    assert service.get_user_by_email("pro@example.com").stripe_customer_id == "cus_123"
+
+    first = client.post("/api/v1/auth/auth0/callback", params={"code": "c", "redirect_uri": "r"}).json()
+    again = client.post("/api/v1/auth/auth0/callback", params={"code": "c", "redirect_uri": "r"}).json()
+    assert first["user"]["id"] == again["user"]["id"] == service.get_user_by_email("oauth@example.com").id
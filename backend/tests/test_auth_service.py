@@ -26,3 +26,57 @@ def test_register_user_prevents_duplicate_emails(tmp_path):
 
     second = service.register_user("dup@example.com", "Second", "secret")
     assert second is None
+
+
+def test_users_round_trip_on_each_backend(database_url):
+    from database.backend import create_backend
+
+    backend = create_backend(database_url=database_url)
+    service = AuthService(backend=backend)
+    AuthService(backend=backend)  # creating the schema twice is harmless
+
+    user = service.register_user("pg@example.com", "Pat", "secret")
+    assert user is not None
+    assert service.register_user("pg@example.com", "Other", "secret") is None
+    assert service.authenticate_user("pg@example.com", "secret").id == user.id
+    assert service.authenticate_user("pg@example.com", "wrong") is None
+
+    service.update_user_usage(user.id, quotes_used=3, api_calls_used=7)
+    service.update_subscription(user.id, "pro", "sub_1", "active")
+    stored = service.get_user_by_api_key(user.api_key)
+    assert (stored.id, stored.quotes_used, stored.api_calls_used) == (user.id, 3, 7)
+    assert (stored.plan, stored.subscription_status) == ("pro", "active")
+    assert service.get_user_by_id(user.id).created_at is not None
+    backend.close()
+
+
+def test_account_updates_on_each_backend(database_url):
+    from database.backend import create_backend
+
+    backend = create_backend(database_url=database_url)
+    service = AuthService(backend=backend)
+    user = service.register_user("acct@example.com", "Pat", "secret")
+
+    assert service.update_user_name(user.id, "Patricia")
+    assert service.update_password(user.id, "new-secret")
+    assert service.update_user_stripe_customer(user.id, "cus_123")
+    stored = service.get_user_by_email("acct@example.com")
+    assert (stored.name, stored.stripe_customer_id) == ("Patricia", "cus_123")
+    assert service.authenticate_user("acct@example.com", "new-secret").id == user.id
+
+    new_key = service.regenerate_api_key(user.id)
+    assert new_key and new_key != user.api_key
+    assert service.get_user_by_api_key(new_key).id == user.id
+    assert service.get_user_by_api_key(user.api_key) is None
+
+    # External (Auth0) logins reuse the account with that email, or create one
+    assert service.get_or_create_external_user("acct@example.com", "Ignored").id == user.id
+    external = service.get_or_create_external_user("oauth@example.com", "Sam")
+    assert service.get_or_create_external_user("oauth@example.com", "Sam").id == external.id
+    assert service.get_user_by_id(external.id).created_at is not None
+
+    assert service.delete_user(user.id)
+    assert service.get_user_by_id(user.id) is None
+    assert not service.delete_user(user.id)
+    assert not service.update_user_name(user.id, "Gone")
+    backend.close()
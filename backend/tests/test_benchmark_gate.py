@@ -0,0 +1,32 @@
+from benchmark_estimation import Case, compare, percentile, time_case
+
+
+def test_gate_flags_p50_and_p95_regressions_beyond_threshold():
+    baseline = {
+        "estimate": {"p50_ms": 4.0, "p95_ms": 5.0},
+        "search": {"p50_ms": 10.0, "p95_ms": 12.0},
+        "lookup": {"p50_ms": 0.01, "p95_ms": 0.02},
+    }
+    current = {
+        "estimate": {"p50_ms": 4.4, "p95_ms": 7.0},  # p95 +40%
+        "search": {"p50_ms": 13.0, "p95_ms": 12.5},  # p50 +30%
+        "lookup": {"p50_ms": 0.03, "p95_ms": 0.04},  # tripled, but below the noise floor
+        "new_case": {"p50_ms": 1.0, "p95_ms": 1.0},
+    }
+
+    regressions = compare(current, baseline, threshold=0.25, min_delta_ms=0.05)
+    assert [(r["case"], r["metric"]) for r in regressions] == [("estimate", "p95_ms"), ("search", "p50_ms")]
+    assert regressions[0]["change_pct"] == 40.0
+    assert compare(current, baseline, threshold=0.5) == []
+
+
+def test_time_case_reports_per_call_percentiles():
+    calls = []
+    stats = time_case(Case("noop", lambda: calls.append(1), number=4, setup=lambda: calls.append(0)), samples=6)
+
+    assert stats["samples"] == 6 and stats["calls_per_sample"] == 4
+    assert calls.count(1) == 1 + 4 * 6  # one warm-up call plus the samples
+    assert calls.count(0) == 7
+    assert 0 <= stats["min_ms"] <= stats["p50_ms"] <= stats["p95_ms"]
+    assert percentile([5.0, 1.0, 3.0, 2.0, 4.0], 50) == 3.0
+    assert percentile([5.0, 1.0, 3.0, 2.0, 4.0], 95) == 5.0
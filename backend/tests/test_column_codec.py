@@ -0,0 +1,74 @@
+import asyncio
+from datetime import datetime, timezone
+
+import pytest
+
+from database.codec import ColumnCodec, decode_column
+from database.db import DatabaseService
+
+REASONING = {"raw_response": "The bathroom needs new tile and grout. " * 200, "materials_needed": [{"name": "tile"}]}
+
+
+def _quote(i):
+    return {
+        "id": f"quote_{i:03d}",
+        "user_id": "u1",
+        "project_type": "bathroom",
+        "image_path": "",
+        "vision_results": {"detections": [{"class": "tile", "confidence": 0.9}] * 20},
+        "reasoning": REASONING,
+        "estimate": {"total_cost": {"amount": 100.0 + i}},
+        "status": "completed",
+        "created_at": datetime.now(timezone.utc),
+    }
+
+
+@pytest.mark.parametrize("name", ["json-zlib", "json-zstd", "msgpack-zstd"])
+def test_codecs_round_trip_with_version_byte(name):
+    codec = ColumnCodec(name)
+    if codec.name != name:
+        pytest.skip(f"{name} dependencies not installed")
+    encoded = codec.encode(REASONING)
+    assert isinstance(encoded, bytes) and len(encoded) < len(str(REASONING)) / 10
+    assert decode_column(encoded) == REASONING
+    # Small values skip compression but keep the header
+    assert decode_column(codec.encode({"a": 1})) == {"a": 1}
+    assert codec.is_current(encoded) and not codec.is_current('{"legacy": true}')
+
+
+def test_decode_handles_legacy_text_and_rejects_unknown_headers():
+    assert decode_column('{"legacy": [1, 2]}') == {"legacy": [1, 2]}
+    assert ColumnCodec("json").encode({"a": 1}) == '{"a": 1}'
+    with pytest.raises(ValueError):
+        decode_column(b"\x7f garbage")
+
+
+def test_online_migration_compresses_existing_rows(tmp_path, monkeypatch):
+    path = str(tmp_path / "quotes.db")
+    monkeypatch.setenv("DB_COLUMN_CODEC", "json")
+    legacy = DatabaseService(path)
+    for i in range(12):
+        assert asyncio.run(legacy.save_quote(_quote(i)))
+    legacy.close()
+
+    monkeypatch.setenv("DB_COLUMN_CODEC", "json-zlib")
+    db = DatabaseService(path)
+    # New writes use the codec; old rows still read fine before migrating
+    assert asyncio.run(db.update_quote("quote_000", {"estimate": {"total_cost": {"amount": 7.0}}}))
+    assert asyncio.run(db.get_quote("quote_005"))["reasoning"] == REASONING
+
+    batches = []
+    stats = db.migrate_column_encoding(batch_size=5, pause_sec=0, progress=lambda s: batches.append(s["rows"]))
+    assert stats["rows"] == 12 and stats["skipped"] == 0
+    assert len(batches) == 3
+    assert stats["bytes_after"] < stats["bytes_before"] / 5
+
+    with db._pool.connection() as conn:
+        types = conn.execute("SELECT DISTINCT typeof(reasoning), typeof(estimate) FROM quotes").fetchall()
+    assert [tuple(t) for t in types] == [("blob", "blob")]
+    quote = asyncio.run(db.get_quote("quote_000"))
+    assert quote["reasoning"] == REASONING and quote["estimate"] == {"total_cost": {"amount": 7.0}}
+    assert asyncio.run(db.list_quotes(20, 0, user_id="u1", summary=True))[-1]["total_amount"] == 7.0
+    # Already migrated rows are left alone
+    assert db.migrate_column_encoding(pause_sec=0)["rows"] == 0
+    db.close()
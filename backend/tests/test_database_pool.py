@@ -0,0 +1,66 @@
+import asyncio
+import threading
+from datetime import datetime, timezone
+
+from database.db import DatabaseService
+
+
+def _quote(i):
+    return {
+        "id": f"quote_{i:03d}",
+        "user_id": "u1",
+        "project_type": "bathroom",
+        "image_path": "",
+        "vision_results": {},
+        "reasoning": {"notes": i},
+        "estimate": {"total_cost": {"amount": 100 + i}},
+        "status": "completed",
+        "created_at": datetime.now(timezone.utc),
+    }
+
+
+def test_concurrent_calls_share_pooled_wal_connections(tmp_path):
+    db = DatabaseService(str(tmp_path / "quotes.db"), pool_size=3)
+    try:
+        async def scenario():
+            assert all(await asyncio.gather(*(db.save_quote(_quote(i)) for i in range(20))))
+            polls = await asyncio.gather(*(db.get_quote(f"quote_{i % 20:03d}") for i in range(50)))
+            updated = await asyncio.gather(*(db.update_quote(f"quote_{i:03d}", {"status": "archived"}) for i in range(5)))
+            return polls, updated
+
+        polls, updated = asyncio.run(scenario())
+        assert [p["estimate"]["total_cost"]["amount"] for p in polls[:3]] == [100, 101, 102]
+        assert all(updated)
+        assert asyncio.run(db.get_quote("quote_004"))["status"] == "archived"
+        assert asyncio.run(db.delete_quote("quote_004")) and asyncio.run(db.get_quote("quote_004")) is None
+
+        stats = db.pool_stats()
+        assert stats["open"] <= 3 and stats["checkouts"] >= 76
+        with db._pool.connection() as conn:
+            assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    finally:
+        db.close()
+
+
+def test_database_calls_run_off_the_event_loop(tmp_path):
+    db = DatabaseService(str(tmp_path / "quotes.db"), pool_size=2)
+    loop_thread = []
+    db_threads = set()
+    original = db._get_quote
+
+    def spy(quote_id):
+        db_threads.add(threading.current_thread().name)
+        return original(quote_id)
+
+    db._get_quote = spy
+    try:
+        async def scenario():
+            loop_thread.append(threading.current_thread().name)
+            await db.save_quote(_quote(1))
+            assert await db.ping()
+            return await db.get_quote("quote_001")
+
+        assert asyncio.run(scenario())["id"] == "quote_001"
+        assert db_threads and loop_thread[0] not in db_threads
+    finally:
+        db.close()
@@ -0,0 +1,483 @@
+import asyncio
+import json
+import os
+import time
+import tracemalloc
+
+import pytest
+
+from services.estimation_service import EstimationService
+from services.material_search import MaterialSearchIndex, decode_cursor, encode_cursor
+
+
+def _write_price_list(path, rows):
+    path.write_text(json.dumps(rows), encoding="utf-8")
+    return path
+
+
+def _service_with_list(monkeypatch, path):
+    monkeypatch.delenv("PRICE_LIST_FILES", raising=False)
+    monkeypatch.setenv("PRICE_LIST_FILE", str(path))
+    return EstimationService()
+
+
+REGIONAL_ROWS = [
+    {"key": "tile", "Final_Price_USD": 4.00, "Unit_Type": "sqft", "Region": "Midwest"},
+    {"key": "tile", "Final_Price_USD": 6.00, "Unit_Type": "sqft", "Region": "West Coast"},
+    {"key": "tile", "Final_Price_USD": 5.00, "Unit_Type": "sqft", "Region": "Northeast"},
+]
+
+
+def test_lookup_price_uses_regional_rows(tmp_path, monkeypatch):
+    service = _service_with_list(monkeypatch, _write_price_list(tmp_path / "prices.json", REGIONAL_ROWS))
+
+    assert service.lookup_price("tile", region="midwest")["price"] == 4.00
+    assert service.lookup_price("tile", region="west")["price"] == 6.00
+    assert service.lookup_price("tile", region="Northeast")["region"] == "northeast"
+    # Unknown regions fall back to the flat entry
+    assert service.lookup_price("tile", region="antarctica")["source"] == "external-list"
+
+
+def test_estimate_prices_materials_for_requested_region(tmp_path, monkeypatch):
+    service = _service_with_list(monkeypatch, _write_price_list(tmp_path / "prices.json", REGIONAL_ROWS))
+    reasoning = {"materials_needed": [{"name": "tile", "quantity": 10, "unit": "sqft"}], "analysis": {"labor_hours": 8}}
+
+    midwest = asyncio.run(service.calculate_estimate({}, reasoning, "bathroom", {"region": "midwest"}))
+    west = asyncio.run(service.calculate_estimate({}, reasoning, "bathroom", {"region": "west"}))
+
+    assert midwest["materials"][0]["unit_price"] == 4.00
+    assert west["materials"][0]["unit_price"] == 6.00
+
+
+def test_name_resolver_matches_catalog_names(tmp_path, monkeypatch):
+    rows = [
+        {"Material": "Drywall 1/2\"", "Final_Price_USD": 14.0, "Unit_Type": "sheet"},
+        {"Material": "Faucet Kitchen", "Final_Price_USD": 180.0, "Unit_Type": "each"},
+        {"key": "tile_spacers_1_8", "Material": "Tile Spacers 1/8 in", "Final_Price_USD": 6.0, "Unit_Type": "bag"},
+        {"key": "concrete_mix_80lb", "Material": "Concrete Mix 80 lb", "Final_Price_USD": 7.5, "Unit_Type": "bag"},
+    ]
+    service = _service_with_list(monkeypatch, _write_price_list(tmp_path / "prices.json", rows))
+
+    assert service._name_to_db_key("Faucet Kitchen") == "faucet_kitchen"
+    assert service._name_to_db_key("kitchen faucets") == "faucet_kitchen"
+    assert service._name_to_db_key("1/2 inch drywall sheets") == 'drywall_1/2"'
+    # Catalog SKUs whose names contain a rule keyword are matched before the rules apply
+    assert service._name_to_db_key("plastic tile spacers 1/8\"") == "tile_spacers_1_8"
+    assert service._name_to_db_key("80lb bags of concrete mix") == "concrete_mix_80lb"
+    # Built-in aliases and rules still cover the rest, unknown names fall through to a slug
+    assert service._name_to_db_key("Thin-Set Mortar") == "thin_set_mortar"
+    assert service._name_to_db_key("ceramic floor tile") == "tile"
+    assert service._name_to_db_key("generic material") == "generic_material"
+
+
+def test_search_materials_ranks_and_paginates():
+    service = EstimationService()
+
+    page = service.search_materials_page("grout", limit=1)
+    assert page["total"] == 2
+    assert page["results"][0]["name"] == "grout"
+    assert page["next_cursor"]
+
+    rest = service.search_materials_page("grout", limit=1, cursor=page["next_cursor"])
+    assert [r["name"] for r in rest["results"]] == ["grout_sealer"]
+    assert rest["next_cursor"] is None
+
+    # Prefix matching on every token, across keys and descriptions
+    assert [r["name"] for r in asyncio.run(service.search_materials("ready mix conc"))] == ["concrete_3000psi"]
+    assert asyncio.run(service.search_materials("nonexistent")) == []
+
+    # Cursors from another index version (or garbage) are rejected, not silently restarted
+    with pytest.raises(ValueError):
+        service.search_materials_page("grout", cursor=encode_cursor(1, service._snapshot.version + 1))
+    with pytest.raises(ValueError):
+        service.search_materials_page("grout", cursor="not-a-cursor")
+
+
+def test_search_index_ranks_every_match_of_broad_queries():
+    materials = {f"tile_{i:05d}": {"price": 1.0, "unit": "sqft"} for i in range(5000)}
+    materials["ti"] = {"price": 2.0, "unit": "sqft", "description": "Tile (generic)"}
+    materials["wall_t_bracket_heavy_duty"] = {"price": 3.0, "unit": "each"}
+    index = MaterialSearchIndex(materials, version=3)
+
+    page = index.search("t", limit=3)
+    assert page["total"] == 5002
+    # An exact key token ranks first although its long key sorts last
+    assert [r["name"] for r in page["results"]] == ["wall_t_bracket_heavy_duty", "ti", "tile_00000"]
+    assert index.search("tile 04999", limit=1)["results"][0]["name"] == "tile_04999"
+
+    # Pages of a broad query line up with one page holding every match
+    everything = [r["name"] for r in index.search("ti 0", limit=5000)["results"]]
+    assert len(everything) == 5000 and everything[0] == "tile_00000"
+    paged, cursor = [], None
+    while True:
+        page = index.search("ti 0", limit=1500, offset=decode_cursor(cursor)[0] if cursor else 0)
+        paged += [r["name"] for r in page["results"]]
+        cursor = page["next_cursor"]
+        if not cursor:
+            break
+    assert paged == everything
+
+
+def test_reload_reparses_only_changed_files_and_swaps_snapshot(tmp_path, monkeypatch):
+    first = _write_price_list(tmp_path / "a.json", {"tile": {"price": 4.0, "unit": "sqft"}})
+    second = _write_price_list(tmp_path / "b.json", {"grout": {"price": 22.0, "unit": "bag"}})
+    monkeypatch.delenv("PRICE_LIST_FILE", raising=False)
+    monkeypatch.setenv("PRICE_LIST_FILES", f"{first},{second}")
+    service = EstimationService()
+    before = service._snapshot
+
+    summary = service.reload_price_lists()
+    assert summary["reparsed_files"] == []
+    assert service._snapshot is before
+
+    _write_price_list(second, {"grout": {"price": 25.0, "unit": "bag"}})
+    os.utime(second, (before.created_at + 5, before.created_at + 5))
+    summary = service.reload_price_lists()
+    assert summary["reparsed_files"] == [str(second)]
+    assert summary["snapshot_version"] == before.version + 1
+    assert service.materials_db["grout"]["price"] == 25.0
+    # Snapshots already handed out are never mutated
+    assert before.materials["grout"]["price"] == 22.0
+
+    reasoning = {"materials_needed": [{"name": "grout", "quantity": 1}], "analysis": {"labor_hours": 8}}
+    estimate = asyncio.run(service.calculate_estimate({}, reasoning, "bathroom"))
+    assert estimate["price_snapshot_version"] == service._snapshot.version
+
+
+def test_streaming_ingest_resolves_aliases_and_counts_bad_rows(tmp_path, monkeypatch):
+    from services import price_lists
+
+    rows = [{"Material": f"Widget {i}", "Final_Price_USD": i + 0.5, "Unit_Type": "each"} for i in range(50)]
+    rows += [{"Material": "Broken", "Final_Price_USD": "n/a"}, {"Material": "No price"}, "not a row"]
+    json_path = _write_price_list(tmp_path / "dump.json", rows)
+    csv_path = tmp_path / "dump.csv"
+    csv_path.write_text(
+        "Material,Final_Price_USD,Unit_Type,Region\nGrout Bag,22.5,bag,Midwest\nBad Row,oops,bag,\n",
+        encoding="utf-8",
+    )
+    # Tiny reads force values to straddle chunk boundaries
+    monkeypatch.setattr(price_lists, "_READ_CHUNK", 7)
+    progress = []
+    monkeypatch.setattr(price_lists, "PROGRESS_EVERY", 20)
+
+    parsed = price_lists.parse_price_file(json_path, progress=lambda path, n: progress.append(n))
+    assert parsed.entries == price_lists.parse_price_file(json_path, progress=lambda *_: None).entries
+    assert len(parsed.entries) == 50
+    assert parsed.names["Widget 7"] in parsed.entries
+    assert parsed.entries[parsed.names["Widget 7"]]["price"] == 7.5
+    assert parsed.ingest_stats()["rows_read"] == 53
+    assert (parsed.rows_loaded, parsed.rows_skipped, parsed.row_errors) == (50, 1, 2)
+    assert progress == [20, 40]
+
+    parsed = price_lists.parse_price_file(csv_path)
+    key = parsed.names["Grout Bag"]
+    assert parsed.regional[(key, "midwest")]["unit"] == "bag"
+    assert (parsed.rows_loaded, parsed.row_errors) == (1, 1)
+
+
+def test_estimates_are_memoized_per_snapshot_version(tmp_path, monkeypatch):
+    path = _write_price_list(tmp_path / "prices.json", {"grout": {"price": 22.0, "unit": "bag"}})
+    service = _service_with_list(monkeypatch, path)
+    reasoning = {"materials_needed": [{"name": "grout", "quantity": 2}], "analysis": {"labor_hours": 8}}
+
+    first = asyncio.run(service.calculate_estimate({}, reasoning, "bathroom", {"region": "midwest"}))
+    first["total_cost"]["amount"] = -1  # callers get their own copy
+    again = asyncio.run(service.calculate_estimate({}, reasoning, "bathroom", {"region": "midwest"}))
+    assert again["total_cost"]["amount"] > 0
+    stats = service._estimate_cache.stats()
+    assert (stats["hits"], stats["misses"]) == (1, 1)
+
+    # A new price snapshot invalidates memoized estimates
+    snapshot = service._snapshot
+    _write_price_list(path, {"grout": {"price": 30.0, "unit": "bag"}})
+    os.utime(path, (snapshot.created_at + 5, snapshot.created_at + 5))
+    service.reload_price_lists()
+    repriced = asyncio.run(service.calculate_estimate({}, reasoning, "bathroom", {"region": "midwest"}))
+    assert repriced["materials"][0]["unit_price"] == 30.0
+    assert repriced["price_snapshot_version"] == snapshot.version + 1
+    assert service._estimate_cache.stats()["misses"] == 2
+
+
+def test_labor_rate_files_index_trade_region_and_effective_date(tmp_path, monkeypatch):
+    rates = tmp_path / "labor.csv"
+    rates.write_text(
+        "Trade,Region,Hourly_Rate_USD,Effective_Date\n"
+        "tile,,58,2024-01-01\n"
+        "tile,West Coast,82,2024-01-01\n"
+        "tile,West Coast,90,2025-07-01\n"
+        "plumbing,Northeast,oops,\n",
+        encoding="utf-8",
+    )
+    monkeypatch.delenv("PRICE_LIST_FILE", raising=False)
+    monkeypatch.delenv("PRICE_LIST_FILES", raising=False)
+    monkeypatch.setenv("LABOR_RATE_FILE", str(rates))
+    service = EstimationService()
+
+    # Regional rows are used as-is; trade-wide rows keep the built-in region multiplier
+    assert service._labor_rate("bathroom", "west", on="2025-01-15") == ("tile", 82.0, 1.0)
+    assert service._labor_rate("bathroom", "west", on="2025-08-01") == ("tile", 90.0, 1.0)
+    assert service._labor_rate("bathroom", "northeast", on="2025-08-01") == ("tile", 58.0, 1.25)
+    # Before any file row takes effect the built-in rate applies
+    assert service._labor_rate("bathroom", "midwest", on="2023-06-01") == ("tile", 55.0, 1.0)
+    assert service._parsed_labor_files[str(rates)].row_errors == 1
+
+    filtered = asyncio.run(service.get_labor_rates("tile,plumbing", region="west", as_of="2025-08-01"))
+    assert filtered["tile"]["rate"] == 90.0 and filtered["tile"]["effective_date"] == "2025-07-01"
+    assert filtered["plumbing"]["rate"] == 75.0 * 1.35
+
+    version = service._labor_table.version
+    rates.write_text("trade,rate\ntile,61\n", encoding="utf-8")
+    os.utime(rates, (time.time() + 5, time.time() + 5))
+    assert service._watched_files_changed()
+    assert service._reload_watched_files() == [str(rates)]
+    assert service._labor_table.version == version + 1
+    assert service._labor_rate("bathroom", "west") == ("tile", 61.0, 1.35)
+
+
+def test_estimates_carry_monte_carlo_cost_range(tmp_path, monkeypatch):
+    service = _service_with_list(monkeypatch, _write_price_list(tmp_path / "prices.json", REGIONAL_ROWS))
+    vision = {"detections": [{"class": "tile", "confidence": 0.7}]}
+    reasoning = {"materials_needed": [{"name": "tile", "quantity": 120}, {"name": "grout", "quantity": 3}], "analysis": {"labor_hours": 16}}
+
+    options = {"region": "midwest", "cost_range": True}
+    estimate = asyncio.run(service.calculate_estimate(vision, reasoning, "bathroom", options))
+    cost_range = estimate["cost_range"]
+    assert cost_range["samples"] == 10000
+    assert cost_range["p10"] < estimate["total_cost"]["amount"] < cost_range["p90"]
+    assert cost_range["p10"] < cost_range["p50"] < cost_range["p90"]
+    for category in ("materials", "labor", "profit", "contingency"):
+        band = cost_range["breakdown"][category]
+        assert band["p10"] <= band["p50"] <= band["p90"]
+    # Every quote reuses the same draws, so ranges are reproducible
+    service._estimate_cache.clear()
+    again = asyncio.run(service.calculate_estimate(vision, reasoning, "bathroom", options))
+    assert again["cost_range"] == cost_range
+
+    # Opt-in: no simulation unless asked for
+    off = asyncio.run(service.calculate_estimate(vision, reasoning, "bathroom", {"region": "midwest"}))
+    assert off["cost_range"] is None
+
+    # The batch API simulates every opted-in job at once, with the same ranges
+    other = {**reasoning, "analysis": {"labor_hours": 40}}
+    batch = service.calculate_estimates_batch([
+        {"vision_results": vision, "reasoning": reasoning, "project_type": "bathroom", "options": options},
+        {"vision_results": vision, "reasoning": reasoning, "project_type": "bathroom", "options": {"region": "midwest"}},
+        {"vision_results": vision, "reasoning": other, "project_type": "bathroom", "options": options},
+    ])
+    assert batch[0]["cost_range"] == cost_range and batch[1]["cost_range"] is None
+    assert batch[2]["cost_range"]["p50"] > cost_range["p50"]
+    assert batch[2] == asyncio.run(service.calculate_estimate(vision, other, "bathroom", options))
+
+    import services.cost_simulation as simulation_module
+    monkeypatch.setattr(simulation_module, "np", None)
+    service._estimate_cache.clear()
+    assert asyncio.run(service.calculate_estimate(vision, reasoning, "bathroom", options))["cost_range"] is None
+
+
+def test_price_history_answers_as_of_queries(tmp_path, monkeypatch):
+    path = tmp_path / "prices.json"
+    history_file = tmp_path / "history.jsonl"
+    monkeypatch.setenv("PRICE_HISTORY_FILE", str(history_file))
+    # Regional rows first: the last row for a key also sets its flat price
+    _write_price_list(path, [
+        {"key": "tile", "Final_Price_USD": 4.40, "Unit_Type": "sqft", "Region": "Northeast", "Updated": "2025-01-10"},
+        {"key": "tile", "Final_Price_USD": 4.00, "Unit_Type": "sqft", "Updated": "2025-01-10"},
+    ])
+    service = _service_with_list(monkeypatch, path)
+    snapshot = service._snapshot
+    _write_price_list(path, [
+        {"key": "tile", "Final_Price_USD": 5.50, "Unit_Type": "sqft", "Region": "Northeast", "Updated": "2025-06-01"},
+        {"key": "tile", "Final_Price_USD": 5.00, "Unit_Type": "sqft", "Updated": "2025-06-01"},
+    ])
+    os.utime(path, (snapshot.created_at + 5, snapshot.created_at + 5))
+    service.reload_price_lists()
+
+    assert service.lookup_price("tile")["price"] == 5.00
+    old = service.lookup_price("tile", as_of="2025-03-01")
+    assert (old["price"], old["source"], old["effective_date"]) == (4.00, "price-history", "2025-01-10")
+    assert service.lookup_price("tile", region="northeast", as_of="2025-03-01")["price"] == 4.40
+    assert [e["price"] for e in service.price_history("tile")["timeline"]] == [4.00, 5.00]
+
+    reasoning = {"materials_needed": [{"name": "tile", "quantity": 10}], "analysis": {"labor_hours": 8}}
+    then = asyncio.run(service.calculate_estimate({}, reasoning, "bathroom", {"region": "northeast"}, as_of="2025-03-01"))
+    now = asyncio.run(service.calculate_estimate({}, reasoning, "bathroom", {"region": "northeast"}))
+    assert (then["materials"][0]["unit_price"], then["priced_as_of"]) == (4.40, "2025-03-01")
+    assert (now["materials"][0]["unit_price"], now["priced_as_of"]) == (5.50, None)
+    batch = service.calculate_estimates_batch([
+        {"reasoning": reasoning, "project_type": "bathroom", "options": {"region": "northeast", "as_of": "2025-03-01"}},
+        {"reasoning": reasoning, "project_type": "bathroom", "options": {"region": "northeast"}},
+    ])
+    assert [b["materials"][0]["unit_price"] for b in batch] == [4.40, 5.50]
+
+    # The history file is append-only and survives restarts without duplicating rows
+    rows = history_file.read_text(encoding="utf-8").splitlines()
+    assert len(rows) == 4
+    restarted = _service_with_list(monkeypatch, path)
+    assert restarted.lookup_price("tile", as_of="2025-03-01")["price"] == 4.00
+    assert len(history_file.read_text(encoding="utf-8").splitlines()) == 4
+
+
+def test_background_watcher_reloads_changed_file(tmp_path, monkeypatch):
+    from services.price_list_watcher import PriceListWatcher
+
+    path = _write_price_list(tmp_path / "prices.json", {"tile": {"price": 4.0, "unit": "sqft"}})
+    service = _service_with_list(monkeypatch, path)
+
+    async def scenario():
+        watcher = PriceListWatcher(service, debounce_sec=0.01, poll_interval_sec=0.02, use_notify=False)
+        watcher.start()
+        assert service._background_reload
+        _write_price_list(path, {"tile": {"price": 7.5, "unit": "sqft"}})
+        os.utime(path, (time.time() + 5, time.time() + 5))
+        for _ in range(100):
+            if watcher.reload_count:
+                break
+            await asyncio.sleep(0.02)
+        await watcher.stop()
+        return watcher.status()
+
+    status = asyncio.run(scenario())
+    assert status["reload_count"] >= 1
+    assert status["last_reparsed_files"] == [str(path)]
+    assert status["last_error"] is None
+    assert service.materials_db["tile"]["price"] == 7.5
+    assert not service._background_reload
+
+
+def test_compiled_catalog_is_mapped_by_new_workers(tmp_path, monkeypatch):
+    path = _write_price_list(tmp_path / "prices.json", REGIONAL_ROWS + [
+        {"Material": "Faucet Kitchen", "Final_Price_USD": 180.0, "Unit_Type": "each", "Category": "Plumbing"},
+    ])
+    catalog = tmp_path / "catalog.bin"
+    monkeypatch.setenv("PRICE_CATALOG_FILE", str(catalog))
+    compiled = _service_with_list(monkeypatch, path)
+    assert compiled._snapshot.source == "parsed"
+    assert catalog.exists()
+
+    mapped = EstimationService()
+    assert mapped._snapshot.source == "catalog"
+    # Lazy indexes are built by the startup warm-up, not the first request
+    assert "search_index" not in mapped._snapshot.__dict__
+    mapped.warm_price_snapshot()
+    assert {"resolver", "search_index", "regional_prices"} <= mapped._snapshot.__dict__.keys()
+    assert dict(mapped.materials_db) == dict(compiled.materials_db)
+    assert mapped.lookup_price("tile", region="west") == compiled.lookup_price("tile", region="west")
+    assert mapped.lookup_price("kitchen faucets")["key"] == "faucet_kitchen"
+    assert mapped.lookup_price("faucet_kitchen")["source"] == "external-list"
+    assert mapped.lookup_price("paint")["source"] == "local"
+
+    reasoning = {"materials_needed": [{"name": "tile", "quantity": 10}], "analysis": {"labor_hours": 8}}
+    a = asyncio.run(compiled.calculate_estimate({}, reasoning, "bathroom", {"region": "northeast"}))
+    b = asyncio.run(mapped.calculate_estimate({}, reasoning, "bathroom", {"region": "northeast"}))
+    assert a["total_cost"] == b["total_cost"]
+
+    # A changed source file makes the catalog stale
+    os.utime(path, (time.time() + 5, time.time() + 5))
+    assert mapped._price_lists_changed()
+    assert EstimationService()._snapshot.source == "parsed"
+
+
+def test_warming_a_mapped_catalog_reads_indexes_in_place(tmp_path, monkeypatch):
+    from services import price_catalog
+
+    rows = [
+        {"key": f"stud_steel_{i}", "Material": f"Steel Stud {i}", "Final_Price_USD": 3.0 + i % 7,
+         "Unit_Type": "each", "Category": "Framing", "Region": ("Midwest", "West Coast")[i % 2]}
+        for i in range(5000)
+    ]
+    path = _write_price_list(tmp_path / "prices.json", rows)
+    monkeypatch.setenv("PRICE_CATALOG_FILE", str(tmp_path / "catalog.bin"))
+    compiled = _service_with_list(monkeypatch, path)
+    mapped = EstimationService()
+    assert mapped._snapshot.source == "catalog"
+
+    reads = []
+    monkeypatch.setattr(price_catalog._Table, "record", lambda self, i: reads.append(i))
+    tracemalloc.start()
+    mapped.warm_price_snapshot()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    monkeypatch.undo()
+
+    # No record is read and nothing proportional to the catalog is allocated
+    assert reads == []
+    assert peak < 64 * 1024
+    snap = mapped._snapshot
+    assert isinstance(snap.search_index.tables["key_docs"], memoryview)
+    assert isinstance(snap.resolver.tables["gram_cands"], memoryview)
+
+    assert snap.search_index.search("stud 12", limit=5) == compiled._snapshot.search_index.search("stud 12", limit=5)
+    assert snap.resolver.resolve("steel studs 42") == compiled._snapshot.resolver.resolve("steel studs 42")
+    assert snap.regional_prices["stud_steel_3"] == compiled._snapshot.regional_prices["stud_steel_3"]
+    assert "missing" not in snap.regional_prices
+
+
+def _fixture_jobs():
+    fixtures_dir = os.path.join(os.path.dirname(__file__), "fixtures")
+    reasoning = {
+        "materials_needed": [
+            {"name": "Ceramic floor tile", "quantity": 120, "unit": "sqft"},
+            {"name": "grout", "quantity": "3 25lb bags"},
+            {"name": "generic_material", "quantity": 7.5},
+        ],
+        "analysis": {"labor_hours": 22},
+    }
+    jobs = []
+    for i, fname in enumerate(sorted(os.listdir(fixtures_dir))):
+        with open(os.path.join(fixtures_dir, fname), "r", encoding="utf-8") as f:
+            vision = json.load(f)
+        options = [{}, {"quality": "premium", "region": "west"}, {"profit_pct": 22, "contingency_pct": 10, "region": "south"}][i % 3]
+        jobs.append({
+            "vision_results": vision,
+            "reasoning": reasoning,
+            "project_type": fname.split("_")[0],
+            "options": options,
+        })
+    jobs.append({"vision_results": {}, "reasoning": {}, "project_type": "kitchen"})
+    return jobs
+
+
+def test_batch_estimates_match_scalar_path(tmp_path, monkeypatch):
+    service = _service_with_list(monkeypatch, _write_price_list(tmp_path / "prices.json", REGIONAL_ROWS))
+    jobs = _fixture_jobs()
+
+    batch = service.calculate_estimates_batch(jobs)
+    scalar = [
+        asyncio.run(service.calculate_estimate(j["vision_results"], j["reasoning"], j["project_type"], j.get("options")))
+        for j in jobs
+    ]
+    assert batch == scalar
+    assert service.calculate_estimates_batch([]) == []
+
+    # Without NumPy the batch API loops over jobs and gives the same answer
+    import services.estimation_service as estimation_module
+    monkeypatch.setattr(estimation_module, "np", None)
+    assert service.calculate_estimates_batch(jobs) == scalar
+
+
+def test_pricing_matrix_matches_scalar_estimates(tmp_path, monkeypatch):
+    service = _service_with_list(monkeypatch, _write_price_list(tmp_path / "prices.json", REGIONAL_ROWS))
+    job = _fixture_jobs()[0]
+    grid = {
+        "quality": ["standard", "luxury"],
+        "region": ["midwest", "west", "northeast"],
+        "contingency_pct": [0, 7.5],
+        "profit_pct": [10, 15, 60],
+    }
+
+    def check(matrix):
+        assert matrix["axes"]["profit_pct"] == [10.0, 15.0, 50.0]  # clamped like the scalar path
+        for qi, quality in enumerate(grid["quality"]):
+            for ri, region in enumerate(grid["region"]):
+                for ci, contingency in enumerate(grid["contingency_pct"]):
+                    for pi, profit in enumerate(grid["profit_pct"]):
+                        options = {"quality": quality, "region": region, "contingency_pct": contingency, "profit_pct": profit}
+                        est = asyncio.run(service.calculate_estimate(job["vision_results"], job["reasoning"], job["project_type"], options))
+                        assert matrix["totals"][qi][ri][ci][pi] == est["total_cost"]["amount"]
+                        assert matrix["materials"][qi][ri] == est["total_cost"]["breakdown"]["materials"]
+
+    check(service.calculate_pricing_matrix(job["vision_results"], job["reasoning"], job["project_type"], grid))
+
+    import services.estimation_service as estimation_module
+    monkeypatch.setattr(estimation_module, "np", None)
+    check(service.calculate_pricing_matrix(job["vision_results"], job["reasoning"], job["project_type"], grid))
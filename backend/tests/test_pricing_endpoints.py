@@ -0,0 +1,48 @@
+import importlib
+
+import pytest
+from fastapi.testclient import TestClient
+
+REASONING = {"materials_needed": [{"name": "tile", "quantity": 10}], "analysis": {"labor_hours": 8}}
+
+
+@pytest.fixture
+def api(tmp_path, monkeypatch):
+    """(app module, client) with authentication bypassed."""
+    monkeypatch.chdir(tmp_path)
+    app_module = importlib.import_module("app")
+    app_module.app.dependency_overrides[app_module.get_current_user] = lambda: object()
+    yield app_module, TestClient(app_module.app)
+    app_module.app.dependency_overrides.clear()
+
+
+def test_invalid_as_of_option_is_rejected_instead_of_priced_today(api):
+    _, client = api
+    job = {"reasoning": REASONING, "project_type": "bathroom", "options": {"as_of": "last tuesday"}}
+
+    for path, body in (("/v1/estimates/batch", {"jobs": [job]}), ("/v1/estimates/matrix", job)):
+        r = client.post(path, json=body)
+        assert r.status_code == 400, path
+        assert "as_of must be an ISO date" in r.json()["detail"]
+
+    job["options"]["as_of"] = "2025-03-01"
+    r = client.post("/v1/estimates/batch", json={"jobs": [job]})
+    assert r.status_code == 200
+    assert r.json()["results"][0]["priced_as_of"] == "2025-03-01"
+
+
+def test_labor_rates_accept_the_same_as_of_values_as_material_lookups(api):
+    _, client = api
+    for value in ("2025-08-01", "2025-08-01T00:00:00Z", "2025-08-01 late"):
+        assert client.get("/v1/pricing/lookup", params={"key": "tile", "as_of": value}).status_code == 200, value
+        assert client.get("/v1/labor/rates", params={"trade": "tile", "as_of": value}).status_code == 200, value
+    assert client.get("/v1/labor/rates", params={"as_of": "08/01/2025"}).status_code == 400
+
+
+def test_reprice_worker_count_is_bounded(api, monkeypatch):
+    app_module, client = api
+    monkeypatch.setattr(app_module, "ADMIN_API_TOKEN", "admin")
+    headers = {"X-Admin-Token": "admin"}
+    for workers in (0, -1, app_module.MAX_REPRICE_WORKERS + 1, 10_000):
+        r = client.post("/v1/admin/reprice", json={"workers": workers}, headers=headers)
+        assert r.status_code == 422, workers
@@ -0,0 +1,97 @@
+import asyncio
+import threading
+import time
+
+from services.estimation_service import EstimationService
+from services.pricing_service import PricingBackend, PricingService, SQLPricingBackend
+
+
+class _SlowBackend(PricingBackend):
+    name = "slow"
+
+    def __init__(self):
+        self.calls = []
+
+    def fetch_prices(self, keys):
+        self.calls.append(list(keys))
+        time.sleep(0.05)
+        return {k: {"price": 1.0, "unit": "each"} for k in keys if k != "unknown"}
+
+
+def test_sql_backend_prices_a_quote_in_one_call(tmp_path, monkeypatch):
+    monkeypatch.delenv("PRICE_LIST_FILE", raising=False)
+    monkeypatch.delenv("PRICE_LIST_FILES", raising=False)
+    backend = SQLPricingBackend(str(tmp_path / "prices.db"))
+    backend.upsert_prices([{"key": "tile", "price": 7.25, "unit": "sqft"}, {"key": "grout", "price": 30.0, "unit": "bag"}])
+    service = EstimationService()
+    service.pricing = PricingService(backend)
+    reasoning = {
+        "materials_needed": [
+            {"name": "tile", "quantity": 10},
+            {"name": "grout", "quantity": 1},
+            {"name": "thinset", "quantity": 2},
+        ],
+        "analysis": {"labor_hours": 8},
+    }
+
+    estimate = asyncio.run(service.calculate_estimate({}, reasoning, "bathroom"))
+    prices = [m["unit_price"] for m in estimate["materials"]]
+    assert prices[:2] == [7.25, 30.0]
+    # Keys missing from the backend fall back to the price lists
+    assert prices[2] == service.materials_db[service._name_to_db_key("thinset")]["price"]
+
+    stats = service.pricing.stats()
+    assert stats["backend_calls"] == 1
+    # The missing key is negatively cached, so a repeat lookup does not hit the backend
+    assert service.lookup_price(service._name_to_db_key("thinset"))["source"] != "external"
+    assert service.lookup_price("tile")["source"] == "external"
+    assert service.pricing.stats()["backend_calls"] == 1
+
+
+def test_concurrent_lookups_share_one_backend_fetch():
+    backend = _SlowBackend()
+    pricing = PricingService(backend)
+    results = []
+
+    def worker():
+        results.append(pricing.get_prices(["tile", "grout", "unknown"]))
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(backend.calls) == 1
+    assert all(r == {"tile": {"price": 1.0, "unit": "each"}, "grout": {"price": 1.0, "unit": "each"}} for r in results)
+    assert pricing.get_price("unknown") is None
+    assert len(backend.calls) == 1
+    stats = pricing.stats()
+    assert stats["backend_calls"] == 1 and stats["backend_keys"] == 3
+    assert stats["coalesced_keys"] <= 3 * (len(threads) - 1)
+
+
+def test_estimate_waits_for_pricing_backend_off_the_event_loop():
+    backend = _SlowBackend()
+    service = EstimationService()
+    service.pricing = PricingService(backend)
+    reasoning = {"materials_needed": [{"name": "tile", "quantity": 10}], "analysis": {"labor_hours": 8}}
+
+    async def main():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.005)
+                ticks += 1
+
+        task = asyncio.create_task(ticker())
+        estimate = await service.calculate_estimate({}, reasoning, "bathroom", {"region": "west"})
+        task.cancel()
+        return estimate, ticks
+
+    estimate, ticks = asyncio.run(main())
+    assert estimate["materials"][0]["unit_price"] == 1.0
+    # The loop kept running while the 50 ms backend fetch was in flight
+    assert ticks >= 3
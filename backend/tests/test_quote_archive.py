@@ -0,0 +1,123 @@
+import asyncio
+import gzip
+import json
+from datetime import datetime, timedelta, timezone
+
+from database.archive import QuoteArchive
+from database.db import ARCHIVED_COLUMNS, DatabaseService
+
+
+def _service(database_url, tmp_path, monkeypatch):
+    monkeypatch.setenv("QUOTE_ARCHIVE_DIR", str(tmp_path / "archive"))
+    db = DatabaseService(database_url=database_url)
+    now = datetime.now(timezone.utc)
+    for i, age in enumerate([400, 400, 200, 1]):
+        assert asyncio.run(db.save_quote({
+            "id": f"q{i}", "user_id": "u1", "project_type": "kitchen", "image_path": "",
+            "scope": {"rooms": i}, "phases": [{"name": "demo"}],
+            "vision_results": {"detections": [{"class": "tile"}] * 5},
+            "reasoning": {"raw_response": "Replace tile. " * 20},
+            "estimate": {"total_cost": {"amount": 100 + i}},
+            "status": "completed",
+            "created_at": now - timedelta(days=age),
+        }))
+    # Last touched when created
+    with db.backend.connection() as conn, conn:
+        conn.execute("UPDATE quotes SET updated_at = created_at")
+    return db
+
+
+def _stub(db, quote_id):
+    with db.backend.connection() as conn:
+        return dict(conn.execute("SELECT * FROM quotes WHERE id = ?", (quote_id,)).fetchone())
+
+
+def test_old_quotes_become_stubs_and_rehydrate(database_url, tmp_path, monkeypatch):
+    db = _service(database_url, tmp_path, monkeypatch)
+    before = {f"q{i}": asyncio.run(db.get_quote(f"q{i}")).to_dict() for i in range(4)}
+    # q2 is old but was updated recently, so it stays hot
+    assert asyncio.run(db.update_quote("q2", {"status": "revised"}))
+
+    stats = db.archive_quotes(older_than_days=90, batch_size=1, pause_sec=0)
+    assert stats["rows"] == 2 and stats["skipped"] == 0 and stats["bytes_moved"] > 0
+    assert len(stats["partitions"]) >= 1
+    stub = _stub(db, "q0")
+    assert all(stub[c] is None for c in ARCHIVED_COLUMNS) and stub["archive_ref"]
+    assert stub["status"] == "completed" and stub["total_amount"] == 100.0
+    assert _stub(db, "q2")["archive_ref"] is None and _stub(db, "q3")["archive_ref"] is None
+
+    quote = asyncio.run(db.get_quote("q0"))
+    assert quote["archive_ref"] == stub["archive_ref"]
+    assert all(quote[k] == v for k, v in before["q0"].items() if k not in ("archive_ref", "archived_at"))
+    listed = {q["id"]: q for q in asyncio.run(db.list_quotes(10, 0, user_id="u1"))}
+    assert listed["q1"]["reasoning"] == before["q1"]["reasoning"]
+    assert db.fetch_quotes_after(None, 10)[0]["estimate"] == {"total_cost": {"amount": 100}}
+    assert db.archive_quotes(older_than_days=90, pause_sec=0)["rows"] == 0
+
+    # Values written after archiving win over the archived record
+    assert asyncio.run(db.update_quote("q0", {"estimate": {"total_cost": {"amount": 5}}}))
+    quote = asyncio.run(db.get_quote("q0"))
+    assert quote["estimate"] == {"total_cost": {"amount": 5}} and quote["scope"] == {"rooms": 0}
+    db.close()
+
+
+def test_archive_files_are_plain_ndjson_with_an_index(tmp_path):
+    archive = QuoteArchive(tmp_path, compression="gzip")
+    refs = archive.append([
+        {"id": "a", "created_at": "2024-03-05T10:00:00+00:00", "estimate": {"n": 1}},
+        {"id": "b", "created_at": "2024-03-20T10:00:00+00:00", "estimate": {"n": 2}},
+        {"id": "c", "created_at": None},
+    ])
+    refs.update(archive.append([{"id": "d", "created_at": "2024-03-31T23:59:59"}]))
+    assert refs["a"].startswith("2024/quotes-2024-03.ndjson.gz:0:")
+    assert refs["c"].startswith("unknown/")
+    assert archive.read(refs["d"])["id"] == "d" and archive.read(refs["b"])["estimate"] == {"n": 2}
+
+    # The partition is a multi-member gzip file of NDJSON lines (zcat | jq works)
+    partition = tmp_path / "2024" / "quotes-2024-03.ndjson.gz"
+    lines = gzip.decompress(partition.read_bytes()).decode("utf-8").splitlines()
+    assert [json.loads(line)["id"] for line in lines] == ["a", "b", "d"]
+    index = (tmp_path / "2024" / "quotes-2024-03.ndjson.gz.idx").read_text().splitlines()
+    assert [line.split("\t")[0] for line in index] == ["a", "b", "d"]
+    assert refs["d"].endswith(":".join(index[2].split("\t")[1:]))
+    # Records appended together share a block; the index points into it
+    a, b = (index[i].split("\t") for i in (0, 1))
+    assert a[1:3] == b[1:3] and a[3] == "0" and int(b[3]) > 0
+    assert refs["b"].endswith(":".join(b[1:]))
+
+
+def test_archive_blocks_compress_records_together(tmp_path, monkeypatch):
+    from database import archive as archive_module
+
+    monkeypatch.setattr(archive_module, "BLOCK_BYTES", 4096)
+    archive = QuoteArchive(tmp_path, compression="gzip")
+    records = [
+        {"id": f"q{i}", "created_at": "2024-05-01", "reasoning": {"raw_response": f"Replace tile in room {i}. " * 5}}
+        for i in range(200)
+    ]
+    refs = archive.append(records)
+    assert all(archive.read(refs[r["id"]]) == r for r in records)
+
+    # Blocks stay under BLOCK_BYTES, so there are several, each holding many records
+    blocks = {ref.split(":")[1] for ref in refs.values()}
+    assert 1 < len(blocks) < len(records) // 10
+    partition = (tmp_path / "2024" / "quotes-2024-05.ndjson.gz").read_bytes()
+    one_per_frame = sum(len(archive._compress(json.dumps(r, separators=(",", ":")).encode() + b"\n")) for r in records)
+    assert len(partition) * 4 < one_per_frame
+
+    # References written with one record per frame (no line offset) still read
+    legacy = archive._compress(b'{"id":"old","created_at":"2024-05-02"}\n')
+    offset = len(partition)
+    with open(tmp_path / "2024" / "quotes-2024-05.ndjson.gz", "ab") as f:
+        f.write(legacy)
+    assert archive.read(f"2024/quotes-2024-05.ndjson.gz:{offset}:{len(legacy)}")["id"] == "old"
+
+
+def test_missing_archive_leaves_the_stub(database_url, tmp_path, monkeypatch):
+    db = _service(database_url, tmp_path, monkeypatch)
+    db.archive_quotes(older_than_days=300, pause_sec=0)
+    for path in (tmp_path / "archive").rglob("*.ndjson.*"):
+        path.unlink()
+    quote = asyncio.run(db.get_quote("q0"))
+    assert quote["status"] == "completed" and quote["reasoning"] is None
+    db.close()
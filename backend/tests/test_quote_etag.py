@@ -0,0 +1,65 @@
+import asyncio
+import importlib
+from datetime import datetime, timezone
+
+import pytest
+from fastapi.testclient import TestClient
+
+from database.db import DatabaseService
+from services.ttl_cache import TTLCache
+
+
+@pytest.fixture
+def api(database_url, tmp_path, monkeypatch):
+    """(app module, DatabaseService, client) with quotes on the database under test."""
+    monkeypatch.chdir(tmp_path)
+    # A long interval keeps queued updates queued until the test flushes them
+    monkeypatch.setenv("DB_WRITE_BEHIND_MS", "60000")
+    app_module = importlib.import_module("app")
+    db = DatabaseService(database_url=database_url)
+    cache = TTLCache(max_size=16, ttl_sec=600)
+    db.on_quote_change(cache.invalidate)
+    monkeypatch.setattr(app_module, "db_service", db)
+    monkeypatch.setattr(app_module, "quote_response_cache", cache)
+    asyncio.run(db.save_quote({
+        "id": "q1", "user_id": "u1", "project_type": "kitchen", "image_path": "",
+        "vision_results": {}, "reasoning": {}, "estimate": {"total_cost": {"amount": 100.0}},
+        "status": "processing", "created_at": datetime.now(timezone.utc),
+    }))
+    yield app_module, db, TestClient(app_module.app)
+    db.close()
+
+
+def test_quote_etag_revalidation_and_invalidation(api):
+    app_module, db, client = api
+
+    first = client.get("/v1/quotes/q1")
+    assert first.status_code == 200
+    etag = first.headers["ETag"]
+    assert etag.startswith('W/"') and first.json()["total_cost"]["amount"] == 100.0
+    assert app_module.quote_response_cache.get("q1") is not None
+
+    # Unchanged quote: 304 with the same ETag, also for the strong form of the tag
+    for header in (etag, etag[2:], f'W/"other", {etag}'):
+        r = client.get("/v1/quotes/q1", headers={"If-None-Match": header})
+        assert (r.status_code, r.headers["ETag"], r.content) == (304, etag, b"")
+
+    # A direct update drops the cached response and changes the ETag
+    assert asyncio.run(db.update_quote("q1", {"estimate": {"total_cost": {"amount": 250.0}}}))
+    assert app_module.quote_response_cache.get("q1") is None
+    r = client.get("/v1/quotes/q1", headers={"If-None-Match": etag})
+    assert r.status_code == 200 and r.json()["total_cost"]["amount"] == 250.0
+    assert r.headers["ETag"] != etag
+    etag = r.headers["ETag"]
+
+    # So does a queued (write-behind) update, before it is committed
+    asyncio.run(db.queue_quote_update("q1", {"status": "completed"}))
+    r = client.get("/v1/quotes/q1", headers={"If-None-Match": etag})
+    assert r.status_code == 200 and r.json()["status"] == "completed"
+    assert r.headers["ETag"] != etag
+    etag = r.headers["ETag"]
+
+    # Committing it does not change what the client has
+    assert asyncio.run(db.flush_quote_updates()) == 1
+    assert client.get("/v1/quotes/q1", headers={"If-None-Match": etag}).status_code == 304
+    assert client.get("/v1/quotes/missing").status_code == 404
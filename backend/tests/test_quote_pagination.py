@@ -0,0 +1,102 @@
+import asyncio
+import json
+import pickle
+import sqlite3
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from database.db import MIGRATIONS, SUMMARY_COLUMNS, DatabaseService
+
+
+def _seed(db, count):
+    start = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    for i in range(count):
+        asyncio.run(db.save_quote({
+            "id": f"quote_{i:03d}",
+            "user_id": "u1" if i % 5 else "u2",
+            "project_type": "kitchen" if i % 2 else "bathroom",
+            "image_path": "",
+            "vision_results": {},
+            "reasoning": {},
+            "estimate": {"total_cost": {"amount": 1000 + i}},
+            "status": "completed",
+            # Pairs of quotes share a timestamp, so the id tie-breaker matters
+            "created_at": start + timedelta(minutes=i // 2),
+        }))
+
+
+def _all_pages(db, limit, **filters):
+    ids, cursor, pages = [], None, 0
+    while True:
+        page = asyncio.run(db.list_quotes_page(limit, cursor, **filters))
+        ids.extend(q["id"] for q in page["quotes"])
+        pages += 1
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return ids, pages
+
+
+def test_cursor_pages_match_offset_order_without_gaps(database_url):
+    db = DatabaseService(database_url=database_url)
+    _seed(db, 40)
+
+    expected = [q["id"] for q in asyncio.run(db.list_quotes(100, 0, user_id="u1"))]
+    ids, pages = _all_pages(db, 7, user_id="u1")
+    assert ids == expected and len(ids) == 32
+    assert pages == 5
+    assert ids[:2] == ["quote_039", "quote_038"]
+
+    kitchen, _ = _all_pages(db, 4, user_id="u1", project_type="kitchen")
+    assert kitchen == [q for q in expected if int(q[-3:]) % 2]
+
+    with pytest.raises(ValueError):
+        asyncio.run(db.list_quotes_page(5, "not-a-cursor", user_id="u1"))
+
+
+def test_migrations_add_indexes_to_existing_databases_once(tmp_path):
+    path = tmp_path / "legacy.db"
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE quotes (id TEXT PRIMARY KEY, user_id TEXT, project_type TEXT, scope TEXT, "
+                 "phases TEXT, risks TEXT, image_path TEXT, vision_results TEXT, reasoning TEXT, "
+                 "estimate TEXT, status TEXT, created_at TEXT, updated_at TEXT)")
+    conn.execute("INSERT INTO quotes (id, user_id, estimate, created_at) VALUES ('old', 'u1', ?, '2024-01-01')",
+                 (json.dumps({"total_cost": {"amount": 321.5}}),))
+    conn.commit()
+    conn.close()
+
+    DatabaseService(str(path))
+    db = DatabaseService(str(path))
+    with db._pool.connection() as conn:
+        assert conn.execute("PRAGMA user_version").fetchone()[0] == len(MIGRATIONS)
+        indexes = {row["name"] for row in conn.execute("PRAGMA index_list(quotes)")}
+        plan = conn.execute(
+            "EXPLAIN QUERY PLAN SELECT * FROM quotes WHERE user_id = ? AND (created_at, id) < (?, ?) "
+            "ORDER BY created_at DESC, id DESC LIMIT 10",
+            ("u1", "2025", "q"),
+        ).fetchall()
+    assert {"idx_quotes_user_created", "idx_quotes_user_type_created"} <= indexes
+    # Existing rows get their total backfilled from the estimate JSON
+    assert asyncio.run(db.list_quotes(5, 0, user_id="u1", summary=True))[0]["total_amount"] == 321.5
+    assert "idx_quotes_user_created" in plan[0]["detail"] and "TEMP B-TREE" not in str([tuple(r) for r in plan])
+
+
+def test_summary_view_reads_light_columns_and_rows_decode_lazily(database_url):
+    db = DatabaseService(database_url=database_url)
+    _seed(db, 6)
+    asyncio.run(db.update_quote("quote_004", {"estimate": {"total_cost": {"amount": 42.0}}}))
+
+    summaries = asyncio.run(db.list_quotes(3, 0, user_id="u1", summary=True))
+    assert [set(q) for q in summaries] == [set(SUMMARY_COLUMNS)] * 3
+    assert [q["total_amount"] for q in summaries] == [42.0, 1003.0, 1002.0]
+    page = asyncio.run(db.list_quotes_page(2, None, user_id="u1", summary=True))
+    assert set(page["quotes"][0]) == set(SUMMARY_COLUMNS) and page["next_cursor"]
+
+    quote = asyncio.run(db.get_quote("quote_003"))
+    assert quote["status"] == "completed"
+    assert not quote.is_decoded("estimate") and not quote.is_decoded("reasoning")
+    assert quote["estimate"]["total_cost"]["amount"] == 1003
+    assert quote.is_decoded("estimate") and not quote.is_decoded("reasoning")
+    # Rows behave like dicts and survive pickling (re-pricing sends them to worker processes)
+    clone = pickle.loads(pickle.dumps(quote))
+    assert clone == quote.to_dict() and clone.get("missing") is None
@@ -0,0 +1,88 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from database.db import DatabaseService
+from database.search import match_expression, owner_token, search_fields
+
+
+def _save(db, quote_id, user_id="u1", project_type="bathroom", scope=None, description="", materials=(), scene=""):
+    assert asyncio.run(db.save_quote({
+        "id": quote_id, "user_id": user_id, "project_type": project_type, "image_path": "",
+        "description": description, "scope": scope,
+        "vision_results": {"scene_description": scene},
+        "reasoning": {},
+        "estimate": {"materials": [{"name": m, "quantity": 1} for m in materials], "total_cost": {"amount": 10}},
+        "status": "completed",
+        "created_at": datetime.now(timezone.utc) - timedelta(days=400),
+    }))
+
+
+def _ids(db, query, user_id="u1", **kwargs):
+    return [q["id"] for q in asyncio.run(db.search_quotes(user_id, query, **kwargs))["quotes"]]
+
+
+def test_search_ranks_one_users_quotes(database_url, tmp_path, monkeypatch):
+    monkeypatch.setenv("QUOTE_ARCHIVE_DIR", str(tmp_path / "archive"))
+    monkeypatch.setenv("DB_WRITE_BEHIND_MS", "60000")
+    db = DatabaseService(database_url=database_url)
+    _save(db, "q_scope", scope={"summary": "Replace shower tile and regrout"}, materials=["Thinset"])
+    _save(db, "q_scene", scene="Bathroom with cracked tile floor", materials=["Grout sealer"])
+    _save(db, "q_desc", project_type="kitchen", description="Kitchen backsplash, subway tiles", materials=["Adhesive"])
+    _save(db, "q_other", user_id="u2", scope="Tile the hallway")
+
+    page = asyncio.run(db.search_quotes("u1", "tile"))
+    assert [q["id"] for q in page["quotes"]][-1] == "q_scene" and len(page["quotes"]) == 3
+    assert page["next_offset"] is None
+    top = page["quotes"][0]
+    assert top["score"] >= page["quotes"][-1]["score"] and top["total_amount"] == 10.0
+    assert all("[" in q["snippet"] and owner_token("u1") not in q["snippet"] for q in page["quotes"])
+    assert _ids(db, "tile", project_type="kitchen") == ["q_desc"]
+    assert _ids(db, "grou") == ["q_scene"]
+    assert _ids(db, "TILE shower!") == ["q_scope"]
+    assert _ids(db, "tile", user_id="u2") == ["q_other"]
+
+    first = asyncio.run(db.search_quotes("u1", "tile", limit=2))
+    assert len(first["quotes"]) == 2 and first["next_offset"] == 2
+    rest = asyncio.run(db.search_quotes("u1", "tile", limit=2, offset=2))
+    assert [q["id"] for q in first["quotes"] + rest["quotes"]] == [q["id"] for q in page["quotes"]]
+
+    # Updates (direct, queued and archived quotes) and deletes keep the index current
+    assert asyncio.run(db.update_quote("q_scope", {"estimate": {"materials": [{"name": "Epoxy grout"}]}}))
+    assert _ids(db, "epoxy") == ["q_scope"] and _ids(db, "thinset") == []
+    asyncio.run(db.queue_quote_update("q_desc", {"vision_results": {"scene_description": "Galley kitchen"}}))
+    assert asyncio.run(db.flush_quote_updates()) == 1
+    assert _ids(db, "galley") == ["q_desc"]
+    with db.backend.connection() as conn, conn:
+        conn.execute("UPDATE quotes SET updated_at = created_at")
+    assert db.archive_quotes(older_than_days=30, pause_sec=0)["rows"] == 4
+    assert _ids(db, "shower") == ["q_scope"]
+    assert asyncio.run(db.delete_quote("q_scope"))
+    assert _ids(db, "shower") == []
+
+    with pytest.raises(ValueError):
+        asyncio.run(db.search_quotes("u1", " ?! "))
+
+    # Quotes saved before the index existed are picked up by reindex_quotes
+    with db.backend.connection() as conn, conn:
+        conn.execute("DELETE FROM quote_search")
+    assert _ids(db, "galley") == []
+    assert db.reindex_quotes(pause_sec=0)["rows"] == 3
+    assert _ids(db, "galley") == ["q_desc"] and _ids(db, "grout") == ["q_scene"]
+    db.close()
+
+
+def test_search_text_and_match_expressions():
+    fields = search_fields({
+        "scope": {"rooms": ["Kitchen", {"note": "island"}], "sqft": 120},
+        "estimate": {"materials": [{"name": "Quartz"}, {"quantity": 2}, "bad"]},
+        "vision_results": {"scene_description": "Open kitchen"},
+    })
+    assert fields == {"scope": "Kitchen island", "materials": "Quartz", "scene": "Open kitchen"}
+    assert search_fields({"status": "completed"}) == {}
+    assert match_expression("sqlite", 'Tile "OR" grou*', "u1") == (
+        f'owner : "{owner_token("u1")}" AND {{scope description materials scene}} : ("tile" "or" "grou"*)'
+    )
+    assert match_expression("postgres", "tile grou", "u1") == "tile & grou:*"
+    assert match_expression("sqlite", "--", "u1") is None
@@ -0,0 +1,128 @@
+import asyncio
+import json
+from datetime import datetime, timezone
+
+import pytest
+
+from database.db import DatabaseService
+from services import repricing
+from services.estimation_service import EstimationService
+from services.repricing import RepricingJob
+
+REASONING = {
+    "materials_needed": [{"name": "tile", "quantity": 40}, {"name": "grout", "quantity": 2}],
+    "analysis": {"labor_hours": 10},
+}
+
+
+def _write_prices(path, tile_price):
+    rows = [
+        {"key": "tile", "Final_Price_USD": tile_price, "Unit_Type": "sqft"},
+        {"key": "grout", "Final_Price_USD": 25.0, "Unit_Type": "bag"},
+    ]
+    path.write_text(json.dumps(rows), encoding="utf-8")
+
+
+def _seed_quotes(db, count):
+    service = EstimationService()
+    for i in range(count):
+        estimate = asyncio.run(service.calculate_estimate({}, REASONING, "bathroom", advanced_options={"profit_pct": 10}))
+        asyncio.run(db.save_quote({
+            "id": f"quote_{i:03d}",
+            "project_type": "bathroom",
+            "image_path": "",
+            "vision_results": {},
+            "reasoning": REASONING,
+            "estimate": estimate,
+            "status": "completed",
+            "created_at": datetime.now(timezone.utc),
+        }))
+
+
+@pytest.fixture
+def priced_db(tmp_path, monkeypatch):
+    prices = tmp_path / "prices.json"
+    _write_prices(prices, 5.0)
+    monkeypatch.delenv("PRICE_LIST_FILES", raising=False)
+    monkeypatch.setenv("PRICE_LIST_FILE", str(prices))
+    db = DatabaseService(str(tmp_path / "quotes.db"))
+    _seed_quotes(db, 5)
+    # Tile gets more expensive after the quotes were priced
+    _write_prices(prices, 6.0)
+    return db
+
+
+def test_repricing_writes_versions_and_deltas(priced_db):
+    job = RepricingJob(priced_db, chunk_size=2, workers=0).run()
+
+    assert job["status"] == "completed"
+    assert (job["processed"], job["updated"], job["unchanged"], job["failed"]) == (5, 5, 0, 0)
+    quote = asyncio.run(priced_db.get_quote("quote_003"))
+    tile = next(m for m in quote["estimate"]["materials"] if m["name"] == "tile")
+    assert tile["unit_price"] == 6.0
+    # Stored options are reused, not the defaults
+    assert quote["estimate"]["options_applied"]["profit_pct"] == 10
+
+    original, repriced = priced_db.get_estimate_versions("quote_003")
+    assert (original["version"], repriced["version"]) == (1, 2)
+    delta = repriced["delta"]
+    assert delta["change"] > 0
+    assert delta["new_total"] == quote["estimate"]["total_cost"]["amount"]
+    assert delta["changed_lines"] == [{"name": "tile", "old_unit_price": 5.0, "new_unit_price": 6.0}]
+
+    # Nothing changed since, so a second run writes no versions
+    again = RepricingJob(priced_db, chunk_size=2, workers=0).run()
+    assert (again["updated"], again["unchanged"]) == (0, 5)
+    assert len(priced_db.get_estimate_versions("quote_003")) == 2
+
+    # Versions are only listed to the quote's owner, and go away with the quote
+    with priced_db.backend.connection() as conn, conn:
+        conn.execute("UPDATE quotes SET user_id = 'u1'")
+    assert len(asyncio.run(priced_db.list_estimate_versions("quote_003", user_id="u1"))) == 2
+    assert asyncio.run(priced_db.list_estimate_versions("quote_003", user_id="u2")) is None
+    assert asyncio.run(priced_db.delete_quote("quote_003"))
+    assert asyncio.run(priced_db.list_estimate_versions("quote_003")) is None
+    assert priced_db.get_estimate_versions("quote_003") == []
+
+
+def test_repricing_with_spawned_worker_processes(priced_db):
+    job = RepricingJob(priced_db, chunk_size=2, workers=2).run()
+    assert (job["status"], job["processed"], job["updated"]) == ("completed", 5, 5)
+
+
+def test_quotes_updated_during_the_job_are_not_overwritten(priced_db, monkeypatch):
+    edited = {"total_cost": {"amount": 1.0}, "materials": []}
+    reprice_chunk = repricing.reprice_chunk
+
+    def edit_then_reprice(quotes, service=None):
+        # The user edits quote_000 and a pipeline update is queued for quote_001 after the job read them
+        if quotes[0]["id"] == "quote_000":
+            asyncio.run(priced_db.update_quote("quote_000", {"estimate": edited}))
+            asyncio.run(priced_db.queue_quote_update("quote_001", {"status": "completed", "scope": {"rooms": 2}}))
+        return reprice_chunk(quotes, service)
+
+    monkeypatch.setattr(repricing, "reprice_chunk", edit_then_reprice)
+    job = RepricingJob(priced_db, chunk_size=2, workers=0).run()
+
+    assert (job["processed"], job["updated"], job["skipped"]) == (5, 3, 2)
+    assert asyncio.run(priced_db.get_quote("quote_000"))["estimate"] == edited
+    assert asyncio.run(priced_db.get_quote("quote_001"))["scope"] == {"rooms": 2}
+    assert priced_db.get_estimate_versions("quote_000") == []
+    assert len(priced_db.get_estimate_versions("quote_002")) == 2
+
+
+def test_interrupted_job_resumes_from_checkpoint(priced_db):
+    def stop_after_first_chunk(job):
+        raise KeyboardInterrupt
+
+    job = RepricingJob(priced_db, chunk_size=2, workers=0, progress=stop_after_first_chunk)
+    with pytest.raises(KeyboardInterrupt):
+        job.run()
+    state = priced_db.get_repricing_job(job.job_id)
+    assert (state["status"], state["processed"], state["last_quote_id"]) == ("interrupted", 2, "quote_001")
+
+    resumed = RepricingJob(priced_db, chunk_size=2, workers=0, job_id=job.job_id)
+    final = resumed.run()
+    assert final["status"] == "completed"
+    assert (final["processed"], final["updated"]) == (5, 5)
+    assert all(len(priced_db.get_estimate_versions(f"quote_{i:03d}")) == 2 for i in range(5))
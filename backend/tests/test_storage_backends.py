@@ -0,0 +1,144 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from database.backend import create_backend
+from database.db import MIGRATIONS, SUMMARY_COLUMNS, DatabaseService
+from database.pool import SQLitePool
+from database.postgres import translate_placeholders
+
+# These run once per backend (see the database_url fixture in conftest.py)
+
+
+def _seed(db, count):
+    start = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    for i in range(count):
+        assert asyncio.run(db.save_quote({
+            "id": f"quote_{i:03d}",
+            "user_id": "u1" if i % 5 else "u2",
+            "project_type": "kitchen" if i % 2 else "bathroom",
+            "scope": {"rooms": i},
+            "image_path": "",
+            "vision_results": {"detections": [{"class": "tile"}] * 10},
+            "reasoning": {"raw_response": "Replace tile. " * 50},
+            "estimate": {"total_cost": {"amount": 1000 + i}},
+            "status": "completed",
+            "created_at": start + timedelta(minutes=i // 2),
+        }))
+
+
+def test_quotes_round_trip_and_paginate(database_url):
+    db = DatabaseService(database_url=database_url)
+    _seed(db, 12)
+
+    quote = asyncio.run(db.get_quote("quote_003"))
+    assert quote["reasoning"] == {"raw_response": "Replace tile. " * 50}
+    assert quote["scope"] == {"rooms": 3} and quote["estimate"]["total_cost"]["amount"] == 1003
+
+    listed = [q["id"] for q in asyncio.run(db.list_quotes(20, 0, user_id="u1"))]
+    assert len(listed) == 9 and listed[:2] == ["quote_011", "quote_009"]
+    ids, cursor = [], None
+    while True:
+        page = asyncio.run(db.list_quotes_page(4, cursor, user_id="u1"))
+        ids.extend(q["id"] for q in page["quotes"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert ids == listed
+
+    assert asyncio.run(db.update_quote("quote_003", {"estimate": {"total_cost": {"amount": 5.5}}, "status": "x"}))
+    summary = asyncio.run(db.list_quotes(1, 0, user_id="u1", project_type="kitchen", summary=True))
+    assert set(summary[0]) == set(SUMMARY_COLUMNS)
+    assert {q["id"]: q["total_amount"] for q in asyncio.run(db.list_quotes(20, 0, user_id="u1", summary=True))}[
+        "quote_003"] == 5.5
+
+    assert asyncio.run(db.delete_quote("quote_003"))
+    assert asyncio.run(db.get_quote("quote_003")) is None
+    assert not asyncio.run(db.update_quote("quote_003", {"status": "gone"}))
+    db.close()
+
+
+def test_write_behind_repricing_and_migrations(database_url):
+    db = DatabaseService(database_url=database_url)
+    _seed(db, 3)
+
+    asyncio.run(db.queue_quote_update("quote_001", {"status": "vision_complete"}))
+    asyncio.run(db.queue_quote_update("quote_002", {"status": "cost_complete", "reasoning": {"cost": 1}}))
+    assert asyncio.run(db.flush_quote_updates()) == 2
+    assert asyncio.run(db.get_quote("quote_002"))["reasoning"] == {"cost": 1}
+
+    db.create_repricing_job("job1", {"statuses": ["completed"]})
+    quotes = db.fetch_quotes_after(None, 10, statuses=["completed"])
+    assert [q["id"] for q in quotes] == ["quote_000"]
+    new = {"total_cost": {"amount": 2000.0}, "price_snapshot_version": 2}
+    db.save_repriced_estimates(
+        "job1",
+        [{
+            "quote_id": "quote_000", "updated_at": quotes[0]["updated_at"], "old_estimate": quotes[0]["estimate"],
+            "estimate": new, "delta": {"total": 1000.0},
+        }],
+        "quote_000",
+        {"processed": 1, "updated": 1, "unchanged": 0, "failed": 0},
+    )
+    db.update_repricing_job("job1", status="completed")
+    versions = db.get_estimate_versions("quote_000")
+    assert [v["version"] for v in versions] == [1, 2] and versions[1]["estimate"] == new
+    job = db.get_repricing_job("job1")
+    assert job["status"] == "completed" and job["params"] == {"statuses": ["completed"]} and job["processed"] == 1
+    assert asyncio.run(db.get_quote("quote_000"))["estimate"] == new
+
+    # Re-opening applies nothing twice, and every row already uses the current codec
+    db.close()
+    db = DatabaseService(database_url=database_url)
+    with db.backend.connection() as conn:
+        assert db.backend.schema_version(conn) == len(MIGRATIONS)
+        assert "total_amount" in db.backend.table_columns(conn, "quotes")
+    assert db.migrate_column_encoding(pause_sec=0)["rows"] == 0
+    assert db.pool_stats()["backend"] == db.backend.name
+    db.close()
+
+
+def test_backend_selection(tmp_path, monkeypatch):
+    monkeypatch.setenv("DATABASE_URL", "postgresql://nobody@127.0.0.1:1/none")
+    # An explicit SQLite path wins over DATABASE_URL
+    backend = create_backend(str(tmp_path / "a.db"))
+    assert isinstance(backend, SQLitePool) and backend.db_path == tmp_path / "a.db"
+    backend.close()
+
+    monkeypatch.setenv("DATABASE_URL", f"sqlite:///{tmp_path / 'b.db'}")
+    backend = create_backend()
+    assert backend.name == "sqlite" and backend.db_path == tmp_path / "b.db"
+    backend.close()
+
+    with pytest.raises(ValueError):
+        create_backend(database_url="mysql://user@host/db")
+
+
+def test_placeholders_are_numbered_outside_literals():
+    query, returns_rows = translate_placeholders("SELECT * FROM t WHERE a = ? AND b = '?' AND c IN (?, ?)")
+    assert query == "SELECT * FROM t WHERE a = $1 AND b = '?' AND c IN ($2, $3)" and returns_rows
+    assert translate_placeholders("UPDATE t SET a = ? WHERE id = ?") == ("UPDATE t SET a = $1 WHERE id = $2", False)
+
+
+def test_quote_version_probe_and_change_listeners(database_url, monkeypatch):
+    monkeypatch.setenv("DB_WRITE_BEHIND_MS", "60000")
+    db = DatabaseService(database_url=database_url)
+    changed = []
+    db.on_quote_change(changed.append)
+    _seed(db, 2)
+
+    assert asyncio.run(db.get_quote_version("missing")) is None
+    v1 = asyncio.run(db.get_quote_version("quote_000"))
+    assert v1 == asyncio.run(db.get_quote("quote_000"))["updated_at"]
+
+    assert asyncio.run(db.update_quote("quote_000", {"status": "revised"}))
+    v2 = asyncio.run(db.get_quote_version("quote_000"))
+    assert v2 > v1
+    # Queued updates count as changes before they are committed
+    asyncio.run(db.queue_quote_update("quote_000", {"status": "queued"}))
+    assert asyncio.run(db.get_quote_version("quote_000")) > v2
+    assert asyncio.run(db.delete_quote("quote_001"))
+    assert not asyncio.run(db.update_quote("missing", {"status": "x"}))
+    assert changed == ["quote_000", "quote_000", "quote_001"]
+    db.close()
@@ -0,0 +1,118 @@
+import asyncio
+import time
+from datetime import datetime, timezone
+
+import pytest
+
+from database.db import DatabaseService
+from database.write_behind import WriteBehindQueue
+
+
+def _service(database_url, monkeypatch, interval_ms="60000"):
+    # A long interval keeps the background flusher out of the way unless a test wants it
+    monkeypatch.setenv("DB_WRITE_BEHIND_MS", interval_ms)
+    db = DatabaseService(database_url=database_url)
+    for i in range(3):
+        asyncio.run(db.save_quote({
+            "id": f"q{i}", "user_id": "u1", "project_type": "kitchen", "image_path": "",
+            "vision_results": {}, "reasoning": {}, "estimate": {}, "status": "processing",
+            "created_at": datetime.now(timezone.utc),
+        }))
+    return db
+
+
+def _on_disk(db, quote_id):
+    with db._pool.connection() as conn:
+        return dict(conn.execute("SELECT status, total_amount FROM quotes WHERE id = ?", (quote_id,)).fetchone())
+
+
+def test_queued_updates_coalesce_and_group_commit(database_url, monkeypatch):
+    db = _service(database_url, monkeypatch)
+    asyncio.run(db.queue_quote_update("q0", {"status": "vision_complete", "vision_results": {"n": 1}}))
+    asyncio.run(db.queue_quote_update("q0", {"status": "cost_complete", "reasoning": {"cost_baseline": 1}}))
+    asyncio.run(db.queue_quote_update("q1", {"status": "vision_error", "estimate": {"total_cost": {"amount": 9}}}))
+
+    # Not committed yet, but reads already see the queued values
+    assert _on_disk(db, "q0")["status"] == "processing"
+    quote = asyncio.run(db.get_quote("q0"))
+    assert quote["status"] == "cost_complete" and quote["vision_results"] == {"n": 1}
+    summary = asyncio.run(db.list_quotes(10, 0, user_id="u1", summary=True))
+    assert {q["id"]: q["total_amount"] for q in summary}["q1"] == 9.0
+
+    assert asyncio.run(db.flush_quote_updates()) == 2
+    assert _on_disk(db, "q0")["status"] == "cost_complete"
+    assert _on_disk(db, "q1") == {"status": "vision_error", "total_amount": 9.0}
+    stats = db.write_behind_stats()
+    assert stats["batches"] == 1 and stats["rows"] == 2 and stats["coalesced"] == 1 and stats["pending"] == 0
+    db.close()
+
+
+def test_direct_update_and_delete_fold_in_queued_updates(database_url, monkeypatch):
+    db = _service(database_url, monkeypatch)
+    asyncio.run(db.queue_quote_update("q0", {"status": "vision_complete", "vision_results": {"n": 1}}))
+    assert asyncio.run(db.update_quote("q0", {"status": "completed"}))
+    quote = asyncio.run(db.get_quote("q0"))
+    assert quote["status"] == "completed" and quote["vision_results"] == {"n": 1}
+    assert _on_disk(db, "q0")["status"] == "completed"
+
+    asyncio.run(db.queue_quote_update("q1", {"status": "cost_complete"}))
+    assert asyncio.run(db.delete_quote("q1"))
+    assert db.write_behind_stats()["pending"] == 0
+
+    with pytest.raises(ValueError):
+        asyncio.run(db.queue_quote_update("q2", {"no_such_column": 1}))
+    db.close()
+
+
+def test_failed_direct_update_keeps_queued_updates(database_url, monkeypatch):
+    db = _service(database_url, monkeypatch)
+    asyncio.run(db.queue_quote_update("q0", {"status": "vision_complete", "vision_results": {"n": 1}}))
+
+    def fail(conn, quote_id, row):
+        raise RuntimeError("database is locked")
+
+    with monkeypatch.context() as m:
+        m.setattr(db, "_write_quote_row", fail)
+        assert not asyncio.run(db.update_quote("q0", {"status": "completed"}))
+
+    # The direct update failed, but the coalesced status is still queued and lands on flush
+    quote = asyncio.run(db.get_quote("q0"))
+    assert quote["status"] == "vision_complete" and quote["vision_results"] == {"n": 1}
+    assert asyncio.run(db.flush_quote_updates()) == 1
+    assert _on_disk(db, "q0")["status"] == "vision_complete"
+    db.close()
+
+
+def test_background_flusher_and_close_commit_pending_updates(database_url, monkeypatch):
+    db = _service(database_url, monkeypatch, interval_ms="10")
+    asyncio.run(db.queue_quote_update("q0", {"status": "vision_complete"}))
+    deadline = time.monotonic() + 5
+    while _on_disk(db, "q0")["status"] != "vision_complete" and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert _on_disk(db, "q0")["status"] == "vision_complete"
+
+    asyncio.run(db.queue_quote_update("q2", {"status": "cost_complete"}))
+    db.close()
+    reopened = DatabaseService(database_url=database_url)
+    assert asyncio.run(reopened.get_quote("q2"))["status"] == "cost_complete"
+    reopened.close()
+
+
+def test_failed_batch_is_requeued_under_newer_updates():
+    written, fail = [], [True]
+
+    def apply(batch):
+        if fail[0]:
+            fail[0] = False
+            raise RuntimeError("database is locked")
+        written.append(batch)
+
+    queue = WriteBehindQueue(apply, interval_sec=60)
+    queue.put("a", {"status": "vision_complete", "x": 1})
+    assert queue.flush() == 0
+    queue.put("a", {"status": "cost_complete"})
+    assert queue.peek("a") == {"status": "cost_complete", "x": 1}
+    assert queue.flush() == 1
+    assert written == [{"a": {"status": "cost_complete", "x": 1}}]
+    assert queue.stats()["failed_batches"] == 1
+    queue.close()